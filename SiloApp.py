@@ -1,171 +1,37 @@
+import datetime, time, math
+_T0 = time.perf_counter()
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import sqlite3, os, datetime, random, threading, time, math, csv
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas as pdf_canvas
-
-DB = "silo_system.sqlite3"
+
+# matplotlib is imported when the chart is built (after the first frame) and silo_report /
+# ReportLab when a PDF is requested, so the window comes up without them
+import silo_db, silo_ingest, silo_tasks, silo_export, silo_alerts, silo_forecast, silo_metrics, silo_service
+from silo_service import (CHART_RANGES, ensure_db, add_new_silo_db, update_silo_details_db, get_all_silos,
+                          insert_telemetry, update_thresholds_db, fetch_dashboard, fetch_fleet)
+_T_IMPORTS = time.perf_counter()
+
+DB = silo_db.DB
 SIMULATED = False 
+INGEST_SERVER = False   # accept ESP32 readings over HTTP/UDP (see silo_server.py)
+RETENTION = False       # archive telemetry older than 90 days once an hour (see silo_retention.py)
+REMOTE_ALERTS = False   # a silo_service process runs the alerts worker; the app shows what it recorded in alert_events
+METRICS_PORT = None     # e.g. silo_metrics.METRICS_PORT to serve /metrics on localhost
+OVERLAY_MS = 1000       # debug overlay (F12) refresh; F11 toggles the sampling profiler
+FILL_ANIM_MS = 400      # silo graphic eases to a new level over this long
+FILL_FRAME_MS = 30
+PROFILE_STARTUP = False # print import / first-frame / chart timings (see startup_mark)
+
+
+def startup_mark(phase, since=None):
+    # ms since SiloApp started importing (or since `since`, a perf_counter value)
+    ms = (time.perf_counter() - (_T0 if since is None else since)) * 1000.0
+    if PROFILE_STARTUP:
+        print(f"startup {phase:<18} {ms:8.1f} ms", flush=True)
+    return ms
+
+def format_days(d):
+    return "∞" if d == float('inf') else f"{d:.1f}"
 
-def ensure_db():
-    conn = sqlite3.connect(DB, detect_types=sqlite3.PARSE_DECLTYPES)
-    cur = conn.cursor()
-    cur.execute('''CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, email TEXT)''')
-    cur.execute('''CREATE TABLE IF NOT EXISTS silos (
-        id INTEGER PRIMARY KEY AUTOINCREMENT, 
-        owner_id INTEGER, 
-        name TEXT, 
-        radius_m REAL, 
-        height_m REAL, 
-        token TEXT, 
-        threshold_moisture REAL, 
-        threshold_temp REAL, 
-        threshold_level_percent REAL,
-        next_service_date DATE
-    )''')
-    cur.execute('''CREATE TABLE IF NOT EXISTS telemetry (
-        id INTEGER PRIMARY KEY AUTOINCREMENT, 
-        silo_id INTEGER, 
-        timestamp TIMESTAMP, 
-        distance_m REAL, 
-        level_percent REAL, 
-        temp_c REAL, 
-        humidity REAL, 
-        raw_json TEXT
-    )''')
-    
-    cur.execute("SELECT count(*) FROM silos")
-    if cur.fetchone()[0] == 0:
-        cur.execute("INSERT INTO users (name,email) VALUES (?,?)", ('Farm Admin','admin@farm.local'))
-        uid = cur.lastrowid
-        
-        today = datetime.date.today()
-        service_future = today + datetime.timedelta(days=90)
-        
-        silos_seed = [
-            ('Silo 01 (Wheat)', 2.5, 8.0, 13.5, 35.0, 15.0, service_future),
-            ('Silo 02 (Corn)', 2.5, 8.0, 14.0, 30.0, 10.0, service_future)
-        ]
-        
-        for idx, s in enumerate(silos_seed):
-            cur.execute("INSERT INTO silos (owner_id,name,radius_m,height_m,token,threshold_moisture,threshold_temp,threshold_level_percent,next_service_date) VALUES (?,?,?,?,?,?,?,?,?)",
-                        (uid, s[0], s[1], s[2], f'tk-0{idx}', s[3], s[4], s[5], s[6]))
-            sid = cur.lastrowid
-            
-        
-            now = datetime.datetime.now()
-            base_lvl = 75.0 if idx == 0 else 45.0
-            for i in range(20):
-                ts = now - datetime.timedelta(hours=2*(20-i))
-                lvl = base_lvl 
-                dist = s[2] * (1 - lvl/100.0)
-                temp = 24.5 
-                hum = 12.0
-                cur.execute('INSERT INTO telemetry (silo_id,timestamp,distance_m,level_percent,temp_c,humidity,raw_json) VALUES (?,?,?,?,?,?,?)',
-                            (sid, ts, dist, lvl, temp, hum, '{"seed":true}'))
-        conn.commit()
-    cur.close(); conn.close()
-
-def add_new_silo_db(name, radius, height):
-    conn = sqlite3.connect(DB)
-    cur = conn.cursor()
-    next_service = datetime.date.today() + datetime.timedelta(days=180)
-    cur.execute("INSERT INTO silos (owner_id,name,radius_m,height_m,token,threshold_moisture,threshold_temp,threshold_level_percent,next_service_date) VALUES (?,?,?,?,?,?,?,?,?)",
-                (1, name, radius, height, f'tk-{int(time.time())}', 14.0, 40.0, 10.0, next_service))
-    conn.commit()
-    sid = cur.lastrowid
-    conn.close()
-    return sid
-
-def update_silo_details_db(silo_id, name, radius, height):
-    conn = sqlite3.connect(DB)
-    cur = conn.cursor()
-    cur.execute("UPDATE silos SET name=?, radius_m=?, height_m=? WHERE id=?", (name, radius, height, silo_id))
-    conn.commit()
-    conn.close()
-
-def get_all_silos():
-    conn = sqlite3.connect(DB, detect_types=sqlite3.PARSE_DECLTYPES)
-    cur = conn.cursor()
-    cur.execute("SELECT id, name, radius_m, height_m, threshold_moisture, threshold_temp, threshold_level_percent, next_service_date FROM silos")
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
-def get_latest(silo_id):
-    conn = sqlite3.connect(DB, detect_types=sqlite3.PARSE_DECLTYPES)
-    cur = conn.cursor()
-    cur.execute('SELECT timestamp, level_percent, temp_c, humidity FROM telemetry WHERE silo_id=? ORDER BY timestamp DESC LIMIT 1', (silo_id,))
-    row = cur.fetchone()
-    conn.close()
-    if row:
-        ts = row[0] if isinstance(row[0], datetime.datetime) else datetime.datetime.fromisoformat(str(row[0]))
-        return {'timestamp': ts, 'level_percent': row[1], 'temp_c': row[2], 'humidity': row[3]}
-    return None
-
-def get_history(silo_id, limit=100):
-    conn = sqlite3.connect(DB, detect_types=sqlite3.PARSE_DECLTYPES)
-    cur = conn.cursor()
-    cur.execute('SELECT timestamp, level_percent, temp_c, humidity FROM telemetry WHERE silo_id=? ORDER BY timestamp DESC LIMIT ?', (silo_id, limit))
-    rows = cur.fetchall()
-    conn.close()
-    res = []
-    for r in rows:
-        ts = r[0] if isinstance(r[0], datetime.datetime) else datetime.datetime.fromisoformat(str(r[0]))
-        res.append({'timestamp': ts, 'level_percent': r[1], 'temp_c': r[2], 'humidity': r[3]})
-    return res[::-1]
-
-def insert_telemetry(silo_id, lvl, temp, hum):
-    conn = sqlite3.connect(DB)
-    cur = conn.cursor()
-    cur.execute("SELECT height_m FROM silos WHERE id=?", (silo_id,))
-    h_row = cur.fetchone()
-    h = h_row[0] if h_row else 10.0
-    dist = h * (1 - lvl/100.0)
-    ts = datetime.datetime.now()
-    cur.execute('INSERT INTO telemetry (silo_id,timestamp,distance_m,level_percent,temp_c,humidity,raw_json) VALUES (?,?,?,?,?,?,?)',
-                (silo_id, ts, dist, lvl, temp, hum, '{"manual":true}'))
-    conn.commit()
-    conn.close()
-
-def update_thresholds_db(silo_id, m, t, l):
-    conn = sqlite3.connect(DB)
-    cur = conn.cursor()
-    cur.execute('UPDATE silos SET threshold_moisture=?, threshold_temp=?, threshold_level_percent=? WHERE id=?', (m, t, l, silo_id))
-    conn.commit()
-    conn.close()
-
-def simulator_thread():
-    while True:
-        try:
-            conn = sqlite3.connect(DB)
-            cur = conn.cursor()
-            cur.execute("SELECT id, height_m FROM silos")
-            silos = cur.fetchall()
-            for s in silos:
-                sid, h = s
-                cur.execute("SELECT level_percent FROM telemetry WHERE silo_id=? ORDER BY timestamp DESC LIMIT 1", (sid,))
-                lr = cur.fetchone()
-                prev_lvl = lr[0] if lr else 50.0
-                
-                consumption = random.uniform(0.01, 0.15) 
-                noise = random.uniform(-0.05, 0.05)
-                change = -(consumption) + noise
-                new_lvl = max(0, min(100, prev_lvl + change))
-                dist = h * (1 - new_lvl/100.0)
-                temp = 24 + random.uniform(-1, 5) 
-                hum = 13 + random.uniform(-2, 2)
-                ts = datetime.datetime.now()
-                cur.execute('INSERT INTO telemetry (silo_id,timestamp,distance_m,level_percent,temp_c,humidity,raw_json) VALUES (?,?,?,?,?,?,?)',
-                            (sid, ts, dist, new_lvl, temp, hum, '{"sim":true}'))
-            conn.commit()
-            conn.close()
-        except Exception:
-            pass
-        time.sleep(5) 
 
 class SiloManagementApp(tk.Tk):
     def __init__(self):
@@ -178,13 +44,35 @@ class SiloManagementApp(tk.Tk):
         self.current_silo_id = None
         self.silo_data = {} 
         self._updating = False
+        self._tick_future = None
+        self.tasks = silo_tasks.UiTaskRunner(self)
+        self.alerts = silo_alerts.RecordedAlerts() if REMOTE_ALERTS else silo_alerts.AlertEngine()
+        self.forecaster = silo_forecast.Forecaster()
+        self._fleet_tree = None
+        self._fleet_rows = {}
+        self._first_data = True
+        self._overlay = None
+        startup_mark("imports", _T0)
         
         self._configure_styles()
         self._build_layout()
         self._load_silo_list()
+        startup_mark("window built")
         
+        self.bind("<F12>", self._toggle_overlay)
+        self.bind("<F11>", self._toggle_profiler)
+        self.after(0, self._after_first_frame)
         self.after(500, self.update_loop)
 
+    def _after_first_frame(self):
+        # gauge and metrics are on screen; the chart (and matplotlib) come next
+        self.update_idletasks()
+        startup_mark("first frame")
+        t = time.perf_counter()
+        self._build_chart_figure()
+        startup_mark("chart built", t)
+        startup_mark("chart on screen")
+
     def _configure_styles(self):
         self.style = ttk.Style()
         self.style.theme_use('clam')
@@ -235,6 +123,7 @@ class SiloManagementApp(tk.Tk):
         controls_right = ttk.Frame(top_bar)
         controls_right.pack(side=tk.RIGHT)
         
+        ttk.Button(controls_right, text="Fleet Overview", command=self.fleet_overview).pack(side=tk.RIGHT, padx=5)
         ttk.Button(controls_right, text="Edit Silo", command=self.edit_silo_popup).pack(side=tk.RIGHT, padx=5)
         ttk.Button(controls_right, text="+ Add Silo", command=self.add_silo_popup, style="Action.TButton").pack(side=tk.RIGHT, padx=5)
         
@@ -317,6 +206,8 @@ class SiloManagementApp(tk.Tk):
         self.lbl_days = ttk.Label(card, text="-- Days", style="Value.TLabel", foreground=self.colors['warning'])
         self.lbl_days.grid(row=1, column=2, sticky="w", padx=(60,0))
         ttk.Label(card, text="Est. Days Until Empty", style="Card.TLabel").grid(row=2, column=2, sticky="w", padx=(60,0))
+        self.lbl_days_ci = ttk.Label(card, text="", style="Card.TLabel", font=("Roboto", 9))
+        self.lbl_days_ci.grid(row=3, column=2, sticky="w", padx=(60,0))
 
     def _build_charts_card(self, parent):
         card = ttk.Frame(parent, style="Card.TFrame", padding=15)
@@ -328,13 +219,58 @@ class SiloManagementApp(tk.Tk):
         
         ttk.Button(header, text="Reset Graph View", command=self.reset_graph_view).pack(side=tk.RIGHT)
         
-        fig, self.ax = plt.subplots(figsize=(6, 4), facecolor=self.colors['bg_card'])
+        self.chart_range = tk.StringVar(value='24h')
+        for key in reversed(list(CHART_RANGES)):
+            ttk.Radiobutton(header, text=key, value=key, variable=self.chart_range, style="Toolbutton",
+                            command=self._on_range_change).pack(side=tk.RIGHT, padx=2)
+        
+        # the figure itself is built by _build_chart_figure once the first frame is up
+        self._chart_card = card
+        self._chart_placeholder = ttk.Label(card, text="Loading chart...", style="Card.TLabel", anchor="center")
+        self._chart_placeholder.pack(fill=tk.BOTH, expand=True)
+        self.ax = None
+        self.canvas_chart = None
+        self._chart_buf = None
+        self.style.configure("Toolbutton", background=self.colors['bg_card'], foreground=self.colors['text_secondary'], padding=(6, 2))
+        self.style.map("Toolbutton", background=[('selected', self.colors['bg_input'])], foreground=[('selected', self.colors['accent'])])
+
+    def _build_chart_figure(self):
+        t = time.perf_counter()
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        startup_mark("matplotlib import", t)
+        
+        fig = Figure(figsize=(6, 4), facecolor=self.colors['bg_card'])
+        self.ax = fig.add_subplot()
         self.ax.set_facecolor(self.colors['bg_input'])
         self.ax.tick_params(colors=self.colors['text_secondary'])
         for spine in self.ax.spines.values(): spine.set_color(self.colors['bg_input'])
         
-        self.canvas_chart = FigureCanvasTkAgg(fig, master=card)
+        # persistent artists: update_loop only feeds them new points
+        self.line_lvl, = self.ax.plot([], [], color=self.colors['accent'], label='Level %', linewidth=2)
+        self.line_tmp, = self.ax.plot([], [], color='#f472b6', label='Temp °C', linewidth=2)
+        self.line_hum, = self.ax.plot([], [], color='#a78bfa', label='Humidity %', linewidth=1.5)
+        self.ax.xaxis_date()
+        self._set_date_format()
+        self.ax.grid(color=self.colors['bg_card'], linestyle='--')
+        self.ax.legend(facecolor=self.colors['bg_card'], labelcolor='white')
+        
+        self._chart_placeholder.destroy()
+        self.canvas_chart = FigureCanvasTkAgg(fig, master=self._chart_card)
         self.canvas_chart.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        # timed where the draw actually runs (the idle callback, resizes included), not where it is requested
+        self.canvas_chart.draw = silo_metrics.timed('silo_update_phase_seconds', phase='chart_draw')(self.canvas_chart.draw)
+        if self._chart_buf is not None:
+            # data that arrived before the figure existed
+            self._apply_chart(dict(self._chart_buf, changed=True))
+        else:
+            self.canvas_chart.draw_idle()
+        self.update_idletasks()
+
+    def _set_date_format(self):
+        import matplotlib.dates as mdates
+        fmt = '%H:%M' if CHART_RANGES[self.chart_range.get()][1] == 'raw' else '%d %b'
+        self.ax.xaxis.set_major_formatter(mdates.DateFormatter(fmt))
 
     def _build_controls_card(self, parent):
         card = ttk.Frame(parent, style="Card.TFrame", padding=20)
@@ -343,6 +279,8 @@ class SiloManagementApp(tk.Tk):
         ttk.Label(card, text="SYSTEM ALERTS", style="SubHeader.TLabel").pack(anchor="w", pady=(0,5))
         self.lbl_status = ttk.Label(card, text="● SYSTEM NORMAL", font=("Roboto", 13), foreground=self.colors['success'], background=self.colors['bg_card'])
         self.lbl_status.pack(anchor="w", pady=5)
+        self.lbl_fleet = ttk.Label(card, text="", font=("Roboto", 10), foreground=self.colors['danger'], background=self.colors['bg_card'], wraplength=320, justify=tk.LEFT)
+        self.lbl_fleet.pack(anchor="w")
         
         sep = ttk.Separator(card, orient='horizontal')
         sep.pack(fill=tk.X, pady=15)
@@ -372,6 +310,10 @@ class SiloManagementApp(tk.Tk):
         ttk.Button(act_frame, text="Export CSV Data", command=self.export_csv).pack(side=tk.RIGHT, padx=5)
         ttk.Button(act_frame, text="Download PDF Report", command=self.generate_pdf).pack(side=tk.RIGHT, padx=5)
         ttk.Button(act_frame, text="Manual Reading Entry", command=self.manual_entry_popup).pack(side=tk.LEFT)
+        
+        # shown only while an export/report job is running
+        self.job_bar = ttk.Progressbar(act_frame, length=140, mode='determinate')
+        self.lbl_job = ttk.Label(act_frame, text="", style="Card.TLabel")
 
     # --- DEFINING METHOD HERE TO FIX ATTRIBUTE ERROR ---
     def save_thresholds(self):
@@ -388,9 +330,27 @@ class SiloManagementApp(tk.Tk):
             messagebox.showerror("Error", "Invalid numeric input.")
 
     def reset_graph_view(self):
-        self.ax.autoscale(enable=True, axis='both', tight=True)
+        if self.ax is not None:
+            self.ax.autoscale(enable=True, axis='both', tight=True)
+        self._chart_buf = None
+        self.update_loop(single_shot=True)
+
+    def _on_range_change(self):
+        if self.ax is not None:
+            self._set_date_format()
+        self._chart_buf = None
+        self.update_loop(single_shot=True)
+
+    def _apply_chart(self, chart):
+        self._chart_buf = chart
+        if self.ax is None or not chart['changed']:
+            return
+        self.line_lvl.set_data(*chart['plot']['lvl'])
+        self.line_tmp.set_data(*chart['plot']['tmp'])
+        self.line_hum.set_data(*chart['plot']['hum'])
         self.ax.relim()
-        self.canvas_chart.draw()
+        self.ax.autoscale_view()
+        self.canvas_chart.draw_idle()
 
     def add_silo_popup(self):
         top = tk.Toplevel(self)
@@ -507,36 +467,74 @@ class SiloManagementApp(tk.Tk):
         )
         
         self.clip_area = (self.silo_x1 + 4, self.silo_y_top, self.silo_x2 - 4, self.silo_y_btm)
+        
+        # every grain bar is created once, hidden; updates only toggle and recolour them
+        bar_h, gap = 4, 2
+        self._bar_ys = []
+        self._bars = []
+        y = self.silo_y_btm - bar_h
+        while y > self.silo_y_top:
+            self._bar_ys.append(y)
+            self._bars.append(self.canvas.create_rectangle(self.silo_x1 + 6, y, self.silo_x2 - 6, y + bar_h,
+                                                           fill="", outline="", state="hidden", tags="grain_bar"))
+            y -= bar_h + gap
+        self._bars_on = 0
+        self._bar_color = None
+        self._lvl_text = None
+        self._lvl_shown = None
+        if getattr(self, '_anim', None):
+            self.after_cancel(self._anim[3])
+        self._anim = None
         # Position text well below the bottom
-        self.canvas.create_text(cx, self.silo_y_btm + 50, text="-- %", fill="white", font=("Roboto", 28, "bold"), tags="txt_lvl")
+        self._txt_lvl = self.canvas.create_text(cx, self.silo_y_btm + 50, text="-- %", fill="white", font=("Roboto", 28, "bold"), tags="txt_lvl")
 
     def _update_visuals(self, pct):
-        self.canvas.delete("grain_bar")
-        self.canvas.delete("txt_lvl")
-        
-        fill_h = self.silo_body_h * (pct/100.0)
-        y_surface = self.silo_y_btm - fill_h
-        
-        bar_h = 4
-        gap = 2
-        
-        current_y = self.silo_y_btm - bar_h
+        # eases from the level on screen to pct; a new target mid-way restarts from where it is
+        start = self._lvl_shown
+        if start is None or FILL_ANIM_MS <= 0:
+            self._render_level(pct)
+            return
+        if start == pct and self._anim is None:
+            self._render_level(pct)   # threshold (colour) may still have changed
+            return
+        if self._anim is not None:
+            self.after_cancel(self._anim[3])
+        self._anim = (start, pct, time.monotonic(), self.after(FILL_FRAME_MS, self._animate_level))
+
+    def _animate_level(self):
+        start, end, t0, _ = self._anim
+        f = min(1.0, (time.monotonic() - t0) * 1000.0 / FILL_ANIM_MS)
+        f = 1 - (1 - f) ** 3   # ease out
+        # the last frame lands exactly on the target, so the next update sees no change
+        self._render_level(start + (end - start) * f if f < 1.0 else end)
+        if f < 1.0:
+            self._anim = (start, end, t0, self.after(FILL_FRAME_MS, self._animate_level))
+        else:
+            self._anim = None
+
+    def _render_level(self, pct):
+        self._lvl_shown = pct
+        y_surface = self.silo_y_btm - self.silo_body_h * (pct/100.0)
+        n = 0
+        while n < len(self._bar_ys) and self._bar_ys[n] > y_surface:
+            n += 1
         
         color = self.colors['warning']
         if pct < self.silo_data.get('tl', 10): color = self.colors['danger']
         elif pct > 90: color = self.colors['success']
-
-        while current_y > y_surface:
-            self.canvas.create_rectangle(
-                self.silo_x1 + 6, current_y, 
-                self.silo_x2 - 6, current_y + bar_h,
-                fill=color, outline="", tags="grain_bar"
-            )
-            current_y -= (bar_h + gap)
-            
-        cx = self.canvas_w / 2
-        # Ensure text stays at bottom
-        self.canvas.create_text(cx, self.silo_y_btm + 50, text=f"{pct:.1f}%", fill="white", font=("Roboto", 28, "bold"), tags="txt_lvl")
+        
+        if color != self._bar_color:
+            self.canvas.itemconfigure("grain_bar", fill=color)
+            self._bar_color = color
+        if n != self._bars_on:
+            state = "normal" if n > self._bars_on else "hidden"
+            for item in self._bars[min(n, self._bars_on):max(n, self._bars_on)]:
+                self.canvas.itemconfigure(item, state=state)
+            self._bars_on = n
+        text = f"{pct:.1f}%"
+        if text != self._lvl_text:
+            self.canvas.itemconfigure(self._txt_lvl, text=text)
+            self._lvl_text = text
 
     def _load_silo_list(self):
         silos = get_all_silos()
@@ -559,6 +557,7 @@ class SiloManagementApp(tk.Tk):
         if not name: return
         self.silo_data = self.silos_map[name]
         self.current_silo_id = self.silo_data['id']
+        self._chart_buf = None
         
         self.ent_th_temp.delete(0, tk.END)
         self.ent_th_temp.insert(0, str(self.silo_data['tt']))
@@ -575,6 +574,79 @@ class SiloManagementApp(tk.Tk):
             
         self.update_loop(single_shot=True)
 
+    def fleet_overview(self):
+        if self._fleet_open():
+            self._fleet_tree.winfo_toplevel().lift()
+            return
+        top = tk.Toplevel(self)
+        top.title("Fleet Overview")
+        top.geometry("760x520")
+        top.configure(bg=self.colors['bg_card'])
+        
+        self.style.configure("Fleet.Treeview", background=self.colors['bg_input'], fieldbackground=self.colors['bg_input'],
+                             foreground=self.colors['text_primary'], rowheight=24, font=("Roboto", 10))
+        self.style.configure("Fleet.Treeview.Heading", background=self.colors['bg_card'], foreground=self.colors['text_primary'], font=("Roboto", 10, "bold"))
+        
+        self.lbl_fleet_summary = ttk.Label(top, text="Loading...", background=self.colors['bg_card'], foreground="white")
+        self.lbl_fleet_summary.pack(anchor="w", padx=15, pady=(10,5))
+        
+        frame = ttk.Frame(top, style="Card.TFrame")
+        frame.pack(fill=tk.BOTH, expand=True, padx=15, pady=(0,15))
+        cols = (("silo", "Silo", 150), ("level", "Level %", 70), ("temp", "Temp °C", 70), ("hum", "Humidity %", 80),
+                ("days", "Days Left", 80), ("ts", "Last Reading", 130), ("status", "Status", 220))
+        tree = ttk.Treeview(frame, columns=[c[0] for c in cols], show="headings", style="Fleet.Treeview")
+        for key, text, w in cols:
+            tree.heading(key, text=text)
+            tree.column(key, width=w, anchor="w" if key in ("silo", "status") else "e")
+        tree.tag_configure('alert', foreground=self.colors['danger'])
+        sb = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
+        tree.configure(yscrollcommand=sb.set)
+        sb.pack(side=tk.RIGHT, fill=tk.Y)
+        tree.pack(fill=tk.BOTH, expand=True)
+        
+        def open_silo(event):
+            sel = tree.selection()
+            if sel and self._fleet_rows.get(sel[0], (None,))[0] in self.silos_map:
+                self.silo_combo.set(self._fleet_rows[sel[0]][0])
+                self._on_silo_change(None)
+        tree.bind("<Double-1>", open_silo)
+        
+        self._fleet_tree = tree
+        self._fleet_rows = {}
+        self.tasks.submit(fetch_fleet, self.alerts, self.forecaster, on_done=self._apply_fleet)
+
+    def _fleet_open(self):
+        return self._fleet_tree is not None and self._fleet_tree.winfo_exists()
+
+    def _apply_fleet_grid(self, fleet, active, forecasts):
+        # only rows whose reading or alert state changed are touched, so large fleets stay cheap
+        tree = self._fleet_tree
+        temp, hum, lvl = fleet['values']
+        fmt = lambda v: "--" if math.isnan(v) else f"{v:.1f}"
+        seen = set()
+        for j, sid in enumerate(fleet['ids'].tolist()):
+            iid = str(sid)
+            seen.add(iid)
+            issues = active.get(sid)
+            ts = fleet['timestamps'][j]
+            fc = forecasts.get(sid)
+            days = format_days(fc['days']) if fc and fc['state'] == 'draining' else ("Stable" if fc and fc['state'] == 'stable' else "--")
+            vals = (fleet['names'][j], fmt(lvl[j]), fmt(temp[j]), fmt(hum[j]), days,
+                    silo_db.from_ms(ts).strftime('%Y-%m-%d %H:%M') if ts is not None else "No data",
+                    ", ".join(label for label, _ in issues) if issues else "OK")
+            if self._fleet_rows.get(iid) == vals:
+                continue
+            tags = ('alert',) if issues else ()
+            if iid in self._fleet_rows:
+                tree.item(iid, values=vals, tags=tags)
+            else:
+                tree.insert('', tk.END, iid=iid, values=vals, tags=tags)
+            self._fleet_rows[iid] = vals
+        for iid in set(self._fleet_rows) - seen:
+            tree.delete(iid)
+            del self._fleet_rows[iid]
+        self.lbl_fleet_summary.config(text=f"{len(seen)} silos   ·   {len(active)} in alert   ·   double-click a row to open it")
+
     def manual_entry_popup(self):
         top = tk.Toplevel(self)
         top.title("Manual Entry")
@@ -599,130 +671,278 @@ class SiloManagementApp(tk.Tk):
                 
         ttk.Button(top, text="Submit Reading", command=save, style="Action.TButton").pack(pady=20)
 
+    def _run_job(self, title, fn, *args, on_done=None):
+        self.lbl_job.config(text=title)
+        self.job_bar.config(mode='indeterminate', value=0)
+        self.lbl_job.pack(side=tk.LEFT, padx=(20, 5))
+        self.job_bar.pack(side=tk.LEFT)
+        self.job_bar.start(15)
+        
+        def progress(done, total):
+            if total:
+                self.job_bar.stop()
+                self.job_bar.config(mode='determinate', maximum=total, value=done)
+        
+        def finish(result=None, error=None):
+            self.job_bar.stop()
+            self.job_bar.pack_forget()
+            self.lbl_job.pack_forget()
+            if error is not None:
+                messagebox.showerror("Error", f"{title} failed: {error}")
+            elif on_done:
+                on_done(result)
+        
+        self.tasks.submit(fn, *args, on_progress=progress, on_done=finish, on_error=lambda e: finish(error=e))
+
     def export_csv(self):
-        rows = get_history(self.current_silo_id, limit=5000)
-        if not rows: return
-        path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV","*.csv")])
-        if path:
-            with open(path, 'w', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(["Timestamp", "Level %", "Temp C", "Humidity %"])
-                for r in rows:
-                    writer.writerow([r['timestamp'], r['level_percent'], r['temp_c'], r['humidity']])
-            messagebox.showinfo("Export", "CSV Exported successfully.")
+        if not self.current_silo_id: return
+        top = tk.Toplevel(self)
+        top.title("Export CSV")
+        top.geometry("360x430")
+        top.configure(bg=self.colors['bg_card'])
+        
+        def lbl(txt): return ttk.Label(top, text=txt, background=self.colors['bg_card'], foreground="white")
+        
+        lbl("Silos:").pack(pady=(15,5))
+        names = list(self.silos_map)
+        lb = tk.Listbox(top, selectmode=tk.MULTIPLE, height=min(8, max(3, len(names))), exportselection=False,
+                        bg=self.colors['bg_input'], fg="white", selectbackground=self.colors['accent'], highlightthickness=0)
+        for n in names: lb.insert(tk.END, n)
+        if self.silo_combo.get() in names: lb.selection_set(names.index(self.silo_combo.get()))
+        lb.pack(fill=tk.X, padx=30)
+        
+        lbl("From (YYYY-MM-DD, blank = all history):").pack(pady=(10,5))
+        e_from = ttk.Entry(top, width=20)
+        e_from.pack()
+        lbl("To (YYYY-MM-DD, inclusive, blank = now):").pack(pady=(10,5))
+        e_to = ttk.Entry(top, width=20)
+        e_to.pack()
+        
+        gz = tk.BooleanVar(value=False)
+        tk.Checkbutton(top, text="Compress (.csv.gz)", variable=gz, bg=self.colors['bg_card'], fg="white",
+                       selectcolor=self.colors['bg_input'], activebackground=self.colors['bg_card']).pack(pady=10)
+        
+        def go():
+            try:
+                ids = [self.silos_map[names[i]]['id'] for i in lb.curselection()]
+                start = datetime.datetime.strptime(e_from.get().strip(), '%Y-%m-%d') if e_from.get().strip() else None
+                end = datetime.datetime.strptime(e_to.get().strip(), '%Y-%m-%d') + datetime.timedelta(days=1) if e_to.get().strip() else None
+                if not ids: raise ValueError
+            except ValueError:
+                messagebox.showerror("Error", "Select at least one silo and use YYYY-MM-DD dates.", parent=top)
+                return
+            ext = ".csv.gz" if gz.get() else ".csv"
+            path = filedialog.asksaveasfilename(parent=top, defaultextension=ext, filetypes=[("CSV", "*" + ext)])
+            if not path: return
+            top.destroy()
+            
+            def done(n):
+                if n: messagebox.showinfo("Export", f"CSV Exported successfully ({n:,} rows).")
+                else: messagebox.showwarning("Export", "No readings to export.")
+            labels = {self.silos_map[n]['id']: n for n in names}
+            self._run_job("Exporting CSV...", silo_export.export_csv, path, ids, start, end, gz.get(), labels, on_done=done)
+        
+        ttk.Button(top, text="Export", command=go, style="Action.TButton").pack(pady=10)
 
     def generate_pdf(self):
-        rows = get_history(self.current_silo_id, limit=100)
-        if not rows: return
-        path = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF","*.pdf")])
-        if not path: return
-        
-        c = pdf_canvas.Canvas(path, pagesize=A4)
-        c.setFont("Helvetica-Bold", 16)
-        c.drawString(50, 800, f"Silo Report: {self.silo_combo.get()}")
-        c.setFont("Helvetica", 10)
-        c.drawString(50, 780, f"Generated: {datetime.datetime.now()}")
-        
-        y = 750
-        c.drawString(50, y, "Timestamp")
-        c.drawString(200, y, "Level %")
-        c.drawString(300, y, "Temp C")
-        c.drawString(400, y, "Humidity %")
-        y -= 20
-        c.line(50, y+15, 500, y+15)
-        
-        for r in rows[:40]:
-            c.drawString(50, y, str(r['timestamp']))
-            c.drawString(200, y, f"{r['level_percent']:.1f}")
-            c.drawString(300, y, f"{r['temp_c']:.1f}")
-            c.drawString(400, y, f"{r['humidity']:.1f}")
-            y -= 15
-        c.save()
-        messagebox.showinfo("PDF", "Report generated.")
+        if not self.current_silo_id: return
+        top = tk.Toplevel(self)
+        top.title("PDF Report")
+        top.geometry("360x300")
+        top.configure(bg=self.colors['bg_card'])
+        
+        def lbl(txt): return ttk.Label(top, text=txt, background=self.colors['bg_card'], foreground="white")
+        
+        today = datetime.date.today()
+        lbl("From (YYYY-MM-DD):").pack(pady=(20,5))
+        e_from = ttk.Entry(top, width=20)
+        e_from.insert(0, (today - datetime.timedelta(days=30)).isoformat())
+        e_from.pack()
+        lbl("To (YYYY-MM-DD, inclusive):").pack(pady=(10,5))
+        e_to = ttk.Entry(top, width=20)
+        e_to.insert(0, today.isoformat())
+        e_to.pack()
+        
+        fleet = tk.BooleanVar(value=False)
+        tk.Checkbutton(top, text="All silos (one PDF per silo)", variable=fleet, bg=self.colors['bg_card'], fg="white",
+                       selectcolor=self.colors['bg_input'], activebackground=self.colors['bg_card']).pack(pady=10)
+        
+        def go():
+            try:
+                start = datetime.datetime.strptime(e_from.get().strip(), '%Y-%m-%d')
+                end = datetime.datetime.strptime(e_to.get().strip(), '%Y-%m-%d') + datetime.timedelta(days=1)
+                if end <= start: raise ValueError
+            except ValueError:
+                messagebox.showerror("Error", "Use YYYY-MM-DD dates with From before To.", parent=top)
+                return
+            import silo_report   # pulls in ReportLab, only needed here
+            if fleet.get():
+                out_dir = filedialog.askdirectory(parent=top, title="Folder for fleet reports")
+                if not out_dir: return
+                top.destroy()
+                done = lambda res: messagebox.showinfo("PDF", f"{len(res)} silo reports written to {out_dir}.")
+                self._run_job("Rendering fleet PDFs...", silo_report.generate_fleet_reports, out_dir, start, end, on_done=done)
+            else:
+                path = filedialog.asksaveasfilename(parent=top, defaultextension=".pdf", filetypes=[("PDF","*.pdf")])
+                if not path: return
+                top.destroy()
+                done = lambda pages: messagebox.showinfo("PDF", f"Report generated ({pages} pages).")
+                self._run_job("Rendering PDF...", silo_report.render_silo_report, path, self.current_silo_id, start, end, on_done=done)
+        
+        ttk.Button(top, text="Generate", command=go, style="Action.TButton").pack(pady=10)
 
-    def update_loop(self, single_shot=False):
-        if self.current_silo_id:
-            latest = get_latest(self.current_silo_id)
-            if latest:
-                lvl = latest['level_percent']
-                rad = self.silo_data['r']
-                ht = self.silo_data['h']
-                
-                total_vol = math.pi * (rad**2) * ht
-                curr_vol = total_vol * (lvl/100.0)
-                mass = curr_vol * 0.78 
-                
-                self._update_visuals(lvl)
-                self.lbl_vol.config(text=f"{curr_vol:.1f} m³")
-                self.lbl_mass.config(text=f"{mass:.1f} t")
-                
-                # --- ALERT LOGIC ---
-                issues = []
-                temp_alert = latest['temp_c'] > self.silo_data['tt']
-                hum_alert = latest['humidity'] > self.silo_data['tm']
-                lvl_alert = lvl < self.silo_data['tl']
-                
-                if temp_alert: issues.append(f"HIGH TEMP ({latest['temp_c']:.1f}°C)")
-                if hum_alert: issues.append(f"HIGH MOISTURE ({latest['humidity']:.1f}%)")
-                if lvl_alert: issues.append("CRITICAL LOW LEVEL")
-                
-                if issues:
-                    self.lbl_status.config(text=f"⚠ ALERT: {', '.join(issues)}", foreground=self.colors['danger'])
-                else:
-                    self.lbl_status.config(text="● SYSTEM NORMAL", foreground=self.colors['success'])
-
-                # GRAIN CONDITION LOGIC (SPOILAGE RISK)
-                if temp_alert or hum_alert:
-                    self.lbl_cond.config(text="Warning: Spoilage Risk", foreground=self.colors['danger'])
-                elif lvl_alert:
-                    self.lbl_cond.config(text="Optimal (Refill Needed)", foreground=self.colors['warning'])
-                else:
-                    self.lbl_cond.config(text="Optimal", foreground=self.colors['success'])
-
-                hr = datetime.datetime.now().hour
-                bat = 100 - (hr % 5) 
-                self.lbl_battery.config(text=f"{bat}% (Good)")
-
-                hist = get_history(self.current_silo_id, limit=48)
-                times = [h['timestamp'] for h in hist]
-                levels = [h['level_percent'] for h in hist]
-                temps = [h['temp_c'] for h in hist]
-                
-                self.ax.clear()
-                self.ax.set_facecolor(self.colors['bg_input'])
-                self.ax.plot(times, levels, color=self.colors['accent'], label='Level %', linewidth=2)
-                self.ax.plot(times, temps, color='#f472b6', label='Temp °C', linewidth=2)
-                self.ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
-                self.ax.grid(color=self.colors['bg_card'], linestyle='--')
-                self.ax.legend(facecolor=self.colors['bg_card'], labelcolor='white')
-                self.canvas_chart.draw()
-                
-                # EST DAYS LOGIC
-                if len(hist) > 5:
-                    start_lvl = hist[0]['level_percent']
-                    end_lvl = hist[-1]['level_percent']
-                    hours = (hist[-1]['timestamp'] - hist[0]['timestamp']).total_seconds() / 3600.0
-                    drop = start_lvl - end_lvl 
-                    
-                    if drop > 0.5 and hours > 0.05:
-                         rate_per_hour = drop / hours
-                         hours_left = lvl / rate_per_hour
-                         days = hours_left / 24.0
-                         self.lbl_days.config(text=f"{days:.1f} Days")
-                    else:
-                        if lvl < 20.0:
-                             self.lbl_days.config(text="Stable (Low Level)", foreground=self.colors['danger'])
-                        else:
-                             self.lbl_days.config(text="Stable", foreground=self.colors['warning'])
-                else:
-                    self.lbl_days.config(text="Calculating...")
+    # --- DEBUG OVERLAY ---
+    def _toggle_overlay(self, event=None):
+        if self._overlay is not None:
+            self.after_cancel(self._overlay_job)
+            self._overlay.destroy()
+            self._overlay = None
+            return
+        self._overlay = tk.Label(self, justify=tk.LEFT, anchor="nw", font=("Courier", 10), bg="#000000", fg="#a7f3d0",
+                                 padx=10, pady=8)
+        self._overlay.place(relx=1.0, x=-30, y=80, anchor="ne")
+        self._refresh_overlay()
+
+    def _refresh_overlay(self):
+        if self._overlay is None:
+            return
+        ms = lambda s: f"{s * 1000:7.1f}"
+        lines = [f"{'phase (ms)':<16}{'last':>7} {'p50':>7} {'p95':>7} {'n':>6}"]
+        for name, (last, p50, p95, n) in sorted(silo_metrics.summary('silo_update_phase_seconds', 'phase').items()):
+            lines.append(f"{name:<16}{ms(last)} {ms(p50)} {ms(p95)} {n:>6}")
+        lines.append("")
+        for family in ('silo_query_seconds', 'silo_insert_seconds'):
+            for name, (last, p50, p95, n) in sorted(silo_metrics.summary(family, 'fn').items()):
+                lines.append(f"{name[:16]:<16}{ms(last)} {ms(p50)} {ms(p95)} {n:>6}")
+        commit = silo_metrics.summary('silo_ingest_commit_seconds', None).get(None)
+        depth = silo_metrics.gauge_value('silo_ingest_queue_depth')
+        lines.append("")
+        lines.append(f"ingest queue {'-' if depth is None else depth}" +
+                     (f"   commit p95 {commit[2] * 1000:.1f} ms ({commit[3]} batches)" if commit else ""))
+        stmts = silo_metrics.counter_values('silo_sqlite_statements_total', 'verb')
+        lines.append("sqlite " + "  ".join(f"{k} {v:.0f}" for k, v in sorted(stmts.items(), key=lambda kv: -kv[1])[:5]))
+        errors = silo_metrics.counter_values('silo_errors_total', 'where')
+        if errors:
+            lines.append("errors " + "  ".join(f"{k} {v:.0f}" for k, v in sorted(errors.items())))
+        prof = silo_metrics.profiler
+        lines.append(f"profiler {'ON, %d samples' % prof.samples if prof.running else 'off'} (F11)")
+        self._overlay.config(text="\n".join(lines))
+        self._overlay.lift()
+        self._overlay_job = self.after(OVERLAY_MS, self._refresh_overlay)
+
+    def _toggle_profiler(self, event=None):
+        stacks = silo_metrics.profiler.toggle()
+        if stacks is not None:
+            path = silo_metrics.save_profile(stacks)
+            messagebox.showinfo("Profiler", f"{silo_metrics.profiler.samples} samples written to {path}")
 
+    def update_loop(self, single_shot=False):
+        busy = self._tick_future is not None and not self._tick_future.done()
+        if self.current_silo_id and (single_shot or not busy):
+            sid = self.current_silo_id
+            rng = self.chart_range.get()
+            width = self.canvas_chart.get_tk_widget().winfo_width() if self.canvas_chart else 0
+            chart = {'range_key': rng, 'buf': self._chart_buf, 'width': width if width > 1 else 600}
+            # single shots (manual reading, threshold edit, silo switch) re-evaluate alerts too, so the
+            # banner changes when the user expects it to; streaks only advance on new readings
+            self._tick_future = self.tasks.submit(fetch_dashboard, sid, chart, self.alerts, self.forecaster, on_done=self._apply_update,
+                                                  is_current=lambda: self.current_silo_id == sid and self.chart_range.get() == rng)
+        elif not self.current_silo_id and self._fleet_open() and not busy:
+            self._tick_future = self.tasks.submit(fetch_fleet, self.alerts, self.forecaster, on_done=self._apply_fleet)
         if not single_shot:
             self.after(5000, self.update_loop)
 
+    def _apply_fleet_alerts(self, active):
+        names = {d['id']: n for n, d in self.silos_map.items()}
+        others = [f"{names.get(sid, sid)}: {', '.join(label for label, _ in issues)}"
+                  for sid, issues in sorted(active.items()) if sid != self.current_silo_id]
+        if not others:
+            self.lbl_fleet.config(text="")
+            return
+        more = f"\n+{len(others) - 5} more" if len(others) > 5 else ""
+        self.lbl_fleet.config(text=f"{len(others)} other silo(s) in alert:\n" + "\n".join(others[:5]) + more)
+
+    def _apply_fleet(self, res):
+        self._apply_fleet_alerts(res['fleet_alerts'])
+        if self._fleet_open():
+            self._apply_fleet_grid(res['fleet'], res['fleet_alerts'], res.get('fleet_forecast', {}))
+
+    def _apply_update(self, res):
+        if self._first_data:
+            self._first_data = False
+            startup_mark("first data")
+        if 'fleet' in res:
+            self._apply_fleet(res)
+        latest = res['latest']
+        if latest:
+            lvl = latest['level_percent']
+            rad = self.silo_data['r']
+            ht = self.silo_data['h']
+            
+            total_vol = math.pi * (rad**2) * ht
+            curr_vol = total_vol * (lvl/100.0)
+            mass = curr_vol * 0.78 
+            
+            t_canvas = time.perf_counter()
+            self._update_visuals(lvl)
+            self.lbl_vol.config(text=f"{curr_vol:.1f} m³")
+            self.lbl_mass.config(text=f"{mass:.1f} t")
+            
+            # --- ALERT LOGIC ---
+            # the engine's debounced state, so the banner agrees with the fleet grid and the alert log
+            label = {m[0]: m[5] for m in silo_alerts.METRICS}
+            active = dict(self.alerts.active_alerts().get(res['silo_id'], []))
+            issues = []
+            temp_alert = label['temp'] in active
+            hum_alert = label['hum'] in active
+            lvl_alert = label['level'] in active
+            
+            if temp_alert: issues.append(f"{label['temp']} ({active[label['temp']]:.1f}°C)")
+            if hum_alert: issues.append(f"{label['hum']} ({active[label['hum']]:.1f}%)")
+            if lvl_alert: issues.append(label['level'])
+            
+            if issues:
+                self.lbl_status.config(text=f"⚠ ALERT: {', '.join(issues)}", foreground=self.colors['danger'])
+            else:
+                self.lbl_status.config(text="● SYSTEM NORMAL", foreground=self.colors['success'])
+
+            # GRAIN CONDITION LOGIC (SPOILAGE RISK)
+            if temp_alert or hum_alert:
+                self.lbl_cond.config(text="Warning: Spoilage Risk", foreground=self.colors['danger'])
+            elif lvl_alert:
+                self.lbl_cond.config(text="Optimal (Refill Needed)", foreground=self.colors['warning'])
+            else:
+                self.lbl_cond.config(text="Optimal", foreground=self.colors['success'])
+
+            hr = datetime.datetime.now().hour
+            bat = 100 - (hr % 5) 
+            self.lbl_battery.config(text=f"{bat}% (Good)")
+            silo_metrics.observe('silo_update_phase_seconds', time.perf_counter() - t_canvas, phase='canvas')
+
+            self._apply_chart(res['chart'])
+            
+            # EST DAYS LOGIC (robust fit over the segment since the last refill)
+            fc = res.get('forecast')
+            self.lbl_days_ci.config(text="")
+            if fc is None or fc['state'] == 'insufficient':
+                self.lbl_days.config(text="Calculating...")
+            elif fc['state'] == 'draining':
+                self.lbl_days.config(text=f"{fc['days']:.1f} Days", foreground=self.colors['warning'])
+                self.lbl_days_ci.config(text=f"90%: {format_days(fc['days_lo'])} – {format_days(fc['days_hi'])} days  ({fc['rate_per_day']:.1f}%/day)")
+            elif lvl < 20.0:
+                self.lbl_days.config(text="Stable (Low Level)", foreground=self.colors['danger'])
+            else:
+                self.lbl_days.config(text="Stable", foreground=self.colors['warning'])
+
 if __name__ == "__main__":
     ensure_db()
-    if SIMULATED:
-        threading.Thread(target=simulator_thread, daemon=True).start()
+    workers = [w for w, on in (('simulator', SIMULATED), ('ingest', INGEST_SERVER), ('retention', RETENTION)) if on]
+    service = silo_service.Service(workers, metrics_port=METRICS_PORT).start()
     app = SiloManagementApp()
-    app.mainloop()
\ No newline at end of file
+    try:
+        app.mainloop()
+    finally:
+        app.tasks.shutdown()
+        service.stop()
+        silo_ingest.shutdown()
+        silo_db.close()
\ No newline at end of file
@@ -0,0 +1,196 @@
+import datetime, logging, threading
+import numpy as np
+import silo_db
+
+log = logging.getLogger(__name__)
+
+# metric -> (reading column, threshold column, direction, hysteresis, label)
+# direction +1 alerts above the threshold, -1 below it. An alert clears only once the
+# value is back past the threshold by the hysteresis band.
+METRICS = (
+    ('temp', 'temp_c', 'threshold_temp', 1, 1.0, "HIGH TEMP"),
+    ('hum', 'humidity', 'threshold_moisture', 1, 0.5, "HIGH MOISTURE"),
+    ('level', 'level_percent', 'threshold_level_percent', -1, 2.0, "CRITICAL LOW LEVEL"),
+)
+DEBOUNCE = 2   # consecutive new readings needed to raise or clear an alert
+
+# one index seek per silo on (silo_id, timestamp); stays flat as telemetry grows.
+# Silos without readings come back with NULLs so the fleet view still lists them.
+SQL_FLEET_LATEST = """SELECT s.id, s.name, s.threshold_temp, s.threshold_moisture, s.threshold_level_percent,
+       t.timestamp, t.temp_c, t.humidity, t.level_percent
+FROM silos s LEFT JOIN telemetry t ON t.rowid = (
+    SELECT rowid FROM telemetry WHERE silo_id = s.id ORDER BY timestamp DESC LIMIT 1)
+ORDER BY s.id"""
+
+SQL_FLEET_SILOS = "SELECT id, name, threshold_temp, threshold_moisture, threshold_level_percent FROM silos ORDER BY id"
+
+# open alerts as recorded by whichever process runs the engine: the last event per silo/metric, if raised
+SQL_OPEN_ALERTS = """SELECT silo_id, metric, value, threshold, reading_ts FROM alert_events WHERE id IN
+                     (SELECT max(id) FROM alert_events GROUP BY silo_id, metric) AND state='raised'"""
+
+SQL_INSERT_EVENT = ("INSERT INTO alert_events (silo_id, metric, state, value, threshold, reading_ts, timestamp) "
+                    "VALUES (?,?,?,?,?,?,?)")
+
+
+def fetch_fleet_latest(cache=None):
+    # with a silo_cache.TelemetryCache only the (small) silos table is read
+    with silo_db.reader() as conn:
+        if cache is None:
+            rows = conn.execute(SQL_FLEET_LATEST).fetchall()
+        else:
+            silos = conn.execute(SQL_FLEET_SILOS).fetchall()
+    if cache is not None:
+        rows = []
+        for s in silos:
+            r = cache.latest(s[0])
+            rows.append((*s, *((silo_db.to_ms(r['timestamp']), r['temp_c'], r['humidity'], r['level_percent']) if r else (None,) * 4)))
+    n = len(rows)
+    cols = list(zip(*rows)) if rows else [()] * 9
+    f = lambda i: np.array([np.nan if v is None else v for v in cols[i]], dtype=float).reshape(n)
+    return {
+        'ids': np.array(cols[0], dtype=np.int64).reshape(n),
+        'names': list(cols[1]),
+        'thresholds': np.vstack([f(2), f(3), f(4)]) if n else np.empty((3, 0)),
+        'ts': np.array(cols[5], dtype=object).reshape(n),
+        'timestamps': list(cols[5]),   # epoch ms, None for silos without readings
+        'values': np.vstack([f(6), f(7), f(8)]) if n else np.empty((3, 0)),
+    }
+
+
+class AlertEngine:
+    def __init__(self, debounce=DEBOUNCE):
+        self.debounce = debounce
+        self.direction = np.array([m[3] for m in METRICS], dtype=float)[:, None]
+        self.hysteresis = np.array([m[4] for m in METRICS], dtype=float)[:, None]
+        self._lock = threading.Lock()
+        self.ids = np.empty(0, dtype=np.int64)
+        self.active = np.zeros((len(METRICS), 0), dtype=bool)
+        self.raise_streak = np.zeros((len(METRICS), 0), dtype=np.int32)
+        self.clear_streak = np.zeros((len(METRICS), 0), dtype=np.int32)
+        self.last_ts = np.empty(0, dtype=object)
+        self.last = None
+        self._restored = {}
+        self._loaded = False
+
+    def load_state(self):
+        # resume from the last event per silo/metric so a restart does not re-raise open alerts
+        with silo_db.reader() as conn:
+            rows = conn.execute("""SELECT silo_id, metric, state FROM alert_events WHERE id IN
+                                   (SELECT max(id) FROM alert_events GROUP BY silo_id, metric)""").fetchall()
+        keys = [m[0] for m in METRICS]
+        self._restored = {(sid, keys.index(metric)): state == 'raised' for sid, metric, state in rows if metric in keys}
+        self._loaded = True
+
+    def _align(self, ids):
+        if np.array_equal(ids, self.ids):
+            return
+        pos = {sid: i for i, sid in enumerate(self.ids.tolist())}
+        idx = np.array([pos.get(sid, -1) for sid in ids.tolist()], dtype=np.int64)
+        known = idx >= 0
+        m = len(METRICS)
+
+        def remap(old, fill, dtype):
+            new = np.full((m, len(ids)), fill, dtype=dtype)
+            new[:, known] = old[:, idx[known]]
+            return new
+
+        self.active = remap(self.active, False, bool)
+        self.raise_streak = remap(self.raise_streak, 0, np.int32)
+        self.clear_streak = remap(self.clear_streak, 0, np.int32)
+        last_ts = np.full(len(ids), None, dtype=object)
+        last_ts[known] = self.last_ts[idx[known]]
+        self.last_ts = last_ts
+        for j in np.nonzero(~known)[0]:
+            for k in range(m):
+                self.active[k, j] = self._restored.get((int(ids[j]), k), False)
+        self.ids = ids
+
+    def evaluate(self, fleet=None, now=None):
+        # one pass over every silo; returns the transitions written to alert_events
+        if not self._loaded:
+            self.load_state()
+        fleet = fleet or fetch_fleet_latest()
+        now = now or datetime.datetime.now()
+        with self._lock:
+            self._align(fleet['ids'])
+            v, thr = fleet['values'], fleet['thresholds']
+            with np.errstate(invalid='ignore'):
+                margin = self.direction * (v - thr)
+                over = margin > 0
+                back = margin < -self.hysteresis
+            fresh = fleet['ts'] != self.last_ts
+            self.raise_streak = np.where(fresh, np.where(over, self.raise_streak + 1, 0), self.raise_streak)
+            self.clear_streak = np.where(fresh, np.where(back, self.clear_streak + 1, 0), self.clear_streak)
+            raised = ~self.active & (self.raise_streak >= self.debounce)
+            cleared = self.active & (self.clear_streak >= self.debounce)
+            self.active = (self.active | raised) & ~cleared
+            self.last_ts = fleet['ts'].copy()
+            self.last = fleet
+
+            events = []
+            for k, j in zip(*np.nonzero(raised | cleared)):
+                events.append((int(fleet['ids'][j]), METRICS[k][0], 'raised' if raised[k, j] else 'cleared',
+                               float(v[k, j]), float(thr[k, j]), fleet['timestamps'][j], silo_db.to_ms(now)))
+        if events:
+            try:
+                with silo_db.writer() as conn:
+                    conn.executemany(SQL_INSERT_EVENT, events)
+            except Exception:
+                log.exception("could not record %d alert events", len(events))
+        return events
+
+    def active_alerts(self):
+        # {silo_id: [(label, value), ...]} for every silo with an open alert
+        with self._lock:
+            if self.last is None:
+                return {}
+            out = {}
+            for k, j in zip(*np.nonzero(self.active)):
+                out.setdefault(int(self.ids[j]), []).append((METRICS[k][5], float(self.last['values'][k, j])))
+            return out
+
+
+class RecordedAlerts:
+    # AlertEngine stand-in for clients of a silo_service process running the alerts worker: open
+    # alerts are read back from alert_events rather than evaluated (and recorded) a second time
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open = []
+        self.last = None
+
+    def evaluate(self, fleet=None, now=None):
+        fleet = fleet or fetch_fleet_latest()
+        with silo_db.reader() as conn:
+            rows = conn.execute(SQL_OPEN_ALERTS).fetchall()
+        with self._lock:
+            self.last = fleet
+            self._open = rows
+        return []
+
+    def active_alerts(self):
+        # same shape as AlertEngine.active_alerts(); values are the latest readings where known
+        with self._lock:
+            if self.last is None:
+                return {}
+            col = {sid: j for j, sid in enumerate(self.last['ids'].tolist())}
+            keys = [m[0] for m in METRICS]
+            out = {}
+            for sid, metric, value, _, _ in sorted(self._open, key=lambda r: (keys.index(r[1]) if r[1] in keys else -1, r[0])):
+                if metric not in keys or sid not in col:
+                    continue
+                k = keys.index(metric)
+                now = float(self.last['values'][k, col[sid]])
+                out.setdefault(sid, []).append((METRICS[k][5], value if now != now else now))
+            return out
+
+
+def recent_events(silo_id=None, limit=50):
+    with silo_db.reader() as conn:
+        if silo_id is None:
+            cur = conn.execute("SELECT silo_id, metric, state, value, threshold, reading_ts, timestamp FROM alert_events "
+                               "ORDER BY id DESC LIMIT ?", (limit,))
+        else:
+            cur = conn.execute("SELECT silo_id, metric, state, value, threshold, reading_ts, timestamp FROM alert_events "
+                               "WHERE silo_id=? ORDER BY id DESC LIMIT ?", (silo_id, limit))
+        keys = ('silo_id', 'metric', 'state', 'value', 'threshold', 'reading_ts', 'timestamp')
+        return [dict(zip(keys, (*r[:5], silo_db.from_ms(r[5]), silo_db.from_ms(r[6])))) for r in cur]
@@ -0,0 +1,457 @@
+import argparse, asyncio, collections, datetime, hashlib, json, logging, re, sys, threading, time
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+import silo_alerts, silo_archive, silo_cache, silo_db, silo_downsample, silo_metrics, silo_rollup, silo_server, silo_service
+
+log = logging.getLogger(__name__)
+
+# Read-only HTTP/JSON API for remote dashboards, on the same asyncio HTTP code as the ingest server.
+#   python silo_api.py serve --port 8090
+#   python silo_api.py loadtest --clients 300 --seconds 10
+# GET /api/silos                         silos and thresholds
+# GET /api/fleet                         latest reading, thresholds and open alerts of every silo
+# GET /api/silos/<id>/latest
+# GET /api/silos/<id>/history?range=24h&points=600     (or start/end epoch ms, resolution raw|hourly|daily)
+# GET /api/readings?silo=<id>&after=<next>&limit=500    raw rows, keyset paged on (silo_id, timestamp)
+# GET /api/alerts?silo=<id>&limit=50
+# Responses carry an ETag and are cached for CACHE_TTL seconds (at most MAX_ENTRIES); new telemetry for a silo drops its
+# cached responses at once (own writes via the writer, other processes via the SYNC_INTERVAL poll).
+
+API_PORT = 8090
+CACHE_TTL = 5.0
+SYNC_INTERVAL = 1.0      # seconds between polls for rows written by other processes
+PAGE_SIZE = 500
+MAX_PAGE = 5000
+HISTORY_POINTS = 600
+MAX_POINTS = 5000
+ALERT_LIMIT = 50
+MAX_ENTRIES = 4096       # cached responses kept, least recently used dropped first
+SILO_RELOAD_INTERVAL = 5.0   # unknown silo ids trigger at most one silos reload per interval
+INT_RANGE = (-(1 << 63), (1 << 63) - 1)     # SQLite INTEGER
+TS_RANGE = (0, 253402300799999)             # epoch ms up to 9999-12-31
+
+SQL_PAGE_SILO = ("SELECT silo_id, timestamp, distance_m, level_percent, temp_c, humidity FROM telemetry "
+                 "WHERE silo_id=? AND timestamp>? ORDER BY timestamp LIMIT ?")
+SQL_PAGE_ALL = ("SELECT silo_id, timestamp, distance_m, level_percent, temp_c, humidity FROM telemetry "
+                "WHERE (silo_id, timestamp) > (?, ?) ORDER BY silo_id, timestamp LIMIT ?")
+SQL_PAGE_TIES = ("SELECT silo_id, timestamp, distance_m, level_percent, temp_c, humidity FROM telemetry "
+                 "WHERE silo_id=? AND timestamp=?")
+
+READING_KEYS = ('silo_id', 'timestamp', 'distance_m', 'level_percent', 'temp_c', 'humidity')
+
+
+def _num(v):
+    # NaN is not JSON
+    return None if v is None or v != v else v
+
+
+def _list(a):
+    return [None if v != v else v for v in a.tolist()]
+
+
+def _in_range(v, name, valid=INT_RANGE):
+    if not valid[0] <= v <= valid[1]:
+        raise ValueError(f"{name} out of range")
+    return v
+
+
+def _int_arg(query, name, default, lo=None, hi=None, valid=INT_RANGE):
+    # lo/hi clamp; values outside `valid` are rejected
+    v = query.get(name, [None])[0]
+    if v is None or v == '':
+        return default
+    try:
+        v = int(v)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+    _in_range(v, name, valid)
+    if lo is not None:
+        v = max(lo, v)
+    return v if hi is None else min(hi, v)
+
+
+# --- QUERIES (run on executor threads) ---
+def query_silos():
+    keys = ('id', 'name', 'radius_m', 'height_m', 'threshold_moisture', 'threshold_temp',
+            'threshold_level_percent', 'next_service_date')
+    return {'silos': [dict(zip(keys, r)) for r in silo_service.get_all_silos()]}
+
+
+def query_fleet(cache):
+    cache.sync()
+    fleet = silo_alerts.fetch_fleet_latest(cache)
+    with silo_db.reader() as conn:
+        open_alerts = conn.execute(silo_alerts.SQL_OPEN_ALERTS).fetchall()
+    alerts = collections.defaultdict(list)
+    for sid, metric, value, threshold, reading_ts in open_alerts:
+        alerts[sid].append({'metric': metric, 'value': value, 'threshold': threshold, 'reading_ts': reading_ts})
+    out = []
+    for j, sid in enumerate(fleet['ids'].tolist()):
+        temp, hum, lvl = (_num(v) for v in fleet['values'][:, j].tolist())
+        t_temp, t_hum, t_lvl = (_num(v) for v in fleet['thresholds'][:, j].tolist())
+        out.append({'id': sid, 'name': fleet['names'][j], 'timestamp': fleet['timestamps'][j],
+                    'level_percent': lvl, 'temp_c': temp, 'humidity': hum,
+                    'thresholds': {'temp_c': t_temp, 'humidity': t_hum, 'level_percent': t_lvl},
+                    'alerts': alerts.get(sid, [])})
+    return {'silos': out}
+
+
+def query_latest(cache, silo_id):
+    cache.sync()
+    r = cache.latest(silo_id)
+    if r is None:
+        return {'silo_id': silo_id, 'latest': None}
+    return {'silo_id': silo_id, 'latest': dict(r, timestamp=silo_db.to_ms(r['timestamp']))}
+
+
+def query_history(silo_id, query):
+    now = datetime.datetime.now()
+    points = _int_arg(query, 'points', HISTORY_POINTS, 10, MAX_POINTS)
+    if 'start' in query:
+        start = silo_db.from_ms(_int_arg(query, 'start', 0, valid=TS_RANGE))
+        end = silo_db.from_ms(_int_arg(query, 'end', silo_db.to_ms(now), valid=TS_RANGE))
+        resolution = query.get('resolution', [None])[0]
+        if resolution not in (None, 'raw', 'hourly', 'daily'):
+            raise ValueError("resolution must be raw, hourly or daily")
+    else:
+        key = query.get('range', ['24h'])[0]
+        if key not in silo_service.CHART_RANGES:
+            raise ValueError(f"range must be one of {', '.join(silo_service.CHART_RANGES)}")
+        span, resolution = silo_service.CHART_RANGES[key]
+        start, end = (now - span if span else datetime.datetime(1970, 1, 1)), now
+    resolution, cols = silo_rollup.get_columns(silo_id, start, end, resolution)
+    ts = cols['timestamp'].astype(np.int64)
+    out = {'silo_id': silo_id, 'resolution': resolution, 'start': silo_db.to_ms(start), 'end': silo_db.to_ms(end)}
+    for name in ('level_percent', 'temp_c', 'humidity'):
+        # rollups send the bucket maximum for temperature/humidity so spikes stay visible, as the chart does
+        src = name if resolution == 'raw' or name == 'level_percent' else {'temp_c': 'temp_max', 'humidity': 'hum_max'}[name]
+        x, y = silo_downsample.downsample(ts.astype(np.float64), cols[src], points)
+        out[name] = {'ts': x.astype(np.int64).tolist(), 'values': _list(y)}
+    return out
+
+
+def query_readings(query):
+    # keyset page: rows strictly after the cursor in (silo_id, timestamp) order. Rows sharing the
+    # last (silo_id, timestamp) all go on the same page, so a cursor never skips one.
+    limit = _int_arg(query, 'limit', PAGE_SIZE, 1, MAX_PAGE)
+    silo = _int_arg(query, 'silo', None)
+    after = query.get('after', [None])[0]
+    try:
+        a_sid, a_ts = (int(x) for x in after.split(':')) if after else (silo if silo is not None else -1, -(1 << 62))
+    except ValueError:
+        raise ValueError("after must be <silo_id>:<timestamp_ms>")
+    _in_range(a_sid, 'after')
+    _in_range(a_ts, 'after')
+    with silo_db.reader() as conn:
+        if silo is not None:
+            if a_sid != silo:
+                raise ValueError("after belongs to another silo")
+            rows = conn.execute(SQL_PAGE_SILO, (silo, a_ts, limit + 1)).fetchall()
+        else:
+            rows = conn.execute(SQL_PAGE_ALL, (a_sid, a_ts, limit + 1)).fetchall()
+        more = len(rows) > limit
+        if more:
+            rows, nxt = rows[:limit], rows[limit]
+            last = rows[-1][:2]
+            if nxt[:2] == last:
+                rows = [r for r in rows if r[:2] != last] + conn.execute(SQL_PAGE_TIES, last).fetchall()
+    # `next` is also returned on the last page, so a client can keep polling from it for new rows
+    cursor = f"{rows[-1][0]}:{rows[-1][1]}" if rows else after
+    return {'readings': [dict(zip(READING_KEYS, r)) for r in rows], 'next': cursor, 'more': more}
+
+
+def query_alerts(query):
+    silo = _int_arg(query, 'silo', None)
+    events = silo_alerts.recent_events(silo, _int_arg(query, 'limit', ALERT_LIMIT, 1, 1000))
+    for e in events:
+        e['reading_ts'] = silo_db.to_ms(e['reading_ts']) if e['reading_ts'] else None
+        e['timestamp'] = silo_db.to_ms(e['timestamp'])
+    return {'events': events}
+
+
+# --- HTTP ---
+ROUTES = (
+    # pattern, query builder(api, match, query) -> (fn, args), cache tag: None = any silo, 'silo' = the matched silo
+    (re.compile(r"/api/silos"), lambda api, m, q: (query_silos, ()), None),
+    (re.compile(r"/api/fleet"), lambda api, m, q: (query_fleet, (api.cache,)), None),
+    (re.compile(r"/api/silos/(\d+)/latest"), lambda api, m, q: (query_latest, (api.cache, _in_range(int(m[1]), 'silo id'))), 'silo'),
+    (re.compile(r"/api/silos/(\d+)/history"), lambda api, m, q: (query_history, (_in_range(int(m[1]), 'silo id'), q)), 'silo'),
+    (re.compile(r"/api/readings"), lambda api, m, q: (query_readings, (q,)), 'query'),
+    (re.compile(r"/api/alerts"), lambda api, m, q: (query_alerts, (q,)), None),
+)
+
+_Entry = collections.namedtuple('_Entry', 'expires etag body tag')
+
+
+class ReadApi:
+    def __init__(self, cache=None, ttl=CACHE_TTL, max_entries=MAX_ENTRIES):
+        # without a cache, the API keeps its own, fed only by _sync_loop: no writer in a read-only process
+        self.cache = cache or silo_cache.reader_cache()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._responses = collections.OrderedDict()   # request target -> _Entry, least recently used first
+        self._tagged = collections.defaultdict(set)   # silo id (None: fleet-wide) -> targets
+        self._next_sweep = 0.0
+        self._generation = collections.Counter()      # tag -> writes seen; a store is dropped if its tag moved
+        self._inflight = {}
+        self._silo_ids = frozenset()
+        self._silos_loaded = float('-inf')
+        self._silos_reload = None
+        self.stats = {'hits': 0, 'misses': 0, 'not_modified': 0, 'invalidated': 0, 'evicted': 0}
+        self.cache.add_listener(self.invalidate)
+
+    def close(self):
+        self.cache.remove_listener(self.invalidate)
+
+    def invalidate(self, silo_ids):
+        # cache listener: runs on the writer / sync thread
+        with self._lock:
+            for sid in (None, *silo_ids):
+                self._generation[sid] += 1
+                for target in self._tagged.pop(sid, ()):
+                    if self._responses.pop(target, None) is not None:
+                        self.stats['invalidated'] += 1
+
+    def _store(self, target, body, tag, generation):
+        etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        entry = _Entry(time.monotonic() + self.ttl, etag, body, tag)
+        with self._lock:
+            if generation == self._generation[tag]:   # no telemetry for this tag arrived while it was computed
+                self._responses[target] = entry
+                self._responses.move_to_end(target)
+                self._tagged[tag].add(target)
+                self._evict(entry.expires - self.ttl)
+        return entry
+
+    def _evict(self, now):
+        # under _lock: expired entries (swept at most once per ttl), then the least recently used
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.ttl
+            for target in [t for t, e in self._responses.items() if e.expires <= now]:
+                self._drop(target)
+        while len(self._responses) > self.max_entries:
+            self._drop(next(iter(self._responses)))
+
+    def _drop(self, target):
+        entry = self._responses.pop(target)
+        targets = self._tagged.get(entry.tag)
+        if targets is not None:
+            targets.discard(target)
+            if not targets:
+                del self._tagged[entry.tag]
+        self.stats['evicted'] += 1
+
+    async def _known_silo(self, silo_id):
+        # unknown ids are answered with 404 before they reach the ring cache; a miss triggers at most
+        # one silos reload per interval, shared by the requests that arrive while it runs
+        if silo_id not in self._silo_ids:
+            if self._silos_reload is None and time.monotonic() - self._silos_loaded > SILO_RELOAD_INTERVAL:
+                self._silos_reload = asyncio.ensure_future(self._reload_silos())
+            if self._silos_reload is not None:
+                await asyncio.shield(self._silos_reload)
+        return silo_id in self._silo_ids
+
+    async def _reload_silos(self):
+        try:
+            rows = await asyncio.get_running_loop().run_in_executor(None, silo_service.get_all_silos)
+            self._silo_ids = frozenset(r[0] for r in rows)
+        finally:
+            self._silos_loaded = time.monotonic()
+            self._silos_reload = None
+
+    def _reply(self, entry, headers):
+        extra = {'ETag': entry.etag, 'Cache-Control': f"max-age={int(self.ttl)}"}
+        if headers.get('if-none-match') == entry.etag:
+            self.stats['not_modified'] += 1
+            return 304, b"", extra
+        return 200, entry.body, extra
+
+    async def handle_http(self, method, target, headers, body):
+        url = urlsplit(target)
+        for pattern, build, tag in ROUTES:
+            m = pattern.fullmatch(url.path)
+            if m:
+                break
+        else:
+            return 404, {'error': 'not found'}
+        if method != 'GET':
+            return 405, {'error': 'use GET'}
+        query = parse_qs(url.query)
+        try:
+            fn, args = build(self, m, query)
+            if tag == 'silo':
+                tag = int(m[1])
+            elif tag == 'query':
+                tag = _int_arg(query, 'silo', None)
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        if tag is not None and not await self._known_silo(tag):
+            return 404, {'error': 'unknown silo'}
+        route = fn.__name__[len('query_'):]
+        with self._lock:
+            entry = self._responses.get(target)
+            if entry is not None:
+                self._responses.move_to_end(target)
+        if entry is not None and entry.expires > time.monotonic():
+            self.stats['hits'] += 1
+            silo_metrics.inc('silo_api_requests_total', route=route, cache='hit')
+            return self._reply(entry, headers)
+
+        # concurrent misses for the same target share one query
+        fut = self._inflight.get(target)
+        if fut is None:
+            self.stats['misses'] += 1
+            silo_metrics.inc('silo_api_requests_total', route=route, cache='miss')
+            fut = self._inflight[target] = asyncio.ensure_future(self._compute(target, route, fn, args, tag))
+            fut.add_done_callback(lambda _: self._inflight.pop(target, None))
+        else:
+            silo_metrics.inc('silo_api_requests_total', route=route, cache='shared')
+        try:
+            entry = await asyncio.shield(fut)
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        except Exception:
+            log.exception("%s failed", target)
+            return 500, {'error': 'internal error'}
+        return self._reply(entry, headers)
+
+    async def _compute(self, target, route, fn, args, tag):
+        generation = self._generation[tag]
+        loop = asyncio.get_running_loop()
+        t0 = time.perf_counter()
+        payload = await loop.run_in_executor(None, fn, *args)
+        silo_metrics.observe('silo_api_query_seconds', time.perf_counter() - t0, route=route)
+        return self._store(target, json.dumps(payload, default=str, separators=(',', ':')).encode(), tag, generation)
+
+
+async def _sync_loop(cache, interval):
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await loop.run_in_executor(None, cache.sync)
+        except Exception:
+            log.exception("telemetry sync failed")
+            silo_metrics.inc('silo_errors_total', where='api_sync')
+
+
+async def start_server(api, host="127.0.0.1", port=API_PORT, sync_interval=SYNC_INTERVAL):
+    server = await asyncio.start_server(
+        lambda r, w: silo_server.serve_http_connection(r, w, api.handle_http), host, port, backlog=1024)
+    api.sync_task = asyncio.ensure_future(_sync_loop(api.cache, sync_interval))
+    return server
+
+
+def start_in_thread(host="127.0.0.1", port=API_PORT, cache=None):
+    # API on a daemon thread (silo_service 'api' worker); returns the ReadApi, its loop in .loop
+    api = ReadApi(cache)
+    started = threading.Event()
+
+    def run():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        api.server = loop.run_until_complete(start_server(api, host, port))
+        api.loop = loop
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, name="read-api", daemon=True).start()
+    started.wait(5.0)
+    log.info("read API on http://%s:%d/api/fleet", host, port)
+    return api
+
+
+def stop_in_thread(api, timeout=5.0):
+    async def shutdown():
+        api.sync_task.cancel()
+        api.server.close()
+        await asyncio.gather(api.sync_task, api.server.wait_closed(), return_exceptions=True)
+
+    asyncio.run_coroutine_threadsafe(shutdown(), api.loop).result(timeout)
+    api.loop.call_soon_threadsafe(api.loop.stop)
+    api.close()
+
+
+# --- LOAD TEST ---
+async def _poller(host, port, paths, until, latencies, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    etags = {}
+    i = 0
+    try:
+        while time.monotonic() < until:
+            path = paths[i % len(paths)]
+            i += 1
+            cond = f"If-None-Match: {etags[path]}\r\n" if path in etags else ""
+            t0 = time.perf_counter()
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n{cond}\r\n".encode())
+            await writer.drain()
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            while True:
+                h = await reader.readline()
+                if h in (b'\r\n', b''):
+                    break
+                k, _, v = h.decode('latin-1').partition(':')
+                if k.lower() == 'content-length':
+                    length = int(v)
+                elif k.lower() == 'etag':
+                    etags[path] = v.strip()
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - t0)
+            statuses[status] += 1
+            await asyncio.sleep(0.05)   # a polling dashboard, not a flood
+    finally:
+        writer.close()
+
+
+async def load_test(host, port, clients, seconds):
+    silos = [s[0] for s in silo_service.get_all_silos()] or [1]
+    latencies, statuses = [], collections.Counter()
+    until = time.monotonic() + seconds
+    await asyncio.gather(*(_poller(host, port, ["/api/fleet", f"/api/silos/{silos[i % len(silos)]}/latest",
+                                                f"/api/silos/{silos[i % len(silos)]}/history?range=24h"],
+                                   until, latencies, statuses) for i in range(clients)))
+    latencies.sort()
+    n = len(latencies)
+    print(f"{n:,} requests from {clients} clients in {seconds:.0f}s -> {n / seconds:,.0f} req/s  "
+          f"status {dict(statuses)}")
+    print(f"latency p50 {latencies[n // 2] * 1000:.2f} ms  p99 {latencies[int(n * 0.99)] * 1000:.2f} ms")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="read-only HTTP/JSON API for dashboards")
+    ap.add_argument("command", choices=["serve", "loadtest"], nargs="?", default="serve")
+    ap.add_argument("--db", default=silo_db.DB)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=API_PORT)
+    ap.add_argument("--ttl", type=float, default=CACHE_TTL)
+    ap.add_argument("--archive-dir", help="retention archive, if not the default next to the database")
+    ap.add_argument("--clients", type=int, default=200, help="loadtest: concurrent polling clients")
+    ap.add_argument("--seconds", type=float, default=10.0, help="loadtest: duration")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    silo_db.configure(args.db)
+    silo_archive.configure(args.archive_dir)
+
+    if args.command == "loadtest":
+        asyncio.run(load_test(args.host, args.port, args.clients, args.seconds))
+        silo_db.close()
+        return 0
+
+    async def run():
+        await start_server(ReadApi(ttl=args.ttl), args.host, args.port)
+        log.info("read API on http://%s:%d/api/fleet", args.host, args.port)
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        silo_db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+import argparse, datetime, json, os, platform, random, shutil, sqlite3, statistics, sys, tempfile, time
+os.environ.setdefault("MPLBACKEND", "Agg")
+import numpy as np
+import silo_db
+
+# Usage:
+#   python silo_bench.py                                   # 10k, 1M and 10M rows -> bench_results.json
+#   python silo_bench.py --sizes 10k,1M --baseline bench_baseline.json
+#   python silo_bench.py --sizes 1M --save-baseline bench_baseline.json
+#   python silo_bench.py --migrate --rows 10000000 --silos 50   # v1 text-timestamp database -> current schema
+# Databases are built once per size under --workdir and reused (each run works on a fresh copy, since
+# the ingest and dashboard steps write); never touches silo_system.sqlite3.
+# Metrics ending in _per_s are throughputs (higher is better), everything else is time (lower is better).
+
+SIZES = {'10k': 10000, '1M': 1000000, '10M': 10000000}
+SILOS = 50
+INTERVAL_S = 60          # one reading per silo per minute: 10M rows over 50 silos is ~140 days
+SEED = 1
+TOLERANCE = 0.20         # more than 20 % worse than the baseline is a regression...
+NOISE_MS = 0.05          # ...and, for timings, more than this many ms worse
+REPEAT = 3               # export and PDF report the median of this many runs
+BASELINE = "bench_baseline.json"
+
+
+def build_db(path, rows, silos, chunk=50000, seed=1):
+    # schema v1 with text timestamps, as the first releases wrote them (for --migrate)
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    silo_db.migrate(conn, target=1)
+    conn.executemany("INSERT INTO silos (owner_id,name,radius_m,height_m,token,threshold_moisture,threshold_temp,threshold_level_percent,next_service_date) VALUES (?,?,?,?,?,?,?,?,?)",
+                     [(1, f"Bench {i:04d}", 2.5, 8.0, f"tk-b{i}", 14.0, 35.0, 10.0, None) for i in range(silos)])
+    start = datetime.datetime(2020, 1, 1)
+    per_silo = max(1, rows // silos)
+    step = datetime.timedelta(seconds=5)
+
+    def gen():
+        for i in range(rows):
+            sid = i % silos + 1
+            ts = start + step * (i // silos)
+            lvl = 100.0 * (1 - (i // silos) / per_silo)
+            yield (sid, ts.isoformat(" "), 8.0 * (1 - lvl / 100.0), lvl, 24 + rnd.random() * 4, 12 + rnd.random() * 2, "{}")
+
+    it = gen()
+    while True:
+        batch = [r for _, r in zip(range(chunk), it)]
+        if not batch: break
+        conn.executemany("INSERT INTO telemetry (silo_id,timestamp,distance_m,level_percent,temp_c,humidity,raw_json) VALUES (?,?,?,?,?,?,?)", batch)
+        conn.commit()
+    conn.close()
+
+
+def build_bench_db(path, rows, silos, seed=SEED):
+    # realistic synthetic history ending now, written the way a bulk backfill would -> rows/s
+    import silo_loadgen
+    silo_db.configure(path)
+    with silo_db.writer() as conn:
+        silo_db.migrate(conn)
+    ids, heights = silo_loadgen.ensure_silos(silos)
+    fleet = silo_loadgen.Fleet(ids[:silos], heights[:silos], seed=seed)
+    end = datetime.datetime.now().replace(microsecond=0)
+    start = end - datetime.timedelta(seconds=INTERVAL_S * max(1, rows // silos))
+    t0 = time.perf_counter()
+    n = silo_loadgen.backfill(fleet, start, end, INTERVAL_S)
+    return n / (time.perf_counter() - t0)
+
+
+def percentiles(samples):
+    s = sorted(samples)
+    return {'p50': s[len(s) // 2], 'p99': s[min(len(s) - 1, int(len(s) * 0.99))], 'max': s[-1], 'mean': statistics.fmean(s)}
+
+
+def _timed(fn, args_list):
+    samples = []
+    for args in args_list:
+        t0 = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return percentiles(samples)
+
+
+def bench_latest(silos, n=2000):
+    from silo_service import get_latest
+    ids = [random.randint(1, silos) for _ in range(n)]
+    get_latest(ids[0])
+    return _timed(get_latest, [(sid,) for sid in ids])
+
+
+def bench_history(silos, n=500, limit=500):
+    from silo_service import get_history
+    get_history(1, limit)
+    return _timed(get_history, [(random.randint(1, silos), limit) for _ in range(n)])
+
+
+def bench_export(silo_ids, workdir):
+    import silo_export
+    path = os.path.join(workdir, "export.csv")
+    rates = []
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        n = silo_export.export_csv(path, silo_ids)
+        rates.append(n / (time.perf_counter() - t0))
+    os.remove(path)
+    return statistics.median(rates)
+
+
+def bench_pdf(silo_id, workdir, days=30):
+    import silo_report
+    path = os.path.join(workdir, "report.pdf")
+    end = datetime.datetime.combine(datetime.date.today() + datetime.timedelta(days=1), datetime.time())
+    times = []
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        silo_report.render_silo_report(path, silo_id, end - datetime.timedelta(days=days), end)
+        times.append(time.perf_counter() - t0)
+    os.remove(path)
+    return statistics.median(times)
+
+
+def bench_dashboard(silos, n=30, range_key='24h'):
+    # one update_loop tick without Tk: a new reading per silo, then the background fetch
+    # (cache, chart, fleet alerts, forecasts) and an Agg redraw of the chart
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import silo_alerts, silo_forecast, silo_ingest, silo_service
+
+    fig = Figure(figsize=(6, 4))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    lines = {k: ax.plot([], [])[0] for k in ('lvl', 'tmp', 'hum')}
+    ax.xaxis_date()
+    alerts, forecaster = silo_alerts.AlertEngine(), silo_forecast.Forecaster()
+    writer = silo_ingest.get_writer()
+    state = {'buf': None}
+    rnd = random.Random(SEED)
+
+    def tick(sid):
+        res = silo_service.fetch_dashboard(sid, {'range_key': range_key, 'buf': state['buf'], 'width': 600}, alerts, forecaster)
+        chart = state['buf'] = res['chart']
+        if chart['changed']:
+            for k, line in lines.items():
+                line.set_data(*chart['plot'][k])
+            ax.relim()
+            ax.autoscale_view()
+        fig.canvas.draw()
+
+    t0 = time.perf_counter()
+    tick(1)
+    cold = (time.perf_counter() - t0) * 1000.0
+    samples = []
+    for _ in range(n):
+        now = datetime.datetime.now()
+        for sid in range(1, silos + 1):
+            writer.submit(sid, rnd.uniform(20, 80), rnd.uniform(15, 25), rnd.uniform(11, 14), ts=now, keep=True)
+        writer.flush()
+        t0 = time.perf_counter()
+        tick(1)
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return cold, percentiles(samples)
+
+
+def bench_ingest(silos, n=50000):
+    # raw BatchWriter throughput (no deadband), readings after the newest stored one
+    import silo_ingest
+    w = silo_ingest.BatchWriter().start()
+    t = silo_db.to_ms(datetime.datetime.now()) + 60000
+    rnd = random.Random(SEED)
+    t0 = time.perf_counter()
+    for i in range(n):
+        w.submit(i % silos + 1, rnd.uniform(0, 100), 20.0, 12.0, ts=t + (i // silos) * 1000)
+    w.stop(timeout=60)
+    return n / (time.perf_counter() - t0)
+
+
+def _remove_db(path):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def run_size(label, rows, silos, workdir, rebuild=False):
+    import silo_cache, silo_ingest
+    path = os.path.join(workdir, f"bench-{label}-{silos}-{SEED}.sqlite3")
+    run_path = path.replace(".sqlite3", ".run.sqlite3")
+    res = {}
+    if rebuild:
+        _remove_db(path)
+    if not os.path.exists(path):
+        print(f"[{label}] building {rows:,} rows -> {path}")
+        res['build_rows_per_s'] = build_bench_db(path, rows, silos)
+        silo_db.close()
+    _remove_db(run_path)
+    shutil.copyfile(path, run_path)
+    silo_db.configure(run_path)
+    try:
+        random.seed(SEED)
+        lat = bench_latest(silos)
+        res['latest_p50_ms'], res['latest_p99_ms'] = lat['p50'], lat['p99']
+        hist = bench_history(silos)
+        res['history_p50_ms'], res['history_p99_ms'] = hist['p50'], hist['p99']
+        res['export_rows_per_s'] = bench_export(list(range(1, silos + 1)), workdir)
+        res['pdf_s'] = bench_pdf(1, workdir)
+        cold, dash = bench_dashboard(silos)
+        res['dashboard_cold_ms'], res['dashboard_p50_ms'], res['dashboard_p99_ms'] = cold, dash['p50'], dash['p99']
+        silo_ingest.shutdown()
+        res['ingest_rows_per_s'] = bench_ingest(silos)
+    finally:
+        silo_cache.reset()
+        silo_ingest.shutdown()
+        silo_ingest.height_cache.invalidate()
+        silo_db.close()
+        _remove_db(run_path)
+    for k, v in res.items():
+        print(f"[{label}] {k:<20} {v:>14,.3f}")
+    return res
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    # -> number of regressions; prints every metric present in both runs
+    regressions = 0
+    for label, metrics in results.items():
+        for k, v in metrics.items():
+            base = baseline.get(label, {}).get(k)
+            if not base or not v:
+                continue
+            rate = k.endswith('_per_s')
+            worse = (base / v if rate else v / base) - 1.0
+            significant = rate or abs(v - base) * (1000.0 if k.endswith('_s') else 1.0) > NOISE_MS
+            flag = ""
+            if significant and abs(worse) > tolerance:
+                flag = "REGRESSION" if worse > 0 else "improved"
+            regressions += flag == "REGRESSION"
+            print(f"[{label}] {k:<20} {base:>12,.3f} -> {v:>12,.3f}  {-worse:+7.1%}  {flag}")
+    return regressions
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="data layer and dashboard refresh benchmarks")
+    ap.add_argument("--sizes", default=",".join(SIZES), help="comma separated, from " + ", ".join(SIZES))
+    ap.add_argument("--silos", type=int, default=SILOS)
+    ap.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "silo-bench"))
+    ap.add_argument("--rebuild", action="store_true", help="rebuild databases even if they exist")
+    ap.add_argument("--out", default="bench_results.json")
+    ap.add_argument("--baseline", default=BASELINE, help="compare against this results file if it exists")
+    ap.add_argument("--save-baseline", metavar="PATH", help="also write the results as the new baseline")
+    ap.add_argument("--tolerance", type=float, default=TOLERANCE)
+    ap.add_argument("--migrate", action="store_true", help="time the schema migration of a v1 database instead")
+    ap.add_argument("--rows", type=int, default=1000000, help="--migrate: rows in the v1 database")
+    ap.add_argument("--db", help="--migrate: reuse an existing v1 database")
+    args = ap.parse_args(argv)
+    os.makedirs(args.workdir, exist_ok=True)
+
+    if args.migrate:
+        path = args.db or os.path.join(tempfile.mkdtemp(prefix="silo-bench-"), "bench.sqlite3")
+        if not os.path.exists(path):
+            t0 = time.perf_counter()
+            build_db(path, args.rows, args.silos)
+            print(f"built {args.rows:,} rows in {time.perf_counter() - t0:.1f}s -> {path}")
+        silo_db.configure(path)
+        with silo_db.writer() as conn:
+            t0 = time.perf_counter()
+            silo_db.migrate(conn)
+            print(f"migrated to v{silo_db.schema_version(conn)} in {time.perf_counter() - t0:.1f}s")
+        res = bench_latest(args.silos)
+        print("get_latest  p50 {p50:.3f} ms  p99 {p99:.3f} ms  max {max:.3f} ms".format(**res))
+        silo_db.close()
+        return 0
+
+    results = {}
+    for label in args.sizes.split(","):
+        results[label] = run_size(label, SIZES[label], args.silos, args.workdir, args.rebuild)
+    doc = {
+        'meta': {'time': datetime.datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+                 'sqlite': sqlite3.sqlite_version, 'numpy': np.__version__, 'platform': platform.platform(),
+                 'silos': args.silos, 'seed': SEED},
+        'results': results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(doc, f, indent=2)
+    print(f"results -> {args.out}")
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(doc, f, indent=2)
+        print(f"baseline -> {args.save_baseline}")
+    elif args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            base = json.load(f)['results']
+        n = compare(results, base, args.tolerance)
+        print(f"{n} regression(s) beyond {args.tolerance:.0%} against {args.baseline}")
+        return 1 if n else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
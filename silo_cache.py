@@ -0,0 +1,235 @@
+import datetime, threading
+import numpy as np
+import silo_db
+
+RING_SIZE = 1024   # readings kept per silo: 8 B timestamp + 3 x 8 B values = 32 KB at the default
+
+# the newest RING_SIZE rows of every silo in one statement, an index seek per silo
+SQL_BULK = """SELECT t.silo_id, t.timestamp, t.level_percent, t.temp_c, t.humidity
+FROM silos s JOIN telemetry t ON t.rowid IN (
+    SELECT rowid FROM telemetry WHERE silo_id = s.id ORDER BY timestamp DESC LIMIT ?)
+ORDER BY t.silo_id, t.timestamp"""
+SQL_ONE = ("SELECT timestamp, level_percent, temp_c, humidity FROM telemetry "
+           "WHERE silo_id=? ORDER BY timestamp DESC LIMIT ?")
+SQL_SINCE_ROWID = ("SELECT rowid, silo_id, timestamp, level_percent, temp_c, humidity FROM telemetry "
+                   "WHERE rowid>? ORDER BY rowid")
+
+
+def _ts_array(values):
+    # stored epoch ms -> datetime64[ms] is a reinterpretation, not a parse
+    return np.fromiter(values, dtype=np.int64).astype('datetime64[ms]')
+
+
+def to_datetime(ts):
+    return ts.astype('datetime64[us]').astype(datetime.datetime)
+
+
+class Ring:
+    # fixed-size circular buffer of (timestamp, level, temp, humidity) columns
+    __slots__ = ('ts', 'val', 'head', 'count')
+
+    def __init__(self, size):
+        self.ts = np.zeros(size, dtype='datetime64[ms]')
+        self.val = np.zeros((3, size), dtype=np.float64)
+        self.head = 0
+        self.count = 0
+
+    @property
+    def size(self):
+        return len(self.ts)
+
+    def newest(self):
+        return self.ts[(self.head - 1) % self.size] if self.count else None
+
+    def oldest(self):
+        return self.ts[(self.head - self.count) % self.size] if self.count else None
+
+    def extend(self, ts, vals):
+        # ts must be ascending and newer than everything already held
+        k = len(ts)
+        if k > self.size:
+            ts, vals, k = ts[-self.size:], vals[:, -self.size:], self.size
+        idx = (self.head + np.arange(k)) % self.size
+        self.ts[idx] = ts
+        self.val[:, idx] = vals
+        self.head = (self.head + k) % self.size
+        self.count = min(self.count + k, self.size)
+
+    def window(self, n=None, since=None):
+        n = self.count if n is None else min(n, self.count)
+        idx = (self.head - n + np.arange(n)) % self.size
+        ts, val = self.ts[idx], self.val[:, idx]
+        if since is not None:
+            keep = ts >= np.datetime64(since, 'ms')
+            ts, val = ts[keep], val[:, keep]
+        return {'ts': ts, 'lvl': val[0], 'tmp': val[1], 'hum': val[2]}
+
+
+class TelemetryCache:
+    def __init__(self, size=RING_SIZE):
+        self.size = size
+        self._rings = {}
+        self._lock = threading.Lock()
+        self._watermark = 0
+        self._loaded = False
+        self._listeners = []
+        self.hits = 0
+        self.misses = 0
+
+    def add_listener(self, fn):
+        # fn(silo_ids) after new rows for those silos reached the cache (own writes or sync())
+        self._listeners.append(fn)
+
+    def remove_listener(self, fn):
+        if fn in self._listeners:
+            self._listeners.remove(fn)
+
+    def load(self):
+        with silo_db.reader() as conn:
+            # watermark first: anything committed in between is re-read by sync() and skipped as a duplicate
+            mark = conn.execute("SELECT max(rowid) FROM telemetry").fetchone()[0] or 0
+            rows = conn.execute(SQL_BULK, (self.size,)).fetchall()
+        rings = {}
+        if rows:
+            sids = np.array([r[0] for r in rows], dtype=np.int64)
+            ts = _ts_array(r[1] for r in rows)
+            vals = np.array([r[2:] for r in rows], dtype=np.float64).T
+            cuts = np.flatnonzero(np.diff(sids)) + 1
+            for lo, hi in zip(np.r_[0, cuts], np.r_[cuts, len(rows)]):
+                ring = Ring(self.size)
+                ring.extend(ts[lo:hi], vals[:, lo:hi])
+                rings[int(sids[lo])] = ring
+        with self._lock:
+            self._rings = rings
+            self._watermark = max(self._watermark, mark)
+            self._loaded = True
+
+    def _load_one(self, silo_id):
+        with silo_db.reader() as conn:
+            rows = conn.execute(SQL_ONE, (silo_id, self.size)).fetchall()[::-1]
+        ring = Ring(self.size)
+        if rows:
+            ring.extend(_ts_array(r[0] for r in rows), np.array([r[1:] for r in rows], dtype=np.float64).T)
+        with self._lock:
+            self._rings[silo_id] = ring
+        return ring
+
+    def _add(self, silo_id, ts, vals):
+        # caller holds the lock; ts/vals are one silo's new rows in any order
+        ring = self._rings.get(silo_id)
+        if ring is None:
+            if not self._loaded or silo_id in self._rings:
+                return   # not loaded yet, or marked stale: the next read reloads it from SQLite
+            ring = self._rings[silo_id] = Ring(self.size)
+        order = np.argsort(ts, kind='stable')
+        ts, vals = ts[order], vals[:, order]
+        newest = ring.newest()
+        if newest is not None:
+            old = ts[ts < newest]
+            old = old[~np.isin(old, ring.ts)]   # rows already held (sync re-reading our own writes) are fine
+            if len(old) and (ring.count < ring.size or old.max() > ring.oldest()):
+                # a back-filled reading lands inside the window: rebuild this silo on next read
+                self._rings[silo_id] = None
+                return
+            keep = ts > newest
+            ts, vals = ts[keep], vals[:, keep]
+        if len(ts):
+            ring.extend(ts, vals)
+
+    def _add_rows(self, sids, ts, vals):
+        changed = np.unique(sids).tolist()
+        with self._lock:
+            for sid in changed:
+                m = sids == sid
+                self._add(sid, ts[m], vals[:, m])
+        for fn in list(self._listeners):
+            fn(changed)
+
+    def on_rows(self, rows):
+        # BatchWriter listener: rows are telemetry insert tuples (silo_id, ts, distance, level, temp, hum, raw_json)
+        if not rows:
+            return
+        sids = np.array([r[0] for r in rows], dtype=np.int64)
+        self._add_rows(sids, _ts_array(r[1] for r in rows), np.array([r[3:6] for r in rows], dtype=np.float64).T)
+
+    def sync(self):
+        # picks up rows committed by other processes (e.g. a standalone ingest server)
+        with silo_db.reader() as conn:
+            rows = conn.execute(SQL_SINCE_ROWID, (self._watermark,)).fetchall()
+        if not rows:
+            return 0
+        self._watermark = max(self._watermark, rows[-1][0])
+        sids = np.array([r[1] for r in rows], dtype=np.int64)
+        self._add_rows(sids, _ts_array(r[2] for r in rows), np.array([r[3:] for r in rows], dtype=np.float64).T)
+        return len(rows)
+
+    def _ring(self, silo_id):
+        if not self._loaded:
+            self.load()
+        ring = self._rings.get(silo_id)
+        if ring is None:
+            self.misses += 1
+            return self._load_one(silo_id)
+        self.hits += 1
+        return ring
+
+    def window(self, silo_id, n=None, since=None):
+        # -> {'ts': datetime64[ms], 'lvl', 'tmp', 'hum'} copies in time order
+        ring = self._ring(silo_id)
+        with self._lock:
+            return ring.window(n, since)
+
+    def latest(self, silo_id):
+        ring = self._ring(silo_id)
+        with self._lock:
+            if not ring.count:
+                return None
+            i = (ring.head - 1) % ring.size
+            lvl, temp, hum = ring.val[:, i].tolist()
+            return {'timestamp': to_datetime(ring.ts[i]), 'level_percent': lvl, 'temp_c': temp, 'humidity': hum}
+
+    def covers(self, silo_id, start):
+        # True when the ring holds every reading from `start` on (or the silo's whole history)
+        ring = self._ring(silo_id)
+        with self._lock:
+            return ring.count < ring.size or ring.oldest() <= np.datetime64(start, 'ms')
+
+    def memory_bytes(self):
+        with self._lock:
+            return sum(r.ts.nbytes + r.val.nbytes for r in self._rings.values() if r is not None)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache(size=RING_SIZE):
+    # loaded once and kept current by the ingest writer; the first caller pays for the bulk query
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                import silo_ingest
+                cache = TelemetryCache(size)
+                cache.load()
+                silo_ingest.get_writer().add_listener(cache.on_rows)
+                _cache = cache
+    return _cache
+
+
+def reader_cache(size=RING_SIZE):
+    # a private cache kept current only by sync() (rowid watermark on a reader connection), for
+    # read-only processes that must not start the ingest writer
+    cache = TelemetryCache(size)
+    cache.load()
+    return cache
+
+
+def reset():
+    # drop the shared cache (another database was configured); the next get_cache() reloads
+    global _cache
+    with _cache_lock:
+        if _cache is not None:
+            import silo_ingest
+            silo_ingest.get_writer().remove_listener(_cache.on_rows)
+            _cache = None
@@ -0,0 +1,342 @@
+import datetime, sqlite3, threading, queue
+from contextlib import contextmanager
+import silo_metrics
+
+DB = "silo_system.sqlite3"
+
+# One writer, a few readers. WAL lets readers run while the writer commits,
+# busy_timeout covers the short window where another process holds the lock.
+READ_POOL_SIZE = 3
+BUSY_TIMEOUT_MS = 5000
+STATEMENT_CACHE = 128
+
+PRAGMAS = (
+    # must come before WAL creates the file; existing files need one VACUUM (silo_retention --full-vacuum)
+    "PRAGMA auto_vacuum=INCREMENTAL",
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA temp_store=MEMORY",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+)
+
+
+class ConnectionManager:
+    def __init__(self, path=DB, pool_size=READ_POOL_SIZE):
+        self.path = path
+        self.pool_size = pool_size
+        self._writer = None
+        self._write_lock = threading.RLock()
+        self._pool = queue.LifoQueue()
+        self._pool_lock = threading.Lock()
+        self._opened = 0
+        self._closed = False
+
+    def _connect(self, readonly=False):
+        conn = sqlite3.connect(self.path, detect_types=sqlite3.PARSE_DECLTYPES, timeout=BUSY_TIMEOUT_MS / 1000.0,
+                               check_same_thread=False, cached_statements=STATEMENT_CACHE,
+                               factory=silo_metrics.connection_factory())
+        for p in PRAGMAS:
+            conn.execute(p)
+        if readonly:
+            conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    def _get_writer(self):
+        if self._closed:
+            raise sqlite3.ProgrammingError("connection manager is closed")
+        if self._writer is None:
+            self._writer = self._connect()
+        return self._writer
+
+    @contextmanager
+    def write(self):
+        with self._write_lock:
+            conn = self._get_writer()
+            if conn.in_transaction:
+                # nested use from the same thread joins the outer transaction
+                yield conn
+                return
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    @contextmanager
+    def read(self):
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._release_reader(conn)
+
+    def _acquire_reader(self):
+        if self._closed:
+            raise sqlite3.ProgrammingError("connection manager is closed")
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        with self._pool_lock:
+            if self._opened < self.pool_size:
+                # make sure the writer has switched the file to WAL first
+                with self._write_lock:
+                    self._get_writer()
+                self._opened += 1
+                return self._connect(readonly=True)
+        return self._pool.get()
+
+    def _release_reader(self, conn):
+        if self._closed:
+            conn.close()
+        else:
+            self._pool.put(conn)
+
+    def close(self):
+        self._closed = True
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._pool_lock:
+            self._opened = 0
+
+
+# --- TIMESTAMPS ---
+# Readings are stored as integer milliseconds since 1970-01-01 on the same local wall clock the
+# app has always used (no timezone shift), so bucket maths is plain integer arithmetic.
+EPOCH = datetime.datetime(1970, 1, 1)
+MS = datetime.timedelta(milliseconds=1)
+
+
+def to_ms(ts):
+    if ts is None or isinstance(ts, int):
+        return ts
+    if not isinstance(ts, datetime.datetime):
+        ts = datetime.datetime.fromisoformat(str(ts))
+    return (ts - EPOCH) // MS
+
+
+def from_ms(ms):
+    return None if ms is None else EPOCH + ms * MS
+
+
+# text 'YYYY-MM-DD HH:MM:SS[.ffffff]' -> epoch ms, evaluated once per row by the migration
+_TEXT_TO_MS = "CAST(round((julianday({c}) - 2440587.5) * 86400000) AS INTEGER)"
+
+_ROLLUP_DDL = '''CREATE TABLE {t} (
+            silo_id INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            n INTEGER NOT NULL,
+            level_min REAL, level_max REAL, level_sum REAL, level_last REAL,
+            temp_min REAL, temp_max REAL, temp_sum REAL, temp_last REAL,
+            hum_min REAL, hum_max REAL, hum_sum REAL, hum_last REAL,
+            last_ts INTEGER,
+            PRIMARY KEY (silo_id, bucket)
+        ) WITHOUT ROWID'''
+
+# rollup backfill as of the epoch-ms schema. Frozen here rather than calling silo_rollup, so later
+# changes to the live rollup code cannot alter what an old migration does.
+_ROLLUP_BACKFILL = [
+    '''INSERT INTO {t} (silo_id, bucket, n, level_min, level_max, level_sum, level_last, temp_min, temp_max, temp_sum,
+                       temp_last, hum_min, hum_max, hum_sum, hum_last, last_ts)
+        SELECT silo_id, timestamp - timestamp % {ms}, count(*), min(level_percent), max(level_percent), total(level_percent), NULL,
+               min(temp_c), max(temp_c), total(temp_c), NULL, min(humidity), max(humidity), total(humidity), NULL, max(timestamp)
+        FROM telemetry GROUP BY 1, 2''',
+    '''UPDATE {t} SET (level_last, temp_last, hum_last) =
+        (SELECT level_percent, temp_c, humidity FROM telemetry x WHERE x.silo_id={t}.silo_id AND x.timestamp={t}.last_ts LIMIT 1)''',
+]
+_HOUR_MS, _DAY_MS = 3600 * 1000, 24 * 3600 * 1000
+
+
+# --- SCHEMA MIGRATIONS ---
+# Each entry moves the database from version N to N+1 (tracked in PRAGMA user_version).
+# Append only: never edit or reorder a migration once it has shipped.
+MIGRATIONS = [
+    ("base schema", [
+        '''CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, email TEXT)''',
+        '''CREATE TABLE IF NOT EXISTS silos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            owner_id INTEGER,
+            name TEXT,
+            radius_m REAL,
+            height_m REAL,
+            token TEXT,
+            threshold_moisture REAL,
+            threshold_temp REAL,
+            threshold_level_percent REAL,
+            next_service_date DATE
+        )''',
+        '''CREATE TABLE IF NOT EXISTS telemetry (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            silo_id INTEGER,
+            timestamp TIMESTAMP,
+            distance_m REAL,
+            level_percent REAL,
+            temp_c REAL,
+            humidity REAL,
+            raw_json TEXT
+        )''',
+    ]),
+    ("telemetry (silo_id, timestamp) covering index", [
+        # the trailing value columns let latest/history reads skip the table lookup
+        '''CREATE INDEX IF NOT EXISTS idx_telemetry_silo_ts
+            ON telemetry (silo_id, timestamp, level_percent, temp_c, humidity)''',
+        "ANALYZE telemetry",
+    ]),
+    ("hourly/daily rollup tables", [
+        '''CREATE TABLE IF NOT EXISTS telemetry_hourly (
+            silo_id INTEGER NOT NULL,
+            bucket TIMESTAMP NOT NULL,
+            n INTEGER NOT NULL,
+            level_min REAL, level_max REAL, level_sum REAL, level_last REAL,
+            temp_min REAL, temp_max REAL, temp_sum REAL, temp_last REAL,
+            hum_min REAL, hum_max REAL, hum_sum REAL, hum_last REAL,
+            last_ts TIMESTAMP,
+            PRIMARY KEY (silo_id, bucket)
+        ) WITHOUT ROWID''',
+        '''CREATE TABLE IF NOT EXISTS telemetry_daily (
+            silo_id INTEGER NOT NULL,
+            bucket TIMESTAMP NOT NULL,
+            n INTEGER NOT NULL,
+            level_min REAL, level_max REAL, level_sum REAL, level_last REAL,
+            temp_min REAL, temp_max REAL, temp_sum REAL, temp_last REAL,
+            hum_min REAL, hum_max REAL, hum_sum REAL, hum_last REAL,
+            last_ts TIMESTAMP,
+            PRIMARY KEY (silo_id, bucket)
+        ) WITHOUT ROWID''',
+        # no backfill: timestamps are still text here, and the epoch-ms migration rebuilds both tables
+    ]),
+    ("alert events", [
+        '''CREATE TABLE IF NOT EXISTS alert_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            silo_id INTEGER NOT NULL,
+            metric TEXT NOT NULL,
+            state TEXT NOT NULL,
+            value REAL,
+            threshold REAL,
+            reading_ts TIMESTAMP,
+            timestamp TIMESTAMP
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_alert_events_silo ON alert_events (silo_id, timestamp)",
+    ]),
+    ("integer epoch-ms timestamps", [
+        # tables are rebuilt so the columns are declared INTEGER (PARSE_DECLTYPES would
+        # otherwise run the TIMESTAMP converter on the new values)
+        '''CREATE TABLE telemetry_ms (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            silo_id INTEGER,
+            timestamp INTEGER,
+            distance_m REAL,
+            level_percent REAL,
+            temp_c REAL,
+            humidity REAL,
+            raw_json TEXT
+        )''',
+        "INSERT INTO telemetry_ms SELECT id, silo_id, " + _TEXT_TO_MS.format(c='timestamp') +
+        ", distance_m, level_percent, temp_c, humidity, raw_json FROM telemetry",
+        "DROP TABLE telemetry",
+        "ALTER TABLE telemetry_ms RENAME TO telemetry",
+        '''CREATE INDEX idx_telemetry_silo_ts
+            ON telemetry (silo_id, timestamp, level_percent, temp_c, humidity)''',
+        '''CREATE TABLE alert_events_ms (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            silo_id INTEGER NOT NULL,
+            metric TEXT NOT NULL,
+            state TEXT NOT NULL,
+            value REAL,
+            threshold REAL,
+            reading_ts INTEGER,
+            timestamp INTEGER
+        )''',
+        "INSERT INTO alert_events_ms SELECT id, silo_id, metric, state, value, threshold, " +
+        _TEXT_TO_MS.format(c='reading_ts') + ", " + _TEXT_TO_MS.format(c='timestamp') + " FROM alert_events",
+        "DROP TABLE alert_events",
+        "ALTER TABLE alert_events_ms RENAME TO alert_events",
+        "CREATE INDEX idx_alert_events_silo ON alert_events (silo_id, timestamp)",
+        "DROP TABLE telemetry_hourly",
+        "DROP TABLE telemetry_daily",
+        _ROLLUP_DDL.format(t='telemetry_hourly'),
+        _ROLLUP_DDL.format(t='telemetry_daily'),
+        *(s.format(t='telemetry_hourly', ms=_HOUR_MS) for s in _ROLLUP_BACKFILL),
+        *(s.format(t='telemetry_daily', ms=_DAY_MS) for s in _ROLLUP_BACKFILL),
+        "ANALYZE",
+    ]),
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, target=SCHEMA_VERSION):
+    current = schema_version(conn)
+    if current > SCHEMA_VERSION:
+        raise RuntimeError(f"database schema v{current} is newer than this build (v{SCHEMA_VERSION})")
+    if conn.in_transaction:
+        conn.commit()
+    for version in range(current, target):
+        name, steps = MIGRATIONS[version]
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f"PRAGMA user_version={version + 1}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    return schema_version(conn)
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def configure(path=DB, pool_size=READ_POOL_SIZE):
+    global _manager
+    with _manager_lock:
+        if _manager is not None:
+            _manager.close()
+        _manager = ConnectionManager(path, pool_size)
+    return _manager
+
+
+def get_manager():
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = ConnectionManager(DB)
+    return _manager
+
+
+def reader():
+    return get_manager().read()
+
+
+def writer():
+    return get_manager().write()
+
+
+def close():
+    global _manager
+    with _manager_lock:
+        if _manager is not None:
+            _manager.close()
+            _manager = None
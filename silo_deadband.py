@@ -0,0 +1,98 @@
+import threading
+import numpy as np
+
+# Swinging-door style compression of telemetry rows at ingest.
+# A reading is dropped when the straight line from the last stored row to it stays within the
+# tolerance of every reading dropped since, for all three metrics. Readers rebuild the series
+# by linear interpolation between stored rows (reconstruct()), so the error is bounded by
+# TOLERANCES. Rows are (silo_id, ts_ms, dist, lvl, temp, hum, raw_json) as in silo_ingest.
+TOLERANCES = {'level_percent': 0.25, 'temp_c': 0.2, 'humidity': 0.5}
+# A stable silo still stores one row per heartbeat, which caps compression at heartbeat / reading
+# interval (12x for 5 s readings at the default); 0 turns it off, leaving MAX_PENDING as the cap.
+HEARTBEAT_MS = 60 * 1000
+MAX_PENDING = 256          # dropped readings held per silo for the corridor check
+
+_VALUES = slice(3, 6)
+
+
+class _Door:
+    __slots__ = ('anchor', 'ts', 'vals', 'pending')
+
+    def __init__(self, row):
+        self.reset(row)
+
+    def reset(self, row):
+        self.anchor = row
+        self.ts = []
+        self.vals = []
+        self.pending = None
+
+
+class SwingingDoor:
+    def __init__(self, tolerances=None, heartbeat_ms=None):
+        tol = dict(TOLERANCES, **(tolerances or {}))
+        self.tol = np.array([tol['level_percent'], tol['temp_c'], tol['humidity']])
+        self.heartbeat_ms = HEARTBEAT_MS if heartbeat_ms is None else heartbeat_ms
+        self._doors = {}
+        self._lock = threading.Lock()
+        self.offered = 0
+        self.stored = 0
+
+    def _fits(self, door, row):
+        # does the line anchor -> row stay within tolerance of every reading dropped since the anchor?
+        if not door.ts:
+            return True
+        a_ts, a_val = door.anchor[1], np.array(door.anchor[_VALUES], dtype=float)
+        slope = (np.array(row[_VALUES], dtype=float) - a_val) / (row[1] - a_ts)
+        dt = np.array(door.ts, dtype=float)[:, None] - a_ts
+        err = np.abs(a_val + slope * dt - np.array(door.vals, dtype=float))
+        return bool((err <= self.tol).all())
+
+    def offer(self, row, force=False):
+        # -> the rows to store now: [], [row] or [previous reading, row]. force stores the row
+        # regardless (manual readings) and starts a new segment from it.
+        with self._lock:
+            self.offered += 1
+            out = self._offer(row, force)
+            self.stored += len(out)
+            return out
+
+    def _offer(self, row, force):
+        door = self._doors.get(row[0])
+        if door is None:
+            self._doors[row[0]] = _Door(row)
+            return [row]
+        if row[1] <= door.anchor[1] or None in row[_VALUES] or None in door.anchor[_VALUES]:
+            # late, duplicate or incomplete readings are stored as they are
+            if row[1] > door.anchor[1]:
+                door.reset(row)
+            return [row]
+        fits = not force and self._fits(door, row)
+        due = self.heartbeat_ms and row[1] - door.anchor[1] >= self.heartbeat_ms
+        if fits and not due and len(door.ts) < MAX_PENDING:
+            door.ts.append(row[1])
+            door.vals.append(row[_VALUES])
+            door.pending = row
+            return []
+        # the corridor broke (or the heartbeat is due): the last dropped reading closes the
+        # previous segment and this one is stored at once, so changes reach readers without delay
+        out = [row] if fits or door.pending is None else [door.pending, row]
+        door.reset(row)
+        return out
+
+    def flush(self):
+        # the last dropped reading of every silo, e.g. before shutdown
+        with self._lock:
+            out = []
+            for door in self._doors.values():
+                if door.pending is not None:
+                    out.append(door.pending)
+                    door.reset(door.pending)
+            self.stored += len(out)
+            return out
+
+
+def reconstruct(ts, values, at):
+    # value of a compressed series at the datetime64 / epoch-ms points `at` (linear between stored rows)
+    x = np.asarray(ts).astype('datetime64[ms]').astype(np.int64)
+    return np.interp(np.asarray(at).astype('datetime64[ms]').astype(np.int64), x, values)
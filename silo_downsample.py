@@ -0,0 +1,39 @@
+import numpy as np
+
+
+def lttb(x, y, n_out):
+    # Largest-Triangle-Three-Buckets: returns the indices of the points to keep.
+    # Bucket means come from one cumulative sum and every bucket's triangle areas are
+    # computed as a single array op; only the walk over buckets stays in Python
+    # because each pick depends on the previous one.
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    cx = np.concatenate(([0.0], np.cumsum(x)))
+    cy = np.concatenate(([0.0], np.cumsum(np.nan_to_num(y))))
+    cnt = np.diff(edges)
+    mean_x = (cx[edges[1:]] - cx[edges[:-1]]) / cnt
+    mean_y = (cy[edges[1:]] - cy[edges[:-1]]) / cnt
+    # the third triangle vertex is the mean of the following bucket (the last point for the final bucket)
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        xs, ys = x[lo:hi], y[lo:hi]
+        area = np.abs((x[a] - next_x[i]) * (ys - y[a]) - (x[a] - xs) * (next_y[i] - y[a]))
+        a = lo + int(np.argmax(np.nan_to_num(area, nan=-1.0)))
+        out[i + 1] = a
+    return out
+
+
+def downsample(x, y, n_out):
+    idx = lttb(x, y, n_out)
+    return np.asarray(x)[idx], np.asarray(y)[idx]
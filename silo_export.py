@@ -0,0 +1,91 @@
+import csv, gzip
+import numpy as np
+import silo_archive, silo_db
+
+CHUNK = 5000
+WRITE_BUFFER = 1 << 20
+
+HEADER = ["Timestamp", "Level %", "Temp C", "Humidity %"]
+
+# epoch ms are formatted by SQLite itself, so no Python datetime is created per row
+SQL_EXPORT = ("SELECT strftime('%Y-%m-%d %H:%M:%f', timestamp / 1000.0, 'unixepoch'), level_percent, temp_c, humidity "
+              "FROM telemetry WHERE silo_id=? AND timestamp>=? AND timestamp<? ORDER BY timestamp")
+
+MIN_TS = -(1 << 62)
+MAX_TS = 1 << 62
+
+
+def _bounds(start, end):
+    return (MIN_TS if start is None else silo_db.to_ms(start)), (MAX_TS if end is None else silo_db.to_ms(end))
+
+
+def _archive_rows(silo_id, start, end, chunk):
+    # readings that retention has moved out of SQLite, formatted like SQL_EXPORT rows
+    with silo_db.reader() as conn:
+        live_from = conn.execute("SELECT min(timestamp) FROM telemetry WHERE silo_id=?", (silo_id,)).fetchone()[0]
+    start_ms = None if start is None else silo_db.to_ms(start)
+    end_ms = None if end is None else silo_db.to_ms(end)
+    if live_from is not None:
+        if start_ms is not None and start_ms >= live_from:
+            return
+        end_ms = live_from if end_ms is None else min(end_ms, live_from)
+    names = ('level_percent', 'temp_c', 'humidity')
+    for _, path, fmt in silo_archive.partitions(silo_id, start_ms, end_ms):
+        # one silo-day at a time, so memory stays bounded by the largest partition
+        cols = silo_archive.read_columns(path, fmt, start_ms, end_ms, names)
+        ts = np.char.replace(np.datetime_as_string(cols['timestamp'], unit='ms'), 'T', ' ').tolist()
+        vals = [[None if v != v else v for v in cols[k].tolist()] for k in names]
+        rows = list(zip(ts, *vals))
+        for i in range(0, len(rows), chunk):
+            yield rows[i:i + chunk]
+
+
+def estimate_rows(silo_ids, start=None, end=None):
+    # the daily rollup already counts rows per silo/day, so this costs a few hundred row reads at most
+    marks = ','.join('?' * len(silo_ids))
+    with silo_db.reader() as conn:
+        n = conn.execute(f"SELECT total(n) FROM telemetry_daily WHERE silo_id IN ({marks}) AND bucket>=? AND bucket<?",
+                         (*silo_ids, *_bounds(start, end))).fetchone()[0]
+    return int(n)
+
+
+def open_output(path, compress=None):
+    if compress is None:
+        compress = path.endswith('.gz')
+    if compress:
+        return gzip.open(path, 'wt', newline='', compresslevel=6)
+    return open(path, 'w', newline='', buffering=WRITE_BUFFER)
+
+
+def export_csv(path, silo_ids, start=None, end=None, compress=None, names=None, progress=None, chunk=CHUNK):
+    # streams start <= timestamp < end for each silo in chunks of `chunk` rows; memory stays flat
+    multi = len(silo_ids) > 1
+    total = estimate_rows(silo_ids, start, end) if progress else 0
+    written = 0
+    with open_output(path, compress) as f:
+        writer = csv.writer(f)
+        writer.writerow(["Silo"] + HEADER if multi else HEADER)
+        for sid in silo_ids:
+            label = (names or {}).get(sid, sid)
+            for rows in _archive_rows(sid, start, end, chunk):
+                if multi:
+                    writer.writerows((label, *r) for r in rows)
+                else:
+                    writer.writerows(rows)
+                written += len(rows)
+                if progress:
+                    progress(written, max(total, written))
+            with silo_db.reader() as conn:
+                cur = conn.execute(SQL_EXPORT, (sid, *_bounds(start, end)))
+                while True:
+                    rows = cur.fetchmany(chunk)
+                    if not rows:
+                        break
+                    if multi:
+                        writer.writerows((label, *r) for r in rows)
+                    else:
+                        writer.writerows(rows)
+                    written += len(rows)
+                    if progress:
+                        progress(written, max(total, written))
+    return written
@@ -0,0 +1,158 @@
+import datetime, threading
+import numpy as np
+
+WINDOW = datetime.timedelta(hours=24)   # history considered per silo (further bounded by the cache ring)
+MIN_POINTS = 6
+MIN_SPAN_H = 0.05
+STABLE_DROP = 0.5     # % fitted drop across the segment below which a silo counts as stable
+REFILL_STEP = 5.0     # a rise of more than this many % between 3-reading medians is a refill
+STEP_K = 3
+HUBER_K = 1.345
+IRLS_ITERS = 6
+IRLS_TOL = 1e-4       # %/h; IRLS stops once no slope moves by more than this
+Z = 1.645             # two-sided 90 % interval
+
+
+def _pad(windows):
+    # list of (t_hours, level) pairs -> left-aligned (S, N) arrays plus a validity mask
+    n = max((len(t) for t, _ in windows), default=0)
+    t = np.zeros((len(windows), n))
+    y = np.zeros((len(windows), n))
+    m = np.zeros((len(windows), n), dtype=bool)
+    for i, (ti, yi) in enumerate(windows):
+        t[i, :len(ti)] = ti
+        y[i, :len(yi)] = yi
+        m[i, :len(ti)] = True
+    return t, y, m
+
+
+def last_segment(y, m):
+    # drop everything before the most recent refill. Steps are measured between the medians of
+    # the STEP_K readings either side, so a single outlier cannot split a segment.
+    s, n = y.shape
+    k = STEP_K
+    if n < 2 * k:
+        return m
+    med = np.median(np.lib.stride_tricks.sliding_window_view(np.where(m, y, np.nan), k, axis=1), axis=2)
+    # med[:, j] covers readings j..j+k-1; a step after reading j compares med[:, j-k+1] with med[:, j+1]
+    with np.errstate(invalid='ignore'):
+        jump = med[:, k:] - med[:, :-k] > REFILL_STEP
+    has = jump.any(axis=1)
+    last = (jump.shape[1] - 1) - np.argmax(jump[:, ::-1], axis=1)
+    start = np.where(has, last + k, 0)
+    return m & (np.arange(n) >= start[:, None])
+
+
+def _huber_weights(r, m):
+    scale = 1.4826 * np.nanmedian(np.where(m, np.abs(r), np.nan), axis=1)
+    u = np.abs(r) / (HUBER_K * np.maximum(scale, 1e-6))[:, None]
+    return np.where(m, np.minimum(1.0, 1.0 / np.maximum(u, 1e-12)), 0.0)
+
+
+def fit_batch(t, y, m, init=None):
+    # Huber IRLS line fit for every row at once -> (slope, intercept, slope stderr, weight sum).
+    # init=(slope, intercept) per row (NaN: none) warm-starts the weights from a previous fit, which
+    # usually converges in two iterations instead of IRLS_ITERS
+    w = m.astype(float)
+    prev = None
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if init is not None:
+            slope0, icpt0 = (np.asarray(a, dtype=float) for a in init)
+            warm = np.isfinite(slope0) & np.isfinite(icpt0)
+            if warm.any():
+                r0 = y - (np.where(warm, icpt0, 0.0)[:, None] + np.where(warm, slope0, 0.0)[:, None] * t)
+                w = np.where(warm[:, None], _huber_weights(r0, m), w)
+        for _ in range(IRLS_ITERS):
+            sw = w.sum(axis=1)
+            tb = (w * t).sum(axis=1) / sw
+            yb = (w * y).sum(axis=1) / sw
+            dt = t - tb[:, None]
+            sxx = (w * dt * dt).sum(axis=1)
+            slope = np.where(sxx > 0, (w * dt * (y - yb[:, None])).sum(axis=1) / sxx, 0.0)
+            icpt = yb - slope * tb
+            r = y - (icpt[:, None] + slope[:, None] * t)
+            if prev is not None and np.all(np.abs(slope - prev) <= IRLS_TOL):
+                break
+            prev = slope
+            w = _huber_weights(r, m)
+        sw = w.sum(axis=1)
+        sigma2 = (w * r * r).sum(axis=1) / np.maximum(sw - 2, 1)
+        se = np.sqrt(sigma2 / np.where(sxx > 0, sxx, np.inf))
+    return slope, icpt, se, sw
+
+
+def forecast_batch(windows, init=None):
+    # windows: [(t_hours <= 0 ending at the newest reading, level %)] -> list of forecast dicts;
+    # init: optional (slope, intercept) per window in the same time base, see fit_batch
+    if not windows:
+        return []
+    t, y, m = _pad(windows)
+    m = last_segment(y, m)
+    slope, icpt, se, _ = fit_batch(t, y, m, init)
+    n = m.sum(axis=1)
+    t0 = np.where(m, t, np.inf).min(axis=1)
+    span = -t0
+    level = icpt   # fitted level at t = 0, less jumpy than the last raw reading
+    rate = -slope * 24.0
+    lo_rate = (-slope - Z * se) * 24.0
+    hi_rate = (-slope + Z * se) * 24.0
+    out = []
+    for i in range(len(windows)):
+        f = {'points': int(n[i]), 'span_h': float(span[i]) if n[i] else 0.0, 'level': float(level[i]),
+             'rate_per_day': float(rate[i]), 'days': None, 'days_lo': None, 'days_hi': None}
+        if n[i] < MIN_POINTS or span[i] < MIN_SPAN_H:
+            f['state'] = 'insufficient'
+        elif -slope[i] * span[i] <= STABLE_DROP:
+            f['state'] = 'stable'
+        else:
+            lvl = max(level[i], 0.0)
+            f['state'] = 'draining'
+            f['days'] = float(lvl / rate[i])
+            f['days_lo'] = float(lvl / hi_rate[i])
+            f['days_hi'] = float(lvl / lo_rate[i]) if lo_rate[i] > 0 else float('inf')
+        out.append(f)
+    return out
+
+
+class Forecaster:
+    # per-silo results keyed by the newest reading; only silos with new data are refitted, warm-started
+    # from their previous line moved to the new time origin
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def update(self, cache, silo_ids):
+        dirty, windows, slope0, icpt0 = [], [], [], []
+        for sid in silo_ids:
+            latest = cache.latest(sid)
+            if latest is None:
+                with self._lock:
+                    self._results.pop(sid, None)
+                continue
+            newest = latest['timestamp']
+            with self._lock:
+                hit = self._results.get(sid)
+            if hit is not None and hit[0] == newest:
+                continue
+            w = cache.window(sid, since=newest - self.window)
+            t = (w['ts'] - np.datetime64(newest, 'us')) / np.timedelta64(1, 'h')
+            dirty.append((sid, newest))
+            windows.append((t, w['lvl']))
+            if hit is None:
+                slope0.append(np.nan)
+                icpt0.append(np.nan)
+            else:
+                slope = -hit[1]['rate_per_day'] / 24.0
+                slope0.append(slope)
+                icpt0.append(hit[1]['level'] + slope * (newest - hit[0]).total_seconds() / 3600.0)
+        results = forecast_batch(windows, (slope0, icpt0))
+        with self._lock:
+            for (sid, newest), f in zip(dirty, results):
+                self._results[sid] = (newest, f)
+            return {sid: self._results[sid][1] for sid in silo_ids if sid in self._results}
+
+    def get(self, silo_id):
+        with self._lock:
+            hit = self._results.get(silo_id)
+        return hit[1] if hit else None
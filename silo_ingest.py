@@ -0,0 +1,245 @@
+import datetime, logging, queue, threading, time
+import silo_db, silo_deadband, silo_metrics, silo_rollup
+
+log = logging.getLogger(__name__)
+
+SQL_INSERT_TELEMETRY = 'INSERT INTO telemetry (silo_id,timestamp,distance_m,level_percent,temp_c,humidity,raw_json) VALUES (?,?,?,?,?,?,?)'
+
+QUEUE_SIZE = 10000
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 0.5   # seconds a reading may wait before its batch is committed
+DEFAULT_HEIGHT = 10.0
+COMPRESS = True        # drop readings that add nothing within silo_deadband.TOLERANCES
+BATCH_BUCKETS = (1, 5, 10, 50, 100, 250, 500, 1000)
+
+
+class HeightCache:
+    def __init__(self):
+        self._heights = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def load(self):
+        with silo_db.reader() as conn:
+            rows = conn.execute("SELECT id, height_m FROM silos").fetchall()
+        with self._lock:
+            self._heights = {sid: h for sid, h in rows}
+            self._loaded = True
+
+    def get(self, silo_id):
+        if not self._loaded:
+            self.load()
+        h = self._heights.get(silo_id)
+        if h is None:
+            # unknown id: one reload in case the silo was added by another process
+            self.load()
+            h = self._heights.get(silo_id)
+        return h if h else DEFAULT_HEIGHT
+
+    def ids(self):
+        if not self._loaded:
+            self.load()
+        return list(self._heights)
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded = False
+
+
+height_cache = HeightCache()
+
+
+class _FlushMarker:
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class BatchWriter:
+    def __init__(self, queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, heights=None,
+                 compressor=None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.heights = heights or height_cache
+        self.compressor = compressor
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._listeners = []
+        # hooks run inside the batch transaction: fn(conn, rows)
+        self._batch_hooks = [silo_rollup.apply_batch]
+        self._thread = None
+        self._running = False
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'submitted': 0, 'suppressed': 0, 'written': 0, 'rejected': 0, 'errors': 0,
+            'batches': 0, 'last_batch_size': 0, 'max_batch_size': 0,
+            'last_commit_ms': 0.0, 'max_commit_ms': 0.0, 'total_commit_ms': 0.0,
+        }
+
+    # --- PRODUCER SIDE ---
+    def submit(self, silo_id, lvl, temp, hum, ts=None, dist=None, raw_json=None, block=True, timeout=None, keep=False):
+        # blocks while the queue is full (backpressure); with block=False or a timeout raises queue.Full.
+        # keep=True bypasses the deadband compressor (manual readings)
+        # ts may be a datetime or epoch ms; rows always carry epoch ms from here on
+        ts = silo_db.to_ms(ts if ts is not None else datetime.datetime.now())
+        if dist is None:
+            dist = self.heights.get(silo_id) * (1 - lvl / 100.0)
+        row = (silo_id, ts, dist, lvl, temp, hum, raw_json)
+        rows = self.compressor.offer(row, force=keep) if self.compressor else [row]
+        with self._stats_lock:
+            self._stats['submitted'] += 1
+            self._stats['suppressed'] += 1 - len(rows)
+        self._put(rows, block, timeout)
+
+    def _put(self, rows, block=True, timeout=None):
+        for row in rows:
+            try:
+                self._queue.put(row, block=block, timeout=timeout)
+            except queue.Full:
+                with self._stats_lock:
+                    self._stats['rejected'] += 1
+                raise
+
+    def flush(self, timeout=None):
+        # wait until everything submitted so far is committed
+        if not self._running:
+            self._drain_inline()
+            return True
+        marker = _FlushMarker()
+        self._queue.put(marker)
+        return marker.done.wait(timeout)
+
+    def add_listener(self, fn):
+        # fn(rows) runs on the writer thread after each committed batch
+        self._listeners.append(fn)
+
+    def add_batch_hook(self, fn):
+        self._batch_hooks.append(fn)
+
+    def remove_listener(self, fn):
+        if fn in self._listeners:
+            self._listeners.remove(fn)
+
+    def stats(self):
+        with self._stats_lock:
+            s = dict(self._stats)
+        s['queue_depth'] = self._queue.qsize()
+        s['avg_batch_size'] = s['written'] / s['batches'] if s['batches'] else 0.0
+        s['avg_commit_ms'] = s['total_commit_ms'] / s['batches'] if s['batches'] else 0.0
+        return s
+
+    # --- WRITER STAGE ---
+    def start(self):
+        if self._running:
+            return self
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        if not self._running:
+            return
+        if self.compressor:
+            # close every open segment so reconstruction reaches the last reading
+            self._put(self.compressor.flush(), timeout=timeout)
+        self.flush(timeout)
+        self._running = False
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while self._running:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch, markers = [], []
+            deadline = time.monotonic() + self.flush_interval
+            while item is not None:
+                if isinstance(item, _FlushMarker):
+                    markers.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if batch:
+                self._commit(batch)
+            for m in markers:
+                m.done.set()
+
+    def _drain_inline(self):
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, _FlushMarker):
+                item.done.set()
+            elif item is not None:
+                batch.append(item)
+        if batch:
+            self._commit(batch)
+
+    def _commit(self, batch):
+        t0 = time.perf_counter()
+        try:
+            with silo_db.writer() as conn:
+                conn.executemany(SQL_INSERT_TELEMETRY, batch)
+                for hook in self._batch_hooks:
+                    hook(conn, batch)
+        except Exception:
+            log.exception("telemetry batch of %d rows failed", len(batch))
+            silo_metrics.inc('silo_errors_total', where='ingest_batch')
+            with self._stats_lock:
+                self._stats['errors'] += 1
+            return
+        ms = (time.perf_counter() - t0) * 1000.0
+        silo_metrics.observe('silo_ingest_commit_seconds', ms / 1000.0)
+        silo_metrics.observe('silo_ingest_batch_rows', len(batch), BATCH_BUCKETS)
+        with self._stats_lock:
+            s = self._stats
+            s['written'] += len(batch)
+            s['batches'] += 1
+            s['last_batch_size'] = len(batch)
+            s['max_batch_size'] = max(s['max_batch_size'], len(batch))
+            s['last_commit_ms'] = ms
+            s['max_commit_ms'] = max(s['max_commit_ms'], ms)
+            s['total_commit_ms'] += ms
+        for fn in list(self._listeners):
+            try:
+                fn(batch)
+            except Exception:
+                log.exception("telemetry listener %r failed", fn)
+                silo_metrics.inc('silo_errors_total', where='ingest_listener')
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = BatchWriter(compressor=silo_deadband.SwingingDoor() if COMPRESS else None).start()
+                silo_metrics.gauge('silo_ingest_queue_depth', _writer._queue.qsize)
+                for key in ('submitted', 'suppressed', 'written', 'rejected', 'errors'):
+                    silo_metrics.gauge('silo_ingest_readings', lambda w=_writer, k=key: w.stats()[k], state=key)
+    return _writer
+
+
+def shutdown():
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.stop()
+            _writer = None
@@ -0,0 +1,236 @@
+import argparse, datetime, logging, sys, threading, time
+import numpy as np
+import silo_alerts, silo_db, silo_ingest, silo_metrics, silo_rollup
+
+log = logging.getLogger(__name__)
+
+# Usage:
+#   python silo_loadgen.py backfill --db load.sqlite3 --silos 2000 --days 365 --interval 300 --seed 7
+#   python silo_loadgen.py replay --db load.sqlite3 --speed 60 --duration 600
+# The same seed and arguments always produce the same readings.
+
+INTERVAL_S = 5
+DAY_MS = silo_rollup.DAY_MS
+YEAR_DAYS = 365.25
+TARGET_CHUNK_ROWS = 100000   # rows per backfill transaction
+RAW_JSON = '{"sim":true}'
+
+# faults
+DROPOUT_P = 0.002          # reading never arrives
+SPIKE_P = 0.001            # echo off the wall or dust: the level reads near full
+HOTSPOT_PER_DAY = 0.002    # chance a silo starts a self-heating episode on a given day
+HOTSPOT_HOURS = 36.0
+HOTSPOT_RISE = 18.0        # deg C at the peak of an episode, with some moisture from respiration
+
+SQL_INSERT_SILO = ("INSERT INTO silos (owner_id,name,radius_m,height_m,token,threshold_moisture,threshold_temp,"
+                   "threshold_level_percent,next_service_date) VALUES (?,?,?,?,?,?,?,?,?)")
+
+
+class Fleet:
+    # per-silo model parameters as arrays; readings for every silo and many time steps are
+    # generated at once. Level is a sawtooth: consumption (faster by day) until the refill point,
+    # then an instant refill.
+    def __init__(self, silo_ids=(), heights=(), levels=None, seed=0):
+        self.rng = np.random.default_rng(seed)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.height = np.empty(0)
+        self.params = {k: np.empty(0) for k in self._draw(0)}
+        self.add(silo_ids, heights, levels)
+
+    def _draw(self, n):
+        rng = self.rng
+        return {
+            'rate': rng.uniform(0.5, 4.0, n),          # % per day
+            'refill_at': rng.uniform(8.0, 20.0, n),
+            'refill_to': rng.uniform(85.0, 98.0, n),
+            'consumed': np.zeros(n),
+            't_base': rng.normal(16.0, 3.0, n),
+            't_season': rng.uniform(4.0, 8.0, n),
+            't_daily': rng.uniform(0.5, 2.0, n),
+            'h_base': rng.uniform(11.0, 14.0, n),
+            'hot_start': np.full(n, -np.inf),        # ms
+        }
+
+    def add(self, silo_ids, heights, levels=None):
+        n = len(silo_ids)
+        if not n:
+            return
+        p = self._draw(n)
+        if levels is not None:
+            lv = np.array([np.nan if v is None else v for v in levels], dtype=float)
+            lv = np.where(np.isnan(lv), p['refill_to'], np.clip(lv, p['refill_at'], p['refill_to']))
+            p['consumed'] = p['refill_to'] - lv
+        self.ids = np.concatenate([self.ids, np.asarray(silo_ids, dtype=np.int64)])
+        self.height = np.concatenate([self.height, np.asarray(heights, dtype=float)])
+        self.params = {k: np.concatenate([self.params[k], v]) for k, v in p.items()}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def generate(self, t0_ms, steps, interval_s=INTERVAL_S):
+        # -> ts (k,) epoch ms, lvl/temp/hum (k, n) and a (k, n) mask of readings that arrive
+        p, rng, n = self.params, self.rng, len(self)
+        ts = t0_ms + np.arange(steps, dtype=np.int64) * int(interval_s * 1000)
+        tod = (ts % DAY_MS) / DAY_MS
+        doy = (ts / DAY_MS) % YEAR_DAYS / YEAR_DAYS
+        daily = np.sin(2 * np.pi * (tod - 0.375))[:, None]      # peaks mid afternoon
+        season = np.sin(2 * np.pi * (doy - 0.3))[:, None]       # peaks late July
+
+        feed = np.clip(1.0 + 0.6 * daily, 0.0, None) * rng.lognormal(0.0, 0.3, (steps, n))
+        consumed = p['consumed'] + np.cumsum(p['rate'] * interval_s / 86400.0 * feed, axis=0)
+        p['consumed'] = consumed[-1].copy()
+        span = p['refill_to'] - p['refill_at']
+        lvl = p['refill_to'] - consumed % span + rng.normal(0.0, 0.05, (steps, n))
+
+        temp = p['t_base'] + p['t_season'] * season + p['t_daily'] * daily + rng.normal(0.0, 0.1, (steps, n))
+        hum = p['h_base'] + 0.8 * season - 0.3 * daily + rng.normal(0.0, 0.15, (steps, n))
+
+        # self-heating: at most one new episode per silo per block, never overlapping the last
+        dur = HOTSPOT_HOURS * 3600 * 1000
+        starts = rng.random((steps, n)) < HOTSPOT_PER_DAY * interval_s / 86400.0
+        first = np.argmax(starts, axis=0)
+        new = starts.any(axis=0) & (ts[first] > p['hot_start'] + dur)
+        episode = lambda s: np.clip(1.0 - np.abs(2.0 * (ts[:, None] - s) / dur - 1.0), 0.0, 1.0)
+        with np.errstate(invalid='ignore'):
+            shape = episode(p['hot_start'])
+            p['hot_start'] = np.where(new, ts[first], p['hot_start'])
+            shape = np.maximum(shape, episode(p['hot_start']))
+        temp += HOTSPOT_RISE * shape
+        hum += 2.0 * shape
+
+        spikes = rng.random((steps, n)) < SPIKE_P
+        lvl = np.where(spikes, rng.uniform(95.0, 100.0, (steps, n)), lvl)
+        valid = rng.random((steps, n)) >= DROPOUT_P
+        return ts, np.clip(lvl, 0.0, 100.0), temp, hum, valid
+
+    def rows(self, ts, lvl, temp, hum, valid):
+        # telemetry insert tuples in time order
+        i, j = np.nonzero(valid)
+        lv = lvl[i, j]
+        dist = self.height[j] * (1 - lv / 100.0)
+        return list(zip(self.ids[j].tolist(), ts[i].tolist(), dist.round(3).tolist(), lv.round(2).tolist(),
+                        temp[i, j].round(2).tolist(), hum[i, j].round(2).tolist(), [RAW_JSON] * len(i)))
+
+
+def ensure_silos(count):
+    # adds "Load NNNN" silos until at least `count` exist -> (ids, heights)
+    with silo_db.writer() as conn:
+        have = conn.execute("SELECT count(*) FROM silos").fetchone()[0]
+        rng = np.random.default_rng(count)
+        conn.executemany(SQL_INSERT_SILO, [
+            (1, f"Load {i:04d}", 2.5, float(h), f"tk-load{i}", 14.0, 35.0, 10.0, None)
+            for i, h in zip(range(have, count), rng.choice([6.0, 8.0, 10.0, 12.0], max(0, count - have)))])
+        rows = conn.execute("SELECT id, height_m FROM silos ORDER BY id").fetchall()
+    silo_ingest.height_cache.invalidate()
+    return [r[0] for r in rows], [r[1] or silo_ingest.DEFAULT_HEIGHT for r in rows]
+
+
+def backfill(fleet, start, end, interval_s=INTERVAL_S, progress=None):
+    # bulk history straight into telemetry + rollups, one transaction per chunk
+    t, end_ms = silo_db.to_ms(start), silo_db.to_ms(end)
+    step_ms = int(interval_s * 1000)
+    chunk = max(1, TARGET_CHUNK_ROWS // max(1, len(fleet)))
+    total = 0
+    while t < end_ms:
+        steps = min(chunk, -(-(end_ms - t) // step_ms))
+        rows = fleet.rows(*fleet.generate(t, steps, interval_s))
+        with silo_db.writer() as conn:
+            conn.executemany(silo_ingest.SQL_INSERT_TELEMETRY, rows)
+            silo_rollup.apply_batch(conn, rows)
+        total += len(rows)
+        t += steps * step_ms
+        if progress:
+            progress(total, t)
+    return total
+
+
+def replay(fleet, speed=1.0, duration=None, interval_s=INTERVAL_S, start=None, writer=None, stop=None, follow=False):
+    # live readings through the ingest writer on a simulated clock running `speed` times wall time.
+    # follow=True picks up silos added while running (the app's simulator).
+    writer = writer or silo_ingest.get_writer()
+    stop = stop or threading.Event()
+    sim = silo_db.to_ms(start or datetime.datetime.now())
+    step_ms = int(interval_s * 1000)
+    tick = max(interval_s / speed, 0.1)
+    steps = max(1, round(tick * speed / interval_s))
+    t_end = None if duration is None else time.monotonic() + duration
+    sent = 0
+    while not stop.is_set() and (t_end is None or time.monotonic() < t_end):
+        t0 = time.monotonic()
+        try:
+            if follow:
+                _follow(fleet, writer)
+            if len(fleet):
+                for sid, ts, dist, lvl, temp, hum, raw in fleet.rows(*fleet.generate(sim, steps, interval_s)):
+                    writer.submit(sid, lvl, temp, hum, ts=ts, dist=dist, raw_json=raw)
+                    sent += 1
+        except Exception:
+            log.exception("replay tick failed")
+            silo_metrics.inc('silo_errors_total', where='replay')
+        sim += steps * step_ms
+        stop.wait(max(0.0, tick - (time.monotonic() - t0)))
+    return sent
+
+
+def latest_levels(silo_ids):
+    # continue from the stored levels (one query for the fleet); NaN for silos without readings
+    latest = silo_alerts.fetch_fleet_latest()
+    levels = dict(zip(latest['ids'].tolist(), latest['values'][2].tolist()))
+    return [levels.get(sid) for sid in silo_ids]
+
+
+def _follow(fleet, writer):
+    new = sorted(set(writer.heights.ids()) - set(fleet.ids.tolist()))
+    if new:
+        fleet.add(new, [writer.heights.get(sid) for sid in new], latest_levels(new))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="deterministic synthetic telemetry for load tests and benchmarks")
+    ap.add_argument("command", choices=["backfill", "replay"])
+    ap.add_argument("--db", default=silo_db.DB)
+    ap.add_argument("--silos", type=int, default=1000)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--interval", type=float, default=INTERVAL_S, help="seconds between readings of one silo")
+    ap.add_argument("--days", type=float, default=30.0, help="backfill: history length")
+    ap.add_argument("--end", help="backfill: last timestamp (default now)")
+    ap.add_argument("--speed", type=float, default=1.0, help="replay: simulated seconds per wall second")
+    ap.add_argument("--duration", type=float, help="replay: wall seconds to run (default until interrupted)")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    silo_db.configure(args.db)
+    try:
+        with silo_db.writer() as conn:
+            silo_db.migrate(conn)
+        ids, heights = ensure_silos(args.silos)
+        ids, heights = ids[:args.silos], heights[:args.silos]
+        if args.command == "backfill":
+            end = datetime.datetime.fromisoformat(args.end) if args.end else datetime.datetime.now()
+            start = end - datetime.timedelta(days=args.days)
+            fleet = Fleet(ids, heights, seed=args.seed)
+            t0 = time.perf_counter()
+            last = [t0]
+
+            def progress(n, t):
+                if time.perf_counter() - last[0] > 5:
+                    last[0] = time.perf_counter()
+                    log.info("%s: %d rows (%.0f rows/s)", silo_db.from_ms(t), n, n / (last[0] - t0))
+
+            n = backfill(fleet, start, end, args.interval, progress)
+            dt = time.perf_counter() - t0
+            log.info("backfilled %d rows for %d silos in %.1fs (%.0f rows/s)", n, len(ids), dt, n / max(dt, 1e-9))
+        else:
+            fleet = Fleet(ids, heights, latest_levels(ids), seed=args.seed)
+            try:
+                n = replay(fleet, args.speed, args.duration, args.interval)
+            except KeyboardInterrupt:
+                n = 0
+            log.info("replayed %d readings", n)
+    finally:
+        silo_ingest.shutdown()
+        silo_db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
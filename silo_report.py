@@ -0,0 +1,268 @@
+import datetime, multiprocessing, os, re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas as pdf_canvas
+import silo_db, silo_rollup, silo_downsample, silo_alerts
+
+PAGE_W, PAGE_H = A4
+MARGIN = 50
+ROW_H = 14
+CHART_H = 170
+
+LINE_COLORS = {'level': (0.22, 0.74, 0.97), 'temp': (0.96, 0.45, 0.71), 'hum': (0.65, 0.55, 0.98)}
+
+
+def load_report_data(silo_id, start, end):
+    # end is exclusive; rollup queries take an inclusive upper bound
+    last = end - datetime.timedelta(microseconds=1)
+    with silo_db.reader() as conn:
+        silo = conn.execute("SELECT name, threshold_moisture, threshold_temp, threshold_level_percent FROM silos WHERE id=?",
+                            (silo_id,)).fetchone()
+        events = conn.execute("SELECT reading_ts, metric, state, value, threshold FROM alert_events "
+                              "WHERE silo_id=? AND reading_ts>=? AND reading_ts<? ORDER BY id",
+                              (silo_id, silo_db.to_ms(start), silo_db.to_ms(end))).fetchall()
+    if silo is None:
+        raise ValueError(f"unknown silo {silo_id}")
+    _, daily = silo_rollup.get_series(silo_id, start, last, 'daily')
+    # the trend chart wants more detail than one point per day when the period allows it
+    chart_res = 'hourly' if end - start <= silo_rollup.HOURLY_MAX_SPAN else 'daily'
+    _, chart = silo_rollup.get_series(silo_id, start, last, chart_res)
+    name, tm, tt, tl = silo
+    return {'silo_id': silo_id, 'name': name, 'tm': tm, 'tt': tt, 'tl': tl,
+            'start': start, 'end': end, 'daily': daily, 'chart': chart, 'events': events}
+
+
+def incidents(data):
+    # days on which a bucket extreme crossed the silo's thresholds
+    out = []
+    for d in data['daily']:
+        issues = []
+        if data['tt'] is not None and d['temp_max'] > data['tt']:
+            issues.append(f"High temp {d['temp_max']:.1f}°C (limit {data['tt']:.1f})")
+        if data['tm'] is not None and d['hum_max'] > data['tm']:
+            issues.append(f"High moisture {d['hum_max']:.1f}% (limit {data['tm']:.1f})")
+        if data['tl'] is not None and d['level_min'] < data['tl']:
+            issues.append(f"Low level {d['level_min']:.1f}% (limit {data['tl']:.1f})")
+        if issues:
+            out.append((d['timestamp'].date(), issues))
+    return out
+
+
+def summary(data):
+    daily = data['daily']
+    if not daily:
+        return None
+    n = sum(d['n'] for d in daily)
+    return {
+        'readings': n,
+        'level': (min(d['level_min'] for d in daily), sum(d['level_percent'] * d['n'] for d in daily) / n, max(d['level_max'] for d in daily)),
+        'temp': (min(d['temp_min'] for d in daily), sum(d['temp_c'] * d['n'] for d in daily) / n, max(d['temp_max'] for d in daily)),
+        'hum': (min(d['hum_min'] for d in daily), sum(d['humidity'] * d['n'] for d in daily) / n, max(d['hum_max'] for d in daily)),
+        'level_first': daily[0]['level_percent'], 'level_last': daily[-1]['level_last'],
+    }
+
+
+class _Pages:
+    # tracks the write position and starts a new page (with footer) when it runs out of room
+    def __init__(self, path, title):
+        self.c = pdf_canvas.Canvas(path, pagesize=A4)
+        self.title = title
+        self.page = 1
+        self.y = PAGE_H - MARGIN
+        self.on_new_page = None
+
+    def need(self, h):
+        if self.y - h < MARGIN + 10:
+            self.new_page()
+
+    def new_page(self):
+        self._footer()
+        self.c.showPage()
+        self.page += 1
+        self.y = PAGE_H - MARGIN
+        self.c.setFont("Helvetica-Bold", 9)
+        self.c.drawString(MARGIN, self.y, self.title)
+        self.y -= 20
+        if self.on_new_page:
+            self.on_new_page()
+
+    def _footer(self):
+        self.c.setFont("Helvetica", 8)
+        self.c.drawRightString(PAGE_W - MARGIN, MARGIN - 20, f"Page {self.page}")
+
+    def save(self):
+        self._footer()
+        self.c.save()
+        return self.page
+
+
+def _draw_chart(c, x, y, w, h, rows):
+    c.setStrokeColorRGB(0.6, 0.6, 0.6)
+    c.setLineWidth(0.5)
+    c.rect(x, y, w, h)
+    c.setFont("Helvetica", 7)
+    for v in (0, 25, 50, 75, 100):
+        yy = y + h * v / 100.0
+        c.setStrokeColorRGB(0.85, 0.85, 0.85)
+        c.line(x, yy, x + w, yy)
+        c.drawRightString(x - 3, yy - 2, str(v))
+    if len(rows) < 2:
+        c.drawString(x + 10, y + h / 2, "Not enough data for a trend chart.")
+        return
+    t0, t1 = rows[0]['timestamp'], rows[-1]['timestamp']
+    span = max((t1 - t0).total_seconds(), 1.0)
+    xs = [x + w * (r['timestamp'] - t0).total_seconds() / span for r in rows]
+    c.drawString(x, y - 10, t0.strftime('%Y-%m-%d %H:%M'))
+    c.drawRightString(x + w, y - 10, t1.strftime('%Y-%m-%d %H:%M'))
+    # everything shares the 0-100 axis; temperature uses bucket maxima so hot spells show
+    series = (('level', [r['level_percent'] for r in rows], "Level %"),
+              ('temp', [r.get('temp_max', r['temp_c']) for r in rows], "Temp °C (max)"),
+              ('hum', [r.get('hum_max', r['humidity']) for r in rows], "Humidity % (max)"))
+    lx = x
+    for key, ys, label in series:
+        px, py = silo_downsample.downsample(xs, ys, int(w))
+        c.setStrokeColorRGB(*LINE_COLORS[key])
+        c.setLineWidth(1.2)
+        p = c.beginPath()
+        p.moveTo(px[0], y + h * min(max(py[0], 0), 100) / 100.0)
+        for a, b in zip(px[1:], py[1:]):
+            p.lineTo(a, y + h * min(max(b, 0), 100) / 100.0)
+        c.drawPath(p, stroke=1, fill=0)
+        c.setFillColorRGB(*LINE_COLORS[key])
+        c.rect(lx, y + h + 6, 8, 4, stroke=0, fill=1)
+        c.setFillColorRGB(0, 0, 0)
+        c.drawString(lx + 11, y + h + 5, label)
+        lx += 110
+
+
+TABLE_COLS = (("Date", 0), ("Level min/avg/max %", 70), ("Temp min/avg/max °C", 195), ("Humidity min/avg/max %", 320), ("Readings", 445))
+
+
+def _table_header(pages):
+    c = pages.c
+    c.setFont("Helvetica-Bold", 9)
+    for label, dx in TABLE_COLS:
+        c.drawString(MARGIN + dx, pages.y, label)
+    c.line(MARGIN, pages.y - 4, PAGE_W - MARGIN, pages.y - 4)
+    pages.y -= ROW_H + 2
+    c.setFont("Helvetica", 9)
+
+
+def render_silo_report(path, silo_id, start, end, progress=None):
+    data = load_report_data(silo_id, start, end)
+    title = f"Silo Report: {data['name']}"
+    pages = _Pages(path, title)
+    c = pages.c
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(MARGIN, pages.y, title)
+    pages.y -= 18
+    c.setFont("Helvetica", 10)
+    c.drawString(MARGIN, pages.y, f"Period: {start:%Y-%m-%d} to {end - datetime.timedelta(days=1):%Y-%m-%d}    Generated: {datetime.datetime.now():%Y-%m-%d %H:%M}")
+    pages.y -= 25
+
+    s = summary(data)
+    if s is None:
+        c.drawString(MARGIN, pages.y, "No readings in this period.")
+        return pages.save()
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(MARGIN, pages.y, "Summary")
+    pages.y -= 15
+    c.setFont("Helvetica", 10)
+    for line in (f"Readings: {s['readings']:,}",
+                 f"Level: min {s['level'][0]:.1f}%  avg {s['level'][1]:.1f}%  max {s['level'][2]:.1f}%   (start {s['level_first']:.1f}% -> end {s['level_last']:.1f}%)",
+                 f"Temperature: min {s['temp'][0]:.1f}°C  avg {s['temp'][1]:.1f}°C  max {s['temp'][2]:.1f}°C   (limit {data['tt']})",
+                 f"Humidity: min {s['hum'][0]:.1f}%  avg {s['hum'][1]:.1f}%  max {s['hum'][2]:.1f}%   (limit {data['tm']})"):
+        c.drawString(MARGIN, pages.y, line)
+        pages.y -= 13
+    pages.y -= 15
+
+    pages.need(CHART_H + 40)
+    _draw_chart(c, MARGIN + 15, pages.y - CHART_H, PAGE_W - 2 * MARGIN - 15, CHART_H - 15, data['chart'])
+    pages.y -= CHART_H + 30
+
+    pages.need(3 * ROW_H)
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(MARGIN, pages.y, "Daily statistics")
+    pages.y -= 16
+    _table_header(pages)
+    pages.on_new_page = lambda: _table_header(pages)
+    for i, d in enumerate(data['daily']):
+        pages.need(ROW_H)
+        vals = (d['timestamp'].strftime('%Y-%m-%d'),
+                f"{d['level_min']:.1f} / {d['level_percent']:.1f} / {d['level_max']:.1f}",
+                f"{d['temp_min']:.1f} / {d['temp_c']:.1f} / {d['temp_max']:.1f}",
+                f"{d['hum_min']:.1f} / {d['humidity']:.1f} / {d['hum_max']:.1f}",
+                f"{d['n']:,}")
+        for (_, dx), v in zip(TABLE_COLS, vals):
+            c.drawString(MARGIN + dx, pages.y, v)
+        pages.y -= ROW_H
+        if progress and i % 50 == 0:
+            progress(i, len(data['daily']))
+    pages.on_new_page = None
+
+    pages.y -= 15
+    pages.need(3 * ROW_H)
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(MARGIN, pages.y, "Alert incidents")
+    pages.y -= 16
+    c.setFont("Helvetica", 9)
+    found = incidents(data)
+    if not found:
+        c.drawString(MARGIN, pages.y, "No threshold breaches in this period.")
+    for day, issues in found:
+        pages.need(ROW_H)
+        c.setFont("Helvetica", 9)
+        c.drawString(MARGIN, pages.y, f"{day:%Y-%m-%d}   " + ";  ".join(issues))
+        pages.y -= ROW_H
+
+    # raise/clear transitions recorded by the alert engine (debounced, so fewer than the breaches above)
+    if data['events']:
+        pages.y -= 15
+        pages.need(3 * ROW_H)
+        c.setFont("Helvetica-Bold", 11)
+        c.drawString(MARGIN, pages.y, "Alert log")
+        pages.y -= 16
+        labels = {m[0]: m[5] for m in silo_alerts.METRICS}
+        for ts, metric, state, value, limit in data['events']:
+            pages.need(ROW_H)
+            c.setFont("Helvetica", 9)
+            c.drawString(MARGIN, pages.y, f"{silo_db.from_ms(ts):%Y-%m-%d %H:%M}   {labels.get(metric, metric)} {state}   ({value:.1f}, limit {limit:.1f})")
+            pages.y -= ROW_H
+    return pages.save()
+
+
+# --- FLEET REPORTS (one process per silo) ---
+def _worker_init(db_path):
+    # a fresh manager, never close() one inherited from the parent: its write lock may be held and
+    # its SQLite handles must not be used across processes
+    silo_db._manager = silo_db.ConnectionManager(db_path)
+
+
+def _render_worker(path, silo_id, start, end):
+    return silo_id, path, render_silo_report(path, silo_id, start, end)
+
+
+def report_filename(name, silo_id, start, end):
+    # the id keeps names that sanitize alike ("Silo #1", "Silo 1") from overwriting each other
+    safe = re.sub(r'[^A-Za-z0-9._-]+', '_', name).strip('_') or "silo"
+    return f"{silo_id:04d}_{safe}_{start:%Y%m%d}-{end - datetime.timedelta(days=1):%Y%m%d}.pdf"
+
+
+def generate_fleet_reports(out_dir, start, end, silo_ids=None, workers=None, progress=None):
+    with silo_db.reader() as conn:
+        silos = conn.execute("SELECT id, name FROM silos ORDER BY id").fetchall()
+    if silo_ids is not None:
+        silos = [s for s in silos if s[0] in set(silo_ids)]
+    os.makedirs(out_dir, exist_ok=True)
+    db_path = silo_db.get_manager().path
+    results = []
+    # spawn, not fork: the Tk app is multithreaded and holds open connections and locks
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_worker_init, initargs=(db_path,)) as pool:
+        futures = [pool.submit(_render_worker, os.path.join(out_dir, report_filename(name, sid, start, end)), sid, start, end)
+                   for sid, name in silos]
+        for i, f in enumerate(as_completed(futures), 1):
+            results.append(f.result())
+            if progress:
+                progress(i, len(futures))
+    return sorted(results)
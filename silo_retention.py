@@ -0,0 +1,168 @@
+import argparse, datetime, logging, os, sys, threading, time
+import silo_archive, silo_db, silo_rollup
+
+log = logging.getLogger(__name__)
+
+RAW_RETENTION_DAYS = 90        # raw telemetry kept in SQLite; older days move to the archive
+HOURLY_RETENTION_DAYS = 730    # hourly rollups; daily rollups are kept forever
+ARCHIVE_FORMAT = silo_archive.DEFAULT_FORMAT
+PAUSE = 0.05                   # seconds between partitions so ingest gets the write lock
+VACUUM_PAGES = 2000            # pages released per incremental_vacuum step
+ROLLUP_DELETE_BATCH = 5000
+
+SQL_PARTITION = ("SELECT rowid, timestamp, distance_m, level_percent, temp_c, humidity, raw_json FROM telemetry "
+                 "WHERE silo_id=? AND timestamp>=? AND timestamp<? ORDER BY timestamp")
+# the rowid fence keeps rows inserted after the copy was taken (back-fills) for the next run
+SQL_DELETE_PARTITION = "DELETE FROM telemetry WHERE silo_id=? AND timestamp>=? AND timestamp<? AND rowid<=?"
+
+
+def oldest_day(conn, silo_id):
+    ts = conn.execute("SELECT min(timestamp) FROM telemetry WHERE silo_id=?", (silo_id,)).fetchone()[0]
+    return None if ts is None else silo_rollup.day_bucket(ts)
+
+
+def archive_partition(silo_id, day_ms, archive_dir=None, fmt=ARCHIVE_FORMAT):
+    # one silo-day: copy to the archive, then delete in a single short transaction. Existing files
+    # for the day (a crash between the two steps, a late back-fill, another format) are merged,
+    # one row per timestamp.
+    ext, write, _ = silo_archive.FORMATS[fmt]
+    archive_dir = archive_dir or silo_archive.get_dir()
+    end = day_ms + silo_rollup.DAY_MS
+    with silo_db.reader() as conn:
+        rows = conn.execute(SQL_PARTITION, (silo_id, day_ms, end)).fetchall()
+    if not rows:
+        return None, 0
+    fence = max(r[0] for r in rows)
+    rows = [r[1:] for r in rows]
+    path = silo_archive.partition_path(archive_dir, silo_id, day_ms, ext)
+    old = [(p, read) for p, read in ((silo_archive.partition_path(archive_dir, silo_id, day_ms, e), read)
+                                     for e, _, read in silo_archive.FORMATS.values()) if os.path.exists(p)]
+    if old:
+        merged = {}
+        for p, read in old:
+            merged.update((r[0], r) for r in read(p))
+        merged.update((r[0], r) for r in rows)
+        rows = sorted(merged.values(), key=lambda r: r[0])
+    write(path, rows)
+    for p, _ in old:
+        if p != path:
+            os.remove(p)
+    with silo_db.writer() as conn:
+        deleted = conn.execute(SQL_DELETE_PARTITION, (silo_id, day_ms, end, fence)).rowcount
+    return path, deleted
+
+
+def expire_rollups(hourly_days=HOURLY_RETENTION_DAYS, now=None):
+    cutoff = silo_rollup.day_bucket(silo_db.to_ms(now or datetime.datetime.now())) - hourly_days * silo_rollup.DAY_MS
+    total = 0
+    while True:
+        with silo_db.writer() as conn:
+            n = _delete_hourly_batch(conn, cutoff)
+        total += n
+        if n < ROLLUP_DELETE_BATCH:
+            return total
+        time.sleep(PAUSE)
+
+
+def _delete_hourly_batch(conn, cutoff):
+    # telemetry_hourly is WITHOUT ROWID, so batches are picked by primary key
+    keys = conn.execute("SELECT silo_id, bucket FROM telemetry_hourly WHERE bucket<? LIMIT ?",
+                        (cutoff, ROLLUP_DELETE_BATCH)).fetchall()
+    conn.executemany("DELETE FROM telemetry_hourly WHERE silo_id=? AND bucket=?", keys)
+    return len(keys)
+
+
+def vacuum(full=False):
+    # incremental_vacuum only works once the file is in auto_vacuum=INCREMENTAL mode; switching an
+    # existing database needs one full VACUUM (blocks writers, so only on request)
+    with silo_db.writer() as conn:
+        mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        if mode != 2:
+            if full:
+                log.info("switching to auto_vacuum=INCREMENTAL (full VACUUM)")
+                conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                conn.execute("VACUUM")
+            return 0
+    freed = 0
+    while True:
+        with silo_db.writer() as conn:
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if free:
+                # executescript steps the pragma to completion; execute() frees a single page
+                conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_PAGES})")
+                left = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if not free or left >= free:
+            return freed
+        freed += free - left
+        time.sleep(PAUSE)
+
+
+def run(raw_days=RAW_RETENTION_DAYS, hourly_days=HOURLY_RETENTION_DAYS, archive_dir=None,
+        max_partitions=None, now=None, progress=None, fmt=ARCHIVE_FORMAT, full_vacuum=False):
+    # archive_dir also becomes this process's archive location, so the chart, API and exports read it back
+    if archive_dir is not None:
+        silo_archive.configure(archive_dir)
+    now_ms = silo_db.to_ms(now or datetime.datetime.now())
+    cutoff = silo_rollup.day_bucket(now_ms) - raw_days * silo_rollup.DAY_MS
+    stats = {'partitions': 0, 'rows': 0, 'hourly_deleted': 0, 'pages_freed': 0}
+    with silo_db.reader() as conn:
+        silo_ids = [r[0] for r in conn.execute("SELECT DISTINCT silo_id FROM telemetry_daily WHERE bucket<?", (cutoff,))]
+    for sid in silo_ids:
+        while max_partitions is None or stats['partitions'] < max_partitions:
+            with silo_db.reader() as conn:
+                day = oldest_day(conn, sid)
+            if day is None or day >= cutoff:
+                break
+            path, n = archive_partition(sid, day, archive_dir, fmt)
+            stats['partitions'] += 1
+            stats['rows'] += n
+            if progress:
+                progress(stats)
+            time.sleep(PAUSE)
+    stats['hourly_deleted'] = expire_rollups(hourly_days, silo_db.from_ms(now_ms))
+    stats['pages_freed'] = vacuum(full_vacuum)
+    log.info("retention: archived %(rows)d rows in %(partitions)d partitions, %(hourly_deleted)d hourly rollups expired, "
+             "%(pages_freed)d pages freed", stats)
+    return stats
+
+
+def start_in_thread(interval=3600.0, **kwargs):
+    # periodic run next to the Tk app or ingest server; returns the stop event
+    stop = threading.Event()
+
+    def loop():
+        while not stop.is_set():
+            try:
+                run(**kwargs)
+            except Exception:
+                log.exception("retention run failed")
+            stop.wait(interval)
+
+    threading.Thread(target=loop, name="retention", daemon=True).start()
+    return stop
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="archive and expire old telemetry")
+    ap.add_argument("--db", default=silo_db.DB)
+    ap.add_argument("--raw-days", type=int, default=RAW_RETENTION_DAYS)
+    ap.add_argument("--hourly-days", type=int, default=HOURLY_RETENTION_DAYS)
+    ap.add_argument("--archive-dir", help=f"default: {silo_archive.ARCHIVE_DIR}/ next to the database")
+    ap.add_argument("--format", choices=sorted(silo_archive.FORMATS), default=ARCHIVE_FORMAT)
+    ap.add_argument("--max-partitions", type=int, help="stop after this many silo-days (spread a backlog over runs)")
+    ap.add_argument("--full-vacuum", action="store_true", help="one-off VACUUM to switch the file to incremental vacuum")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    silo_db.configure(args.db)
+    try:
+        with silo_db.writer() as conn:
+            silo_db.migrate(conn)
+        run(args.raw_days, args.hourly_days, args.archive_dir, args.max_partitions, fmt=args.format,
+            full_vacuum=args.full_vacuum)
+    finally:
+        silo_db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
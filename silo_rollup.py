@@ -0,0 +1,161 @@
+import datetime
+import numpy as np
+import silo_archive, silo_db
+
+# Resolution picked by get_columns() from the requested span.
+RAW_MAX_SPAN = datetime.timedelta(hours=12)
+HOURLY_MAX_SPAN = datetime.timedelta(days=30)
+
+TABLES = {'hourly': 'telemetry_hourly', 'daily': 'telemetry_daily'}
+
+_COLS = "silo_id,bucket,n,level_min,level_max,level_sum,level_last,temp_min,temp_max,temp_sum,temp_last,hum_min,hum_max,hum_sum,hum_last,last_ts"
+
+_UPSERT = """INSERT INTO {t} ({cols}) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+ON CONFLICT(silo_id, bucket) DO UPDATE SET
+    n = n + excluded.n,
+    level_min = min(level_min, excluded.level_min), level_max = max(level_max, excluded.level_max),
+    level_sum = level_sum + excluded.level_sum,
+    temp_min = min(temp_min, excluded.temp_min), temp_max = max(temp_max, excluded.temp_max),
+    temp_sum = temp_sum + excluded.temp_sum,
+    hum_min = min(hum_min, excluded.hum_min), hum_max = max(hum_max, excluded.hum_max),
+    hum_sum = hum_sum + excluded.hum_sum,
+    level_last = CASE WHEN excluded.last_ts >= last_ts THEN excluded.level_last ELSE level_last END,
+    temp_last = CASE WHEN excluded.last_ts >= last_ts THEN excluded.temp_last ELSE temp_last END,
+    hum_last = CASE WHEN excluded.last_ts >= last_ts THEN excluded.hum_last ELSE hum_last END,
+    last_ts = max(last_ts, excluded.last_ts)"""
+
+SQL_UPSERT = {res: _UPSERT.format(t=t, cols=_COLS) for res, t in TABLES.items()}
+
+HOUR_MS = 3600 * 1000
+DAY_MS = 24 * HOUR_MS
+BUCKET_MS = {'hourly': HOUR_MS, 'daily': DAY_MS}
+
+# bucket expressions over the stored epoch-ms timestamps, used for backfills
+_BUCKET_SQL = {res: f"timestamp - timestamp % {ms}" for res, ms in BUCKET_MS.items()}
+
+
+def hour_bucket(ms):
+    return ms - ms % HOUR_MS
+
+
+def day_bucket(ms):
+    return ms - ms % DAY_MS
+
+
+BUCKETS = {'hourly': hour_bucket, 'daily': day_bucket}
+
+
+def aggregate(rows, bucket_fn):
+    # rows are telemetry insert tuples (silo_id, ts_ms, distance, level, temp, hum, raw_json)
+    acc = {}
+    for sid, ts, _dist, lvl, temp, hum, _raw in rows:
+        key = (sid, bucket_fn(ts))
+        a = acc.get(key)
+        if a is None:
+            acc[key] = [1, lvl, lvl, lvl, lvl, temp, temp, temp, temp, hum, hum, hum, hum, ts]
+            continue
+        a[0] += 1
+        a[1] = min(a[1], lvl); a[2] = max(a[2], lvl); a[3] += lvl
+        a[5] = min(a[5], temp); a[6] = max(a[6], temp); a[7] += temp
+        a[9] = min(a[9], hum); a[10] = max(a[10], hum); a[11] += hum
+        if ts >= a[13]:
+            a[4], a[8], a[12], a[13] = lvl, temp, hum, ts
+    return [(sid, bucket, *a) for (sid, bucket), a in acc.items()]
+
+
+def apply_batch(conn, rows):
+    # called inside the ingest transaction so rollups never drift from raw telemetry
+    for res, bucket_fn in BUCKETS.items():
+        conn.executemany(SQL_UPSERT[res], aggregate(rows, bucket_fn))
+
+
+def rebuild(conn, silo_id=None, since=None):
+    # recompute rollups from raw telemetry (whole table, one silo, and/or from a bucket onwards)
+    for res, table in TABLES.items():
+        where, args = [], []
+        if silo_id is not None:
+            where.append("silo_id=?"); args.append(silo_id)
+        if since is not None:
+            since_b = BUCKETS[res](silo_db.to_ms(since))
+            where.append("bucket>=?"); args.append(since_b)
+        cond = (" WHERE " + " AND ".join(where)) if where else ""
+        conn.execute(f"DELETE FROM {table}{cond}", args)
+        b = _BUCKET_SQL[res]
+        conn.execute(f"""INSERT INTO {table} ({_COLS})
+            SELECT silo_id, bucket, count(*), min(level_percent), max(level_percent), total(level_percent), NULL,
+                   min(temp_c), max(temp_c), total(temp_c), NULL, min(humidity), max(humidity), total(humidity), NULL, max(timestamp)
+            FROM (SELECT silo_id, {b} AS bucket, timestamp, level_percent, temp_c, humidity FROM telemetry)
+            {cond} GROUP BY silo_id, bucket""", args)
+        conn.execute(f"""UPDATE {table} SET (level_last, temp_last, hum_last) =
+            (SELECT level_percent, temp_c, humidity FROM telemetry t
+             WHERE t.silo_id={table}.silo_id AND t.timestamp={table}.last_ts LIMIT 1)
+            WHERE level_last IS NULL""")
+
+
+# --- QUERY API ---
+def range_signature(silo_id, start, resolution):
+    # (first bucket, newest reading, reading count) of a rollup range; a few index reads, and it
+    # moves whenever anything a rollup chart shows does (new readings, back-fills, expiry)
+    with silo_db.reader() as conn:
+        return conn.execute(f"SELECT min(bucket), max(last_ts), total(n) FROM {TABLES[resolution]} WHERE silo_id=? AND bucket>=?",
+                            (silo_id, BUCKETS[resolution](silo_db.to_ms(start)))).fetchone()
+
+
+def pick_resolution(start, end):
+    span = end - start
+    if span <= RAW_MAX_SPAN:
+        return 'raw'
+    if span <= HOURLY_MAX_SPAN:
+        return 'hourly'
+    return 'daily'
+
+
+_RAW_COLS = ('timestamp', 'level_percent', 'temp_c', 'humidity')
+_ROLLUP_COLS = ('timestamp', 'n', 'level_percent', 'temp_c', 'humidity', 'level_min', 'level_max',
+                'temp_min', 'temp_max', 'hum_min', 'hum_max', 'level_last')
+
+
+def get_columns(silo_id, start, end=None, resolution=None):
+    # -> (resolution, {column: ndarray}); 'timestamp' is datetime64[ms], everything else float64.
+    # Rollup columns carry avg values plus *_min/*_max so spikes survive.
+    end = end or datetime.datetime.now()
+    res = resolution or pick_resolution(start, end)
+    start_ms, end_ms = silo_db.to_ms(start), silo_db.to_ms(end)
+    with silo_db.reader() as conn:
+        if res == 'raw':
+            names = _RAW_COLS
+            rows = conn.execute("SELECT timestamp, level_percent, temp_c, humidity FROM telemetry "
+                                "WHERE silo_id=? AND timestamp>=? AND timestamp<=? ORDER BY timestamp",
+                                (silo_id, start_ms, end_ms)).fetchall()
+            live_from = conn.execute("SELECT min(timestamp) FROM telemetry WHERE silo_id=?", (silo_id,)).fetchone()[0]
+        else:
+            names = _ROLLUP_COLS
+            rows = conn.execute(f"SELECT bucket, n, level_sum/n, temp_sum/n, hum_sum/n, level_min, level_max, temp_min, temp_max, "
+                                f"hum_min, hum_max, level_last FROM {TABLES[res]} WHERE silo_id=? AND bucket>=? AND bucket<=? ORDER BY bucket",
+                                (silo_id, BUCKETS[res](start_ms), end_ms)).fetchall()
+    arr = np.array(rows, dtype=np.float64).reshape(len(rows), len(names))
+    cols = {name: arr[:, i] for i, name in enumerate(names)}
+    cols['timestamp'] = arr[:, 0].astype(np.int64).astype('datetime64[ms]')
+    if res == 'raw' and (live_from is None or start_ms < live_from):
+        # the part of the range older than the live table comes from the archive
+        old = silo_archive.read_range(silo_id, start_ms, min(end_ms + 1, live_from or end_ms + 1), _RAW_COLS[1:])
+        if len(old['timestamp']):
+            cols = {k: np.concatenate([old[k], v]) for k, v in cols.items()}
+    return res, cols
+
+
+def get_series(silo_id, start, end=None, resolution=None):
+    # row-dict view of get_columns() for report formatting
+    res, cols = get_columns(silo_id, start, end, resolution)
+    ts = cols['timestamp'].astype(datetime.datetime)
+    names = [k for k in cols if k != 'timestamp']
+    values = [cols[k].tolist() for k in names]
+    out = []
+    for i, t in enumerate(ts):
+        row = {'timestamp': t}
+        for k, v in zip(names, values):
+            row[k] = v[i]
+        if 'n' in row:
+            row['n'] = int(row['n'])
+        out.append(row)
+    return res, out
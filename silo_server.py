@@ -0,0 +1,385 @@
+import argparse, asyncio, datetime, json, logging, math, queue, sys, threading, time
+import silo_db, silo_deadband, silo_ingest
+
+log = logging.getLogger(__name__)
+
+HTTP_PORT = 8080
+UDP_PORT = 8081
+MAX_BODY = 64 * 1024
+TOKEN_RELOAD_INTERVAL = 5.0   # unknown tokens trigger at most one silos reload per interval
+
+STATUS_TEXT = {200: "OK", 202: "Accepted", 304: "Not Modified", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+               405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class TokenCache:
+    # lookup() only reads the in-memory map; on the event loop, reloads go through reload_async()
+    def __init__(self):
+        self._by_token = {}
+        self._loaded_at = float('-inf')
+        self._reload = None
+
+    def load(self):
+        with silo_db.reader() as conn:
+            rows = conn.execute("SELECT id, token, height_m FROM silos WHERE token IS NOT NULL").fetchall()
+        self._by_token = {tok: (sid, h or silo_ingest.DEFAULT_HEIGHT) for sid, tok, h in rows}
+        self._loaded_at = time.monotonic()
+
+    def lookup(self, token):
+        return self._by_token.get(token)
+
+    async def reload_async(self):
+        # -> True once a reload has run for this caller. Unknown tokens trigger at most one reload per
+        # TOKEN_RELOAD_INTERVAL, on an executor thread and shared by everyone who arrives meanwhile,
+        # so random tokens cannot keep the event loop waiting on SQLite
+        if self._reload is None:
+            if time.monotonic() - self._loaded_at <= TOKEN_RELOAD_INTERVAL:
+                return False
+            self._reload = asyncio.ensure_future(self._load_in_executor())
+        await asyncio.shield(self._reload)
+        return True
+
+    async def _load_in_executor(self):
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.load)
+        finally:
+            self._loaded_at = time.monotonic()
+            self._reload = None
+
+    def invalidate(self):
+        self._loaded_at = float('-inf')
+
+
+class BadReading(ValueError):
+    pass
+
+
+class Unauthorized(Exception):
+    pass
+
+
+def _number(d, *keys):
+    for k in keys:
+        v = d.get(k)
+        if v is not None:
+            try:
+                x = float(v)
+            except (TypeError, ValueError):
+                raise BadReading(f"{k} is not a number")
+            if not math.isfinite(x):
+                raise BadReading(f"{k} must be finite")
+            return x
+    raise BadReading(f"missing {keys[0]}")
+
+
+def parse_reading(d, tokens, token=None):
+    # returns the BatchWriter.submit arguments for one decoded reading
+    if not isinstance(d, dict):
+        raise BadReading("reading must be an object")
+    tok = d.get('token') or token
+    if tok is not None and not isinstance(tok, str):
+        raise BadReading("token must be a string")
+    silo = tokens.lookup(tok) if tok else None
+    if silo is None:
+        raise Unauthorized(tok)
+    sid, h = silo
+    dist = _number(d, 'distance_m', 'distance')
+    temp = _number(d, 'temp_c', 'temperature', 'temp')
+    hum = _number(d, 'humidity', 'hum')
+    lvl = max(0.0, min(100.0, (h - dist) / h * 100.0))
+    ts = d.get('ts')
+    if isinstance(ts, (int, float)):
+        try:
+            ts = datetime.datetime.fromtimestamp(ts / 1000.0 if ts > 1e11 else ts)
+        except (OverflowError, OSError, ValueError):
+            raise BadReading("ts out of range")
+    else:
+        ts = None
+    return (sid, lvl, temp, hum, ts, dist)
+
+
+class IngestService:
+    def __init__(self, writer=None, tokens=None):
+        self.writer = writer or silo_ingest.get_writer()
+        self.tokens = tokens or TokenCache()
+        self.counters = {'accepted': 0, 'unauthorized': 0, 'bad_request': 0, 'overloaded': 0, 'udp_packets': 0}
+        self._udp_tasks = set()   # strong refs; the loop only keeps weak ones
+
+    def _parse(self, body, token):
+        # -> [(submit arguments, decoded reading)]; raises BadReading or Unauthorized
+        try:
+            data = json.loads(body)
+        except (ValueError, UnicodeDecodeError):
+            raise BadReading("invalid json")
+        items = data if isinstance(data, list) else [data]
+        return [(parse_reading(d, self.tokens, token), d) for d in items]
+
+    def _rejected(self, e):
+        if isinstance(e, Unauthorized):
+            self.counters['unauthorized'] += 1
+            return 401, {'error': 'unknown token'}
+        self.counters['bad_request'] += 1
+        return 400, {'error': str(e)}
+
+    def ingest(self, body, token=None):
+        # body is one JSON reading or a list of them; returns (status, payload). Tokens are looked up
+        # in the loaded map only (see ingest_async).
+        try:
+            parsed = self._parse(body, token)
+        except (BadReading, Unauthorized) as e:
+            return self._rejected(e)
+        return self._submit(body, parsed)
+
+    async def ingest_async(self, body, token=None):
+        # ingest() for the event loop: an unknown token first gets a (rate-limited) token reload off the loop
+        try:
+            try:
+                parsed = self._parse(body, token)
+            except Unauthorized:
+                if not await self.tokens.reload_async():
+                    raise
+                parsed = self._parse(body, token)
+        except (BadReading, Unauthorized) as e:
+            return self._rejected(e)
+        return self._submit(body, parsed)
+
+    def _submit(self, body, parsed):
+        # A list is validated as a whole but queued row by row: a 503 carries the number of readings
+        # already accepted, and the client must resend only the readings after that index.
+        raw_single = body.decode('utf-8', 'replace') if isinstance(body, bytes) else body
+        accepted = 0
+        for (sid, lvl, temp, hum, ts, dist), d in parsed:
+            raw = raw_single if len(parsed) == 1 else json.dumps(d, separators=(',', ':'))
+            try:
+                self.writer.submit(sid, lvl, temp, hum, ts=ts, dist=dist, raw_json=raw, block=False)
+            except queue.Full:
+                self.counters['overloaded'] += 1
+                return 503, {'error': 'ingest queue full, resend the readings after `accepted`', 'accepted': accepted}
+            accepted += 1
+        self.counters['accepted'] += accepted
+        return 202, {'accepted': accepted}
+
+    def health(self):
+        return 200, {'ingest': self.counters, 'writer': self.writer.stats()}
+
+    # --- HTTP ---
+    async def handle_http(self, method, path, headers, body):
+        if path == '/ingest':
+            if method != 'POST':
+                return 405, {'error': 'use POST'}
+            token = headers.get('x-silo-token')
+            auth = headers.get('authorization', '')
+            if auth.lower().startswith('bearer '):
+                token = auth[7:].strip()
+            return await self.ingest_async(body, token)
+        if path == '/health' and method == 'GET':
+            return self.health()
+        return 404, {'error': 'not found'}
+
+    # --- UDP ---
+    def datagram_received(self, data, addr):
+        self.counters['udp_packets'] += 1
+        task = asyncio.ensure_future(self._udp_reading(data, addr))
+        self._udp_tasks.add(task)
+        task.add_done_callback(self._udp_tasks.discard)
+
+    async def _udp_reading(self, data, addr):
+        try:
+            status, _ = await self.ingest_async(data)
+        except Exception:
+            log.exception("udp reading from %s failed", addr)
+            return
+        if status != 202:
+            log.debug("udp reading from %s rejected (%d)", addr, status)
+
+
+class _UdpProtocol(asyncio.DatagramProtocol):
+    def __init__(self, service):
+        self.service = service
+
+    def datagram_received(self, data, addr):
+        self.service.datagram_received(data, addr)
+
+
+def _encode(status, payload, keep_alive, extra_headers=None):
+    body = payload if isinstance(payload, bytes) else json.dumps(payload, default=str).encode()
+    extra = dict(extra_headers or {})
+    head = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+            f"Content-Type: {extra.pop('Content-Type', 'application/json')}",
+            f"Content-Length: {len(body)}",
+            "Connection: keep-alive" if keep_alive else "Connection: close"]
+    for k, v in extra.items():
+        head.append(f"{k}: {v}")
+    return ("\r\n".join(head) + "\r\n\r\n").encode() + body
+
+
+async def serve_http_connection(reader, writer, handler):
+    # minimal HTTP/1.1 with keep-alive; handler(method, path, headers, body) -> (status, payload[, headers]),
+    # or a coroutine returning that
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                method, target, version = line.decode('latin-1').split()
+            except ValueError:
+                writer.write(_encode(400, {'error': 'bad request line'}, False))
+                break
+            headers = {}
+            while True:
+                h = await reader.readline()
+                if h in (b'\r\n', b'\n', b''):
+                    break
+                k, _, v = h.decode('latin-1').partition(':')
+                headers[k.strip().lower()] = v.strip()
+            try:
+                length = int(headers.get('content-length') or 0)
+            except ValueError:
+                length = -1
+            if length < 0:
+                writer.write(_encode(400, {'error': 'bad content-length'}, False))
+                break
+            keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+            if length > MAX_BODY:
+                writer.write(_encode(413, {'error': 'body too large'}, False))
+                break
+            body = await reader.readexactly(length) if length else b''
+            try:
+                res = handler(method.upper(), target, headers, body)
+                if asyncio.iscoroutine(res):
+                    res = await res
+            except Exception:
+                # one bad request must not take the connection (and the device's other readings) down
+                log.exception("%s %s failed", method, target)
+                res = (500, {'error': 'internal error'})
+            writer.write(_encode(res[0], res[1], keep_alive, res[2] if len(res) > 2 else None))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_servers(service, host="0.0.0.0", http_port=HTTP_PORT, udp_port=UDP_PORT):
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, service.tokens.load)
+    servers = []
+    if http_port is not None:
+        servers.append(await asyncio.start_server(
+            lambda r, w: serve_http_connection(r, w, service.handle_http), host, http_port, backlog=1024))
+    if udp_port is not None:
+        transport, _ = await loop.create_datagram_endpoint(lambda: _UdpProtocol(service), local_addr=(host, udp_port))
+        servers.append(transport)
+    return servers
+
+
+def start_in_thread(host="0.0.0.0", http_port=HTTP_PORT, udp_port=UDP_PORT):
+    # runs the ingest endpoints on a daemon thread next to the Tk app
+    service = IngestService()
+    started = threading.Event()
+
+    def run():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        service.servers = loop.run_until_complete(start_servers(service, host, http_port, udp_port))
+        service.loop = loop
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, name="ingest-server", daemon=True).start()
+    started.wait(5.0)
+    return service
+
+
+# --- STAND-IN CLIENT / LOAD TEST ---
+async def _client_node(host, port, token, count, per_request, height, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        sent = 0
+        while sent < count:
+            n = min(per_request, count - sent)
+            readings = [{'token': token, 'distance_m': round(height * 0.4 + (i % 7) * 0.01, 3),
+                         'temp_c': 24.0 + (i % 5) * 0.1, 'humidity': 12.5} for i in range(n)]
+            body = json.dumps(readings if per_request > 1 else readings[0]).encode()
+            t0 = time.perf_counter()
+            writer.write((f"POST /ingest HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                          f"Content-Length: {len(body)}\r\n\r\n").encode() + body)
+            await writer.drain()
+            await reader.readline()
+            length = 0
+            while True:
+                h = await reader.readline()
+                if h in (b'\r\n', b''):
+                    break
+                if h.lower().startswith(b'content-length:'):
+                    length = int(h.split(b':')[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - t0)
+            sent += n
+    finally:
+        writer.close()
+
+
+async def load_test(host, port, nodes, readings, per_request=1):
+    with silo_db.reader() as conn:
+        silos = conn.execute("SELECT token, height_m FROM silos WHERE token IS NOT NULL").fetchall()
+    if not silos:
+        raise SystemExit("no silos with tokens to impersonate")
+    latencies = []
+    t0 = time.perf_counter()
+    await asyncio.gather(*(_client_node(host, port, silos[i % len(silos)][0], readings, per_request,
+                                        silos[i % len(silos)][1] or 10.0, latencies) for i in range(nodes)))
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    total = nodes * readings
+    print(f"{total:,} readings from {nodes} nodes in {elapsed:.2f}s -> {total / elapsed:,.0f} readings/s")
+    print(f"request latency p50 {latencies[len(latencies) // 2] * 1000:.2f} ms  "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="ESP32 telemetry ingest server")
+    ap.add_argument("command", choices=["serve", "loadtest"], nargs="?", default="serve")
+    ap.add_argument("--db", default=silo_db.DB)
+    ap.add_argument("--host", default="0.0.0.0")
+    ap.add_argument("--port", type=int, default=HTTP_PORT)
+    ap.add_argument("--udp-port", type=int, default=UDP_PORT)
+    ap.add_argument("--heartbeat", type=float, default=silo_deadband.HEARTBEAT_MS / 1000.0,
+                    help="seconds between stored rows of a stable silo (0: no heartbeat)")
+    ap.add_argument("--nodes", type=int, default=50, help="loadtest: concurrent stand-in nodes")
+    ap.add_argument("--readings", type=int, default=200, help="loadtest: readings per node")
+    ap.add_argument("--batch", type=int, default=1, help="loadtest: readings per request")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    silo_db.configure(args.db)
+    silo_deadband.HEARTBEAT_MS = int(args.heartbeat * 1000)
+
+    if args.command == "loadtest":
+        host = "127.0.0.1" if args.host == "0.0.0.0" else args.host
+        asyncio.run(load_test(host, args.port, args.nodes, args.readings, args.batch))
+        return 0
+
+    with silo_db.writer() as conn:
+        silo_db.migrate(conn)
+
+    async def run():
+        service = IngestService()
+        await start_servers(service, args.host, args.port, args.udp_port)
+        log.info("ingest listening on http://%s:%d/ingest and udp/%d", args.host, args.port, args.udp_port)
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        silo_ingest.shutdown()
+        silo_db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
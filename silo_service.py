@@ -0,0 +1,386 @@
+import argparse, datetime, logging, os, signal, sys, threading, time
+import numpy as np
+import silo_alerts, silo_archive, silo_cache, silo_db, silo_deadband, silo_downsample, silo_export, silo_forecast, silo_ingest, silo_loadgen, silo_metrics, silo_rollup
+
+log = logging.getLogger(__name__)
+
+# GUI-free data layer and long-running workers. SiloApp is one client of this module; on a
+# headless box the workers run on their own:
+#   python silo_service.py --workers ingest,alerts,retention,exports,api
+#   python silo_service.py --workers alerts --db /srv/silo/silo_system.sqlite3
+# Several processes can share one database (WAL), but run each worker kind in one process only.
+
+WORKERS = ('ingest', 'alerts', 'retention', 'exports', 'simulator', 'api')
+ALERT_INTERVAL = 5.0                 # seconds between fleet alert evaluations
+EXPORT_DIR = "exports"
+EXPORT_AT = datetime.time(0, 15)     # the previous day's readings are exported daily at this local time
+
+CHART_POINTS = 48
+# chart range presets: (span, storage resolution to read from)
+CHART_RANGES = {
+    '1h': (datetime.timedelta(hours=1), 'raw'),
+    '24h': (datetime.timedelta(days=1), 'raw'),
+    '7d': (datetime.timedelta(days=7), 'hourly'),
+    '30d': (datetime.timedelta(days=30), 'hourly'),
+    'All': (None, 'daily'),
+}
+
+SQL_INSERT_TELEMETRY = 'INSERT INTO telemetry (silo_id,timestamp,distance_m,level_percent,temp_c,humidity,raw_json) VALUES (?,?,?,?,?,?,?)'
+SQL_INSERT_SILO = "INSERT INTO silos (owner_id,name,radius_m,height_m,token,threshold_moisture,threshold_temp,threshold_level_percent,next_service_date) VALUES (?,?,?,?,?,?,?,?,?)"
+SQL_LATEST = 'SELECT timestamp, level_percent, temp_c, humidity FROM telemetry WHERE silo_id=? ORDER BY timestamp DESC LIMIT 1'
+SQL_HISTORY = 'SELECT timestamp, level_percent, temp_c, humidity FROM telemetry WHERE silo_id=? ORDER BY timestamp DESC LIMIT ?'
+SQL_HISTORY_SINCE = 'SELECT timestamp, level_percent, temp_c, humidity FROM telemetry WHERE silo_id=? AND timestamp>? ORDER BY timestamp DESC LIMIT ?'
+
+
+# --- DATA ---
+def ensure_db():
+    with silo_db.writer() as conn:
+        silo_db.migrate(conn)
+        cur = conn.cursor()
+        cur.execute("SELECT count(*) FROM silos")
+        if cur.fetchone()[0] == 0:
+            cur.execute("INSERT INTO users (name,email) VALUES (?,?)", ('Farm Admin','admin@farm.local'))
+            uid = cur.lastrowid
+            
+            today = datetime.date.today()
+            service_future = today + datetime.timedelta(days=90)
+            
+            silos_seed = [
+                ('Silo 01 (Wheat)', 2.5, 8.0, 13.5, 35.0, 15.0, service_future),
+                ('Silo 02 (Corn)', 2.5, 8.0, 14.0, 30.0, 10.0, service_future)
+            ]
+            
+            seed_rows = []
+            for idx, s in enumerate(silos_seed):
+                cur.execute(SQL_INSERT_SILO, (uid, s[0], s[1], s[2], f'tk-0{idx}', s[3], s[4], s[5], s[6]))
+                sid = cur.lastrowid
+                
+            
+                now = datetime.datetime.now()
+                base_lvl = 75.0 if idx == 0 else 45.0
+                for i in range(20):
+                    ts = now - datetime.timedelta(hours=2*(20-i))
+                    lvl = base_lvl 
+                    dist = s[2] * (1 - lvl/100.0)
+                    temp = 24.5 
+                    hum = 12.0
+                    seed_rows.append((sid, silo_db.to_ms(ts), dist, lvl, temp, hum, '{"seed":true}'))
+            cur.executemany(SQL_INSERT_TELEMETRY, seed_rows)
+            silo_rollup.apply_batch(conn, seed_rows)
+        cur.close()
+
+@silo_metrics.timed('silo_insert_seconds')
+def add_new_silo_db(name, radius, height):
+    next_service = datetime.date.today() + datetime.timedelta(days=180)
+    with silo_db.writer() as conn:
+        cur = conn.execute(SQL_INSERT_SILO, (1, name, radius, height, f'tk-{int(time.time())}', 14.0, 40.0, 10.0, next_service))
+        sid = cur.lastrowid
+    silo_ingest.height_cache.invalidate()
+    return sid
+
+@silo_metrics.timed('silo_insert_seconds')
+def update_silo_details_db(silo_id, name, radius, height):
+    with silo_db.writer() as conn:
+        conn.execute("UPDATE silos SET name=?, radius_m=?, height_m=? WHERE id=?", (name, radius, height, silo_id))
+    silo_ingest.height_cache.invalidate()
+
+@silo_metrics.timed('silo_query_seconds')
+def get_all_silos():
+    with silo_db.reader() as conn:
+        rows = conn.execute("SELECT id, name, radius_m, height_m, threshold_moisture, threshold_temp, threshold_level_percent, next_service_date FROM silos").fetchall()
+    return rows
+
+@silo_metrics.timed('silo_query_seconds')
+def get_latest(silo_id):
+    with silo_db.reader() as conn:
+        row = conn.execute(SQL_LATEST, (silo_id,)).fetchone()
+    if row:
+        return {'timestamp': silo_db.from_ms(row[0]), 'level_percent': row[1], 'temp_c': row[2], 'humidity': row[3]}
+    return None
+
+def _columns(rows):
+    # newest-first rows -> oldest-first columns; timestamps stay datetime64[ms] until something formats them
+    arr = np.array(rows[::-1], dtype=np.float64).reshape(len(rows), 4)
+    return {'timestamp': arr[:, 0].astype(np.int64).astype('datetime64[ms]'),
+            'level_percent': arr[:, 1], 'temp_c': arr[:, 2], 'humidity': arr[:, 3]}
+
+@silo_metrics.timed('silo_query_seconds')
+def get_history_columns(silo_id, limit=100, since=None):
+    with silo_db.reader() as conn:
+        if since is None:
+            rows = conn.execute(SQL_HISTORY, (silo_id, limit)).fetchall()
+        else:
+            rows = conn.execute(SQL_HISTORY_SINCE, (silo_id, silo_db.to_ms(since), limit)).fetchall()
+    return _columns(rows)
+
+def get_history(silo_id, limit=100):
+    return get_history_since(silo_id, None, limit)
+
+def get_history_since(silo_id, since, limit=100):
+    cols = get_history_columns(silo_id, limit, since)
+    ts = cols['timestamp'].astype(datetime.datetime)
+    return [{'timestamp': t, 'level_percent': l, 'temp_c': c, 'humidity': h}
+            for t, l, c, h in zip(ts, cols['level_percent'].tolist(), cols['temp_c'].tolist(), cols['humidity'].tolist())]
+
+@silo_metrics.timed('silo_insert_seconds')
+def insert_telemetry(silo_id, lvl, temp, hum):
+    w = silo_ingest.get_writer()
+    w.submit(silo_id, lvl, temp, hum, raw_json='{"manual":true}', keep=True)
+    # manual entries are shown straight away, so wait for the batch to land
+    w.flush(timeout=5.0)
+
+@silo_metrics.timed('silo_insert_seconds')
+def update_thresholds_db(silo_id, m, t, l):
+    with silo_db.writer() as conn:
+        conn.execute('UPDATE silos SET threshold_moisture=?, threshold_temp=?, threshold_level_percent=? WHERE id=?', (m, t, l, silo_id))
+
+# --- DASHBOARD QUERIES (run on worker threads, never touch Tk) ---
+def fetch_dashboard(silo_id, chart=None, alerts=None, forecaster=None):
+    # recent readings come from the in-memory rings; SQLite is only read for misses and long ranges
+    phase = lambda name: silo_metrics.timer('silo_update_phase_seconds', phase=name)
+    cache = silo_cache.get_cache()
+    with phase('query'):
+        cache.sync()
+        res = {'silo_id': silo_id, 'latest': cache.latest(silo_id)}
+        if chart is not None:
+            res['chart'] = build_chart(silo_id, **chart)
+    if alerts is not None:
+        with phase('alerts'):
+            res.update(fetch_fleet(alerts, forecaster))
+    if forecaster is not None:
+        with phase('forecast'):
+            res['forecast'] = forecaster.update(cache, [silo_id]).get(silo_id)
+    return res
+
+def fetch_fleet(alerts, forecaster=None):
+    # every silo is checked each tick, not only the one on screen
+    cache = silo_cache.get_cache()
+    alerts.evaluate(silo_alerts.fetch_fleet_latest(cache))
+    res = {'fleet': alerts.last, 'fleet_alerts': alerts.active_alerts()}
+    if forecaster is not None:
+        res['fleet_forecast'] = forecaster.update(cache, alerts.last['ids'].tolist())
+    return res
+
+def date_num(ts):
+    # datetime64 array / datetime -> matplotlib date numbers (days since its default 1970 epoch),
+    # computed without importing matplotlib in the worker threads
+    if isinstance(ts, datetime.datetime):
+        return silo_db.to_ms(ts) / 86400000.0
+    return np.asarray(ts).astype('datetime64[ms]').astype(np.int64) / 86400000.0
+
+def build_chart(silo_id, range_key, buf=None, width=600):
+    span, resolution = CHART_RANGES[range_key]
+    now = datetime.datetime.now()
+    start = now - span if span else datetime.datetime(1970, 1, 1)
+    key = (silo_id, range_key)
+    cutoff = date_num(start)
+    cache = silo_cache.get_cache()
+    sig = None
+
+    # last_ts is kept as epoch ms; timestamps only become matplotlib dates here at the plotting edge
+    if resolution == 'raw' and cache.covers(silo_id, start):
+        w = cache.window(silo_id, since=start)
+        last_ts = int(w['ts'][-1].astype(np.int64)) if len(w['ts']) else silo_db.to_ms(start)
+        if buf is not None and buf['key'] == key and buf['last_ts'] == last_ts and (not len(buf['t']) or buf['t'][0] >= cutoff):
+            return dict(buf, changed=False)
+        t = date_num(w['ts'])
+        lvl, tmp, hum = w['lvl'], w['tmp'], w['hum']
+    elif buf is not None and buf['key'] == key and resolution == 'raw':
+        # raw ranges only fetch what arrived since the previous tick
+        _, cols = silo_rollup.get_columns(silo_id, buf['last_ts'] + 1, now, 'raw')
+        if not len(cols['timestamp']) and (not len(buf['t']) or buf['t'][0] >= cutoff):
+            return dict(buf, changed=False)
+        t = np.concatenate((buf['t'], date_num(cols['timestamp'])))
+        lvl = np.concatenate((buf['lvl'], cols['level_percent']))
+        tmp = np.concatenate((buf['tmp'], cols['temp_c']))
+        hum = np.concatenate((buf['hum'], cols['humidity']))
+        keep = t >= cutoff
+        t, lvl, tmp, hum = t[keep], lvl[keep], tmp[keep], hum[keep]
+        last_ts = int(cols['timestamp'][-1].astype(np.int64)) if len(cols['timestamp']) else buf['last_ts']
+    else:
+        # rollup ranges are re-queried only when their signature moved
+        sig = silo_rollup.range_signature(silo_id, start, resolution)
+        if buf is not None and buf['key'] == key and buf['sig'] == sig:
+            return dict(buf, changed=False)
+        _, cols = silo_rollup.get_columns(silo_id, start, now, resolution)
+        t = date_num(cols['timestamp'])
+        lvl = cols['level_percent']
+        # rollups plot the bucket maximum so short temperature/humidity spikes are not averaged away
+        tmp = cols['temp_c' if resolution == 'raw' else 'temp_max']
+        hum = cols['humidity' if resolution == 'raw' else 'hum_max']
+        last_ts = int(cols['timestamp'][-1].astype(np.int64)) if len(cols['timestamp']) else silo_db.to_ms(start)
+
+    # never plot more points than the canvas has pixels
+    n_out = max(int(width), 50)
+    plot = {k: silo_downsample.downsample(t, y, n_out) for k, y in (('lvl', lvl), ('tmp', tmp), ('hum', hum))}
+    return {'key': key, 'last_ts': last_ts, 'sig': sig, 't': t, 'lvl': lvl, 'tmp': tmp, 'hum': hum, 'plot': plot, 'changed': True}
+
+# --- WORKERS ---
+def run_alerts(stop, interval=ALERT_INTERVAL, alerts=None, forecaster=None):
+    # evaluates every silo each interval and records transitions to alert_events
+    alerts = alerts or silo_alerts.AlertEngine()
+    cache = silo_cache.get_cache()
+    while not stop.is_set():
+        try:
+            cache.sync()
+            for sid, metric, state, value, threshold, _, _ in alerts.evaluate(silo_alerts.fetch_fleet_latest(cache)):
+                log.warning("silo %d: %s %s (%.1f, threshold %.1f)", sid, metric, state, value, threshold)
+            if forecaster is not None:
+                forecaster.update(cache, alerts.last['ids'].tolist())
+        except Exception:
+            log.exception("alert evaluation failed")
+            silo_metrics.inc('silo_errors_total', where='alerts')
+        stop.wait(interval)
+
+
+def export_path(export_dir, day):
+    return os.path.join(export_dir, f"{day:%Y}", f"silos_{day:%Y-%m-%d}.csv.gz")
+
+
+def export_day(day, export_dir=EXPORT_DIR):
+    # every silo's readings of one calendar day into one gzipped CSV -> (path, rows)
+    start = datetime.datetime.combine(day, datetime.time())
+    silos = get_all_silos()
+    path = export_path(export_dir, day)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp.gz"
+    n = silo_export.export_csv(tmp, [s[0] for s in silos], start, start + datetime.timedelta(days=1),
+                               compress=True, names={s[0]: s[1] for s in silos})
+    os.replace(tmp, path)
+    return path, n
+
+
+def run_exports(stop, export_dir=EXPORT_DIR, at=EXPORT_AT):
+    # yesterday's export once a day after `at`; a missed day (service down at that time) is caught up on start
+    while not stop.is_set():
+        now = datetime.datetime.now()
+        day = now.date() - datetime.timedelta(days=1)
+        if now.time() >= at and not os.path.exists(export_path(export_dir, day)):
+            try:
+                path, n = export_day(day, export_dir)
+                log.info("exported %d readings to %s", n, path)
+            except Exception:
+                log.exception("scheduled export for %s failed", day)
+                silo_metrics.inc('silo_errors_total', where='exports')
+                stop.wait(300)
+                continue
+        due = datetime.datetime.combine(now.date() + datetime.timedelta(days=now.time() >= at), at)
+        stop.wait(max(1.0, (due - datetime.datetime.now()).total_seconds()))
+
+
+class Service:
+    # the selected workers on daemon threads of this process; stop() ends them
+    def __init__(self, workers=(), host="0.0.0.0", http_port=None, udp_port=None, export_dir=EXPORT_DIR,
+                 alert_interval=ALERT_INTERVAL, metrics_port=None, api_port=None):
+        unknown = set(workers) - set(WORKERS)
+        if unknown:
+            raise ValueError(f"unknown workers: {', '.join(sorted(unknown))}")
+        self.workers = list(workers)
+        self.host, self.http_port, self.udp_port = host, http_port, udp_port
+        self.export_dir = export_dir
+        self.alert_interval = alert_interval
+        self.metrics_port = metrics_port
+        self.api_port = api_port
+        self.api = None
+        self._metrics_loop = None
+        self.stop_event = threading.Event()
+        self.alerts = None
+        self.forecaster = None
+        self.ingest = None
+        self._retention = None
+        self._threads = []
+
+    def _thread(self, name, target, *args):
+        t = threading.Thread(target=target, args=args, name=name, daemon=True)
+        t.start()
+        self._threads.append(t)
+
+    def start(self):
+        if self.metrics_port:
+            self._metrics_loop = silo_metrics.start_http(port=self.metrics_port)
+        if 'ingest' in self.workers:
+            import silo_server
+            kw = {k: v for k, v in (('http_port', self.http_port), ('udp_port', self.udp_port)) if v is not None}
+            self.ingest = silo_server.start_in_thread(self.host, **kw)
+        if 'alerts' in self.workers:
+            self.alerts = silo_alerts.AlertEngine()
+            self.forecaster = silo_forecast.Forecaster()
+            self._thread("alerts", run_alerts, self.stop_event, self.alert_interval, self.alerts, self.forecaster)
+        if 'retention' in self.workers:
+            import silo_retention
+            self._retention = silo_retention.start_in_thread()
+        if 'exports' in self.workers:
+            self._thread("exports", run_exports, self.stop_event, self.export_dir)
+        if 'api' in self.workers:
+            import silo_api
+            # next to the ingest worker the writer's cache is shared; otherwise the API syncs its own
+            cache = silo_cache.get_cache() if self.ingest is not None else None
+            self.api = silo_api.start_in_thread(port=self.api_port or silo_api.API_PORT, cache=cache)
+        if 'simulator' in self.workers:
+            # one vectorized reading per silo every 5 s, continuing from the stored levels
+            fleet = silo_loadgen.Fleet(seed=None)
+            self._thread("simulator", lambda: silo_loadgen.replay(fleet, stop=self.stop_event, follow=True))
+        if self.workers:
+            log.info("service workers: %s", ", ".join(self.workers))
+        return self
+
+    def stop(self, timeout=5.0):
+        self.stop_event.set()
+        if self._retention is not None:
+            self._retention.set()
+        if self.ingest is not None and getattr(self.ingest, 'loop', None) is not None:
+            self.ingest.loop.call_soon_threadsafe(self.ingest.loop.stop)
+        if self.api is not None:
+            import silo_api
+            silo_api.stop_in_thread(self.api)
+        if self._metrics_loop is not None:
+            self._metrics_loop.call_soon_threadsafe(self._metrics_loop.stop)
+        for t in self._threads:
+            t.join(timeout)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="headless silo service: ingest, alerts, retention and scheduled exports")
+    ap.add_argument("--db", default=silo_db.DB)
+    ap.add_argument("--workers", default="ingest,alerts,retention,exports",
+                    help=f"comma-separated, any of: {', '.join(WORKERS)}")
+    ap.add_argument("--host", default="0.0.0.0")
+    ap.add_argument("--port", type=int, help="ingest HTTP port")
+    ap.add_argument("--udp-port", type=int, help="ingest UDP port")
+    ap.add_argument("--heartbeat", type=float, default=silo_deadband.HEARTBEAT_MS / 1000.0,
+                    help="seconds between stored rows of a stable silo (0: no heartbeat)")
+    ap.add_argument("--export-dir", default=EXPORT_DIR)
+    ap.add_argument("--archive-dir", help=f"retention archive (default: {silo_archive.ARCHIVE_DIR}/ next to the database)")
+    ap.add_argument("--alert-interval", type=float, default=ALERT_INTERVAL)
+    ap.add_argument("--api-port", type=int, help="read API port (localhost)")
+    ap.add_argument("--metrics-port", type=int, help=f"serve Prometheus metrics on localhost (e.g. {silo_metrics.METRICS_PORT})")
+    ap.add_argument("--export-day", help="export one day (YYYY-MM-DD) and exit")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    silo_db.configure(args.db)
+    silo_deadband.HEARTBEAT_MS = int(args.heartbeat * 1000)
+    silo_archive.configure(args.archive_dir)
+    try:
+        ensure_db()
+        if args.export_day:
+            path, n = export_day(datetime.date.fromisoformat(args.export_day), args.export_dir)
+            log.info("exported %d readings to %s", n, path)
+            return 0
+        workers = [w.strip() for w in args.workers.split(",") if w.strip()]
+        service = Service(workers, args.host, args.port, args.udp_port, args.export_dir, args.alert_interval,
+                          args.metrics_port, args.api_port).start()
+        signal.signal(signal.SIGTERM, lambda *_: service.stop_event.set())
+        try:
+            while not service.stop_event.wait(1.0):
+                pass
+        except KeyboardInterrupt:
+            pass
+        service.stop()
+    finally:
+        silo_ingest.shutdown()
+        silo_db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
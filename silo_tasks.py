@@ -0,0 +1,71 @@
+import logging, queue
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+POLL_MS = 40
+
+
+class UiTaskRunner:
+    # Runs blocking jobs (SQLite reads, exports, report rendering) on worker threads.
+    # Results and progress are handed back to the Tk thread by polling with after(),
+    # since Tk widgets may only be touched from the thread that owns the mainloop.
+    def __init__(self, root, workers=3):
+        self.root = root
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ui-worker")
+        self._results = queue.SimpleQueue()
+        self._pending = 0
+        self._polling = False
+        self._closed = False
+        self.dropped = 0
+
+    def submit(self, fn, *args, on_done=None, on_error=None, on_progress=None, is_current=None, **kwargs):
+        # is_current() is checked on the Tk thread before delivery; stale results are dropped
+        if on_progress is not None:
+            kwargs['progress'] = lambda done, total=None: self._results.put((on_progress, (done, total), is_current, False))
+        fut = self._pool.submit(fn, *args, **kwargs)
+        self._pending += 1
+
+        def finished(f):
+            exc = f.exception()
+            if exc is None:
+                self._results.put((on_done, (f.result(),), is_current, True))
+            else:
+                self._results.put((on_error or self._log_error, (exc,), None, True))
+
+        fut.add_done_callback(finished)
+        self._schedule_poll()
+        return fut
+
+    def _log_error(self, exc):
+        log.error("background task failed", exc_info=exc)
+
+    def _schedule_poll(self):
+        if not self._polling and not self._closed:
+            self._polling = True
+            self.root.after(POLL_MS, self._poll)
+
+    def _poll(self):
+        self._polling = False
+        while True:
+            try:
+                cb, args, is_current, final = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if final:
+                self._pending -= 1
+            if is_current is not None and not is_current():
+                self.dropped += final
+                continue
+            if cb is None:
+                continue
+            try:
+                cb(*args)
+            except Exception:
+                log.exception("task callback %r failed", cb)
+        if self._pending > 0:
+            self._schedule_poll()
+
+    def shutdown(self):
+        self._closed = True
+        self._pool.shutdown(wait=False, cancel_futures=True)
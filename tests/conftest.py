@@ -0,0 +1,17 @@
+import os, sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import silo_archive, silo_db, silo_service
+
+
+@pytest.fixture
+def db(tmp_path):
+    # a fresh, migrated and seeded database per test; yields its directory
+    silo_db.configure(str(tmp_path / "silo.sqlite3"))
+    silo_archive.configure(None)
+    silo_service.ensure_db()
+    yield tmp_path
+    silo_archive.configure(None)
+    silo_db.close()
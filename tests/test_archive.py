@@ -0,0 +1,74 @@
+import datetime, os
+import numpy as np
+import silo_archive, silo_db, silo_export, silo_ingest, silo_retention, silo_rollup
+
+DAY = datetime.timedelta(days=1)
+STEP = datetime.timedelta(minutes=10)
+
+
+def fill(silo_id, start, n):
+    w = silo_ingest.BatchWriter()
+    for i in range(n):
+        w.submit(silo_id, 50.0 + i % 7, 20.0 + (i % 5) * 0.25, 12.5 + (i % 3) * 0.5, ts=start + i * STEP)
+        if i % 100 == 99:
+            w.flush()
+    w.flush()
+
+
+def live_rows(silo_id, end):
+    with silo_db.reader() as conn:
+        return conn.execute("SELECT timestamp, level_percent, temp_c, humidity FROM telemetry "
+                            "WHERE silo_id=? AND timestamp<? ORDER BY timestamp", (silo_id, silo_db.to_ms(end))).fetchall()
+
+
+def test_default_dir_is_next_to_database(db):
+    assert silo_archive.get_dir() == os.path.join(str(db), silo_archive.ARCHIVE_DIR)
+
+
+def test_retention_round_trip_custom_dir(db, monkeypatch):
+    monkeypatch.setattr(silo_retention, 'PAUSE', 0)
+    now = datetime.datetime(2026, 6, 1)
+    start = now - 120 * DAY
+    fill(1, start, 3 * 144)
+    end = start + 3 * DAY
+    before = live_rows(1, end)
+    archive = str(db / "elsewhere")
+
+    stats = silo_retention.run(raw_days=90, archive_dir=archive, now=now)
+    assert stats['rows'] == len(before)
+    assert live_rows(1, end) == []
+    parts = silo_archive.partitions(1)
+    assert len(parts) == 3 and all(path.startswith(archive) for _, path, _ in parts)
+
+    _, cols = silo_rollup.get_columns(1, start, end, 'raw')
+    assert cols['timestamp'].astype(np.int64).tolist() == [r[0] for r in before]
+    for i, name in enumerate(('level_percent', 'temp_c', 'humidity'), 1):
+        assert np.allclose(cols[name], [r[i] for r in before])
+
+    out = db / "export.csv"
+    assert silo_export.export_csv(str(out), [1], start, end) == len(before)
+    lines = out.read_text().splitlines()
+    assert len(lines) == len(before) + 1
+    assert lines[1].startswith(f"{silo_db.from_ms(before[0][0]):%Y-%m-%d %H:%M:%S}")
+
+
+def test_columnar_partition_round_trip(tmp_path):
+    day = silo_db.to_ms(datetime.datetime(2026, 2, 3))
+    rows = [(day + i * 5000, 1.234 + i, 50.0 + i / 100, -5.5, 40.0, None) for i in range(100)]
+    rows[10] = (rows[10][0], None, None, 1200.25, float('nan'), '{"raw": 1}')   # NaN, and temp needs int32
+    path = str(tmp_path / "p.col")
+    silo_archive.write_partition_columnar(path, rows)
+    part = silo_archive.Partition(path)
+    assert len(part) == 100 and part.day == day
+    assert part.raw('temp_c').dtype == np.int32 and part.raw('level_percent').dtype == np.int16
+    got = part.rows()
+    assert got[10] == (rows[10][0], None, None, 1200.25, None, '{"raw": 1}')
+    for r, g in zip(rows[:10], got[:10]):
+        assert g[0] == r[0] and np.allclose(g[1:5], r[1:5], atol=1e-3) and g[5] is None
+
+    lo, hi = part.bounds(rows[20][0], rows[30][0])
+    assert (lo, hi) == (20, 30)
+    cols = part.columns(rows[20][0], rows[30][0], names=('level_percent',))
+    assert cols['timestamp'].astype(np.int64).tolist() == [r[0] for r in rows[20:30]]
+    assert np.allclose(cols['level_percent'], [r[2] for r in rows[20:30]])
+    assert part.bounds(day - 1, day) == (0, 0) and part.bounds(day + 10 ** 9) == (100, 100)
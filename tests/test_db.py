@@ -0,0 +1,19 @@
+import datetime
+import silo_db
+
+
+def test_epoch_ms_round_trip():
+    ts = datetime.datetime(2026, 3, 1, 12, 30, 5, 123000)
+    ms = silo_db.to_ms(ts)
+    assert ms == 1772368205123
+    assert silo_db.from_ms(ms) == ts
+    assert silo_db.to_ms("2026-03-01 12:30:05.123") == ms
+    assert silo_db.to_ms(ms) == ms
+    assert silo_db.to_ms(None) is None and silo_db.from_ms(None) is None
+    assert silo_db.to_ms(datetime.datetime(1969, 12, 31, 23, 59, 59)) == -1000
+
+
+def test_migrate_is_idempotent(db):
+    with silo_db.writer() as conn:
+        assert silo_db.schema_version(conn) == silo_db.SCHEMA_VERSION
+        assert silo_db.migrate(conn) == silo_db.SCHEMA_VERSION
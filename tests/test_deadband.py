@@ -0,0 +1,51 @@
+import numpy as np
+import silo_deadband
+
+STEP_MS = 5000
+
+
+def series(n, seed=0):
+    # random-walk level/temp/humidity with a refill, as telemetry rows (silo_id, ts, dist, lvl, temp, hum, raw)
+    rng = np.random.default_rng(seed)
+    lvl = 80 - np.cumsum(np.abs(rng.normal(0.01, 0.05, n)))
+    lvl[n // 2:] += 30
+    temp = 20 + np.cumsum(rng.normal(0, 0.05, n))
+    hum = 40 + np.cumsum(rng.normal(0, 0.1, n))
+    return [(1, i * STEP_MS, 1.0, lvl[i], temp[i], hum[i], None) for i in range(n)]
+
+
+def compress(rows, **kw):
+    door = silo_deadband.SwingingDoor(**kw)
+    stored = [s for r in rows for s in door.offer(r)]
+    return door, stored + door.flush()
+
+
+def test_reconstruction_error_is_bounded():
+    rows = series(5000)
+    door, stored = compress(rows)
+    assert len(stored) < len(rows) / 2
+    assert stored[0] == rows[0] and stored[-1] == rows[-1]
+    at = [r[1] for r in rows]
+    for i, name in enumerate(('level_percent', 'temp_c', 'humidity')):
+        got = silo_deadband.reconstruct([s[1] for s in stored], [s[3 + i] for s in stored], at)
+        err = np.abs(got - [r[3 + i] for r in rows])
+        assert err.max() <= silo_deadband.TOLERANCES[name] + 1e-9
+
+
+def test_heartbeat_bounds_compression():
+    flat = [(1, i * STEP_MS, 1.0, 50.0, 20.0, 40.0, None) for i in range(1200)]
+    _, stored = compress(flat)
+    gaps = np.diff([s[1] for s in stored])
+    assert gaps.max() <= silo_deadband.HEARTBEAT_MS
+    _, stored = compress(flat, heartbeat_ms=0)
+    assert len(stored) < 1200 / silo_deadband.MAX_PENDING + 2
+
+
+def test_forced_and_late_rows_are_stored():
+    door = silo_deadband.SwingingDoor()
+    assert door.offer((1, 0, 1.0, 50.0, 20.0, 40.0, None)) != []
+    assert door.offer((1, STEP_MS, 1.0, 50.0, 20.0, 40.0, None)) == []
+    forced = (1, 2 * STEP_MS, 1.0, 50.0, 20.0, 40.0, None)
+    assert door.offer(forced, force=True)[-1] == forced
+    late = (1, STEP_MS // 2, 1.0, 50.0, 20.0, 40.0, None)
+    assert door.offer(late) == [late]
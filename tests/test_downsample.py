@@ -0,0 +1,25 @@
+import numpy as np
+import silo_downsample
+
+
+def test_lttb_keeps_ends_and_spikes():
+    x = np.arange(10000.0)
+    y = np.sin(x / 500.0)
+    y[4321] = 50.0
+    idx = silo_downsample.lttb(x, y, 200)
+    assert len(idx) == 200
+    assert idx[0] == 0 and idx[-1] == len(x) - 1
+    assert np.all(np.diff(idx) > 0)
+    assert 4321 in idx
+
+
+def test_lttb_small_inputs_pass_through():
+    assert silo_downsample.lttb(np.arange(5.0), np.ones(5), 10).tolist() == [0, 1, 2, 3, 4]
+    assert silo_downsample.lttb(np.arange(5.0), np.ones(5), 2).tolist() == [0, 1, 2, 3, 4]
+
+
+def test_lttb_tolerates_nan():
+    y = np.ones(1000)
+    y[100:200] = np.nan
+    x, yd = silo_downsample.downsample(np.arange(1000.0), y, 50)
+    assert len(x) == 50 and np.isfinite(x).all()
@@ -0,0 +1,70 @@
+import datetime, json, queue
+import pytest
+import silo_server
+
+
+class Tokens:
+    def lookup(self, token):
+        return {'tk-1': (1, 10.0)}.get(token)
+
+
+class Writer:
+    def __init__(self, room=None):
+        self.rows = []
+        self.room = room
+
+    def submit(self, *args, **kw):
+        if self.room is not None and len(self.rows) >= self.room:
+            raise queue.Full
+        self.rows.append((args, kw))
+
+
+def service(room=None):
+    return silo_server.IngestService(writer=Writer(room), tokens=Tokens())
+
+
+def reading(**kw):
+    return dict({'token': 'tk-1', 'distance_m': 2.5, 'temp_c': 21.0, 'humidity': 55.0}, **kw)
+
+
+def test_parse_reading():
+    sid, lvl, temp, hum, ts, dist = silo_server.parse_reading(
+        reading(distance_m="4", temperature=19, temp_c=None, ts=1767225600000), Tokens())
+    assert (sid, lvl, temp, hum, dist) == (1, 60.0, 19.0, 55.0, 4.0)
+    assert ts == datetime.datetime.fromtimestamp(1767225600)
+    assert silo_server.parse_reading(reading(ts=1767225600), Tokens())[4] == ts
+    # level is clamped to the silo
+    assert silo_server.parse_reading(reading(distance_m=-1), Tokens())[1] == 100.0
+    assert silo_server.parse_reading(reading(distance_m=12), Tokens())[1] == 0.0
+
+
+@pytest.mark.parametrize("bad", [
+    {'distance_m': float('nan')}, {'temp_c': float('inf')}, {'humidity': "-inf"}, {'temp_c': "warm"},
+    {'distance_m': None}, {'humidity': [1]}, {'token': 7}, {'ts': 1e300},
+])
+def test_bad_readings_are_rejected(bad):
+    with pytest.raises(silo_server.BadReading):
+        silo_server.parse_reading(reading(**bad), Tokens())
+
+
+def test_ingest_status_codes():
+    svc = service()
+    assert svc.ingest(json.dumps(reading())) == (202, {'accepted': 1})
+    assert svc.ingest(json.dumps(reading(token='nope')))[0] == 401
+    assert svc.ingest(json.dumps(reading(token=None)), token='tk-1')[0] == 202
+    assert svc.ingest(b'{"token": "tk-1", "distance_m": NaN, "temp_c": 1, "humidity": 1}')[0] == 400
+    assert svc.ingest(b'{not json')[0] == 400
+    assert svc.ingest(b'\xff\xfe')[0] == 400
+    assert svc.ingest(b'[1, 2]')[0] == 400
+    # a list is validated as a whole: one bad reading rejects all of it
+    assert svc.ingest(json.dumps([reading(), reading(temp_c="x")]))[0] == 400
+    assert len(svc.writer.rows) == 2
+    assert svc.counters == dict(svc.counters, accepted=2, unauthorized=1, bad_request=5)
+
+
+def test_ingest_partial_accept_when_queue_full():
+    svc = service(room=2)
+    status, payload = svc.ingest(json.dumps([reading(), reading(), reading()]))
+    assert status == 503 and payload['accepted'] == 2
+    args, kw = svc.writer.rows[0]
+    assert kw['block'] is False and json.loads(kw['raw_json']) == reading()